@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Throughput of pybanker-batch: load and verify many small synthetic data dirs.
+"""
+import argparse
+import time
+
+import synthetic
+
+import pybanker.batch
+
+
+def _build_tenants(home, count):
+    data_dirs = []
+    for cur in range(count):
+        data_dir = home / 'tenants' / f'tenant{cur:04d}'
+        synthetic.build_accounts(data_dir, num_accounts=3, statements_per_dir=24)
+        synthetic.build_transactions(data_dir, num_months=12, per_month=50)
+        synthetic.build_receipts(data_dir, 100, num_years=2, vendors_per_year=5)
+        (data_dir / 'schedule.yaml').write_text('items: {}\n')
+        data_dirs.append(data_dir)
+    return data_dirs
+
+
+def _measure(label, data_dirs, workers):
+    start = time.perf_counter()
+    # full_verify: otherwise the 2nd run would skip what the 1st run's ledgers recorded.
+    report = pybanker.batch.BatchRunner(data_dirs, workers=workers, full_verify=True).run()
+    elapsed = time.perf_counter() - start
+    print(f'{label:12s} tenants={len(data_dirs):5d} time={elapsed:6.2f}s'
+          f' tenants/s={len(data_dirs) / elapsed:7.1f} summary={report["summary"]}')
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--count', type=int, default=120)
+    cli.add_argument('--workers', type=int, default=8)
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    with synthetic.synthetic_home() as data_dir:
+        # No YAML cache either, so both runs parse every file.
+        synthetic.write_config(data_dir.parent, data_dir, use_cache='false')
+        data_dirs = _build_tenants(data_dir.parent, args.count)
+        _measure('workers=1', data_dirs, 1)
+        _measure(f'workers={args.workers}', data_dirs, args.workers)
+
+
+if __name__ == '__main__':
+    main()
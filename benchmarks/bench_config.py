@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Count how many times config.ini gets parsed while loading the accounts.
+
+The "per-object" run rebuilds a GlobalConfig for every lookup (the old behavior),
+the "shared" run uses `pybanker.shared.get_config()`.
+"""
+import argparse
+import configparser
+import time
+import unittest.mock
+
+import synthetic
+
+import pybanker.accounts
+import pybanker.shared
+
+
+def _load_accounts():
+    manager = pybanker.accounts.AccountManager()
+    accounts = manager.accounts
+    return sum(
+        len(cur_dir.statements)
+        for cur_account in accounts.values()
+        for cur_dir in cur_account.statements_manager.statements_directories
+    )
+
+
+def _run(label, per_object):
+    real_read = configparser.ConfigParser.read
+    calls = []
+
+    def counting_read(self, *args, **kwargs):
+        calls.append(args)
+        return real_read(self, *args, **kwargs)
+
+    pybanker.shared.set_config(None)
+    with unittest.mock.patch.object(configparser.ConfigParser, 'read', counting_read):
+        if per_object:
+            patcher = unittest.mock.patch.object(
+                pybanker.shared, 'get_config', pybanker.shared.GlobalConfig)
+        else:
+            patcher = unittest.mock.patch.object(pybanker.shared, 'get_config',
+                                                 pybanker.shared.get_config)
+        with patcher:
+            start = time.perf_counter()
+            num_statements = _load_accounts()
+            elapsed = time.perf_counter() - start
+    print(f'{label:12s} statements={num_statements:7d} config parses={len(calls):7d}'
+          f' per statement={len(calls) / max(num_statements, 1):.4f} time={elapsed:.3f}s')
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--accounts', type=int, default=20)
+    cli.add_argument('--statements', type=int, default=120, help='Statements per account.')
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    with synthetic.synthetic_home() as data_dir:
+        synthetic.build_accounts(data_dir, args.accounts, args.statements)
+        _run('per-object', per_object=True)
+        _run('shared', per_object=False)
+
+
+if __name__ == '__main__':
+    main()
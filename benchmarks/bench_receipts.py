@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Scan a synthetic receipts tree: the old os.walk + UserDict scan vs Receipts (os.scandir).
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+import synthetic
+
+import pybanker.receipts
+import pybanker.shared
+
+
+def _old_scan():
+    """The scan as it was: os.walk, str.replace and a _ReceiptItem per file."""
+    config = pybanker.shared.get_config()
+    receipts = dict()
+    base_dir = config.data_dir
+    for dir_path, dir_names, file_names in os.walk(config.receipts_directory):
+        for cur in file_names:
+            full_file = os.path.join(dir_path, cur)
+            new_receipt = pybanker.receipts._ReceiptItem(full_file.replace(base_dir, '', 1))
+            new_receipt['file-path'] = full_file
+            receipts[new_receipt.receipt_id] = new_receipt
+    return receipts
+
+
+def _new_scan(workers):
+    return pybanker.receipts.Receipts(workers=workers).receipts
+
+
+def _measure(label, scan):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    found = scan()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:14s} files={len(found):8d} time={elapsed:6.2f}s'
+          f' memory={current / 2**20:7.1f}MiB')
+    return found
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--count', type=int, default=500_000)
+    cli.add_argument('--workers', type=int, default=8)
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    with synthetic.synthetic_home() as data_dir:
+        synthetic.build_receipts(data_dir, args.count)
+        old = _measure('os.walk', _old_scan)
+        new = _measure('scandir', lambda: _new_scan(1))
+        _measure(f'scandir x{args.workers}', lambda: _new_scan(args.workers))
+        assert sorted(old) == list(new)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Memory used per statement: the old _StatementItem (a plain dataclass that also kept
+the config and a logger) vs the slotted, frozen one.
+"""
+import argparse
+import dataclasses
+import datetime
+import gc
+import pathlib
+import time
+import tracemalloc
+import typing
+
+import synthetic
+
+import pybanker.shared
+import pybanker.statements
+
+
+@dataclasses.dataclass
+class _OldStatementItem:
+    date_dt: datetime.date
+    path: typing.Optional[pathlib.Path] = None
+
+    def __post_init__(self):
+        self.global_config = pybanker.shared.get_config()
+        self.logger = self.global_config.build_logger(self)
+
+
+def _paths(count):
+    """Statement paths (built before measuring, both layouts share them)."""
+    statements_dir = pathlib.Path('/data/accounts/account0000/statements')
+    start = datetime.date(1990, 1, 1).toordinal()
+    return [
+        (datetime.date.fromordinal(start + cur), statements_dir / f'{cur:08d}.pdf')
+        for cur in range(count)]
+
+
+def _measure(label, item_class, paths):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = [item_class(date_dt=cur_dt, path=cur_path) for cur_dt, cur_path in paths]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(items)
+    print(f'{label:8s} count={count:8d} bytes/statement={current / count:6.1f}'
+          f' total={current / 2**20:7.1f}MiB build={elapsed:.2f}s')
+    del items
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--count', type=int, default=200_000)
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    with synthetic.synthetic_home():
+        paths = _paths(args.count)
+        _measure('old', _OldStatementItem, paths)
+        _measure('slotted', pybanker.statements._StatementItem, paths)
+
+
+if __name__ == '__main__':
+    main()
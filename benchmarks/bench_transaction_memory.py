@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Memory used per transaction: one UserDict per record (the old layout) vs the columnar store.
+"""
+import argparse
+import collections
+import datetime
+import gc
+import hashlib
+import time
+import tracemalloc
+
+import synthetic
+
+import pybanker.transactions
+
+
+def _records(count):
+    start = datetime.date(2000, 1, 1).toordinal()
+    for cur in range(count):
+        entered_nano = 946684800 * 10**9 + cur * 10**9
+        cents = 100 + cur % 50000
+        yield hashlib.sha256(str(entered_nano).encode('utf-8')).hexdigest(), {
+            'entered_nano': entered_nano,
+            'date': datetime.date.fromordinal(start + cur // 100),
+            'payee': f'Payee {cur % 97}',
+            'amount': cents / 100,
+            'splits': [
+                {'category': f'category{cur % 13}', 'amount': (cents - 50) / 100},
+                {'category': 'tax', 'amount': 0.5},
+            ],
+            'receipts': [],
+        }
+
+
+def _load_user_dicts(count):
+    loaded = dict()
+    for cur_id, cur_data in _records(count):
+        item = collections.UserDict({'transaction-id': cur_id})
+        item.update(cur_data)
+        loaded[cur_id] = item
+    return loaded
+
+
+def _load_store(count):
+    transactions = pybanker.transactions.Transactions(preload=False)
+    for cur_id, cur_data in _records(count):
+        transactions.add_transaction(cur_id, cur_data)
+    return transactions
+
+
+def _measure(label, loader, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = loader(count)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:12s} count={count:8d} bytes/transaction={current / count:8.1f}'
+          f' total={current / 2**20:8.1f}MiB load={elapsed:.2f}s')
+    del loaded
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--count', type=int, default=500_000)
+    args = cli.parse_args()
+    # Transactions() needs a config, but preload=False never reads the data dir.
+    with synthetic.synthetic_home():
+        _measure('user-dicts', _load_user_dicts, args.count)
+        _measure('columnar', _load_store, args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Time loading the monthly transaction files sequentially and in a process pool."""
+import argparse
+import time
+
+import synthetic
+
+import pybanker.shared
+import pybanker.transactions
+
+
+def _time_load(workers):
+    start = time.perf_counter()
+    transactions = pybanker.transactions.Transactions(workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f'workers={workers:3d} transactions={len(transactions.transactions):8d}'
+          f' time={elapsed:.3f}s')
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--months', type=int, default=180)
+    cli.add_argument('--per-month', type=int, default=200)
+    cli.add_argument('--workers', type=int, default=None, help='(Default: one per CPU.)')
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    with synthetic.synthetic_home() as data_dir:
+        # Skip the YAML cache, this is about the parsing.
+        synthetic.write_config(data_dir.parent, data_dir, use_cache='false')
+        synthetic.build_transactions(data_dir, args.months, args.per_month)
+        workers = args.workers or pybanker.shared.get_config().transaction_workers
+        _time_load(1)
+        _time_load(workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Time verifying transactions record by record vs the batch TransactionVerifier."""
+import argparse
+import time
+
+import bench_transaction_memory
+import synthetic
+
+import pybanker.verification
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument('--count', type=int, default=500_000)
+    cli.add_argument('--workers', type=int, default=None, help='(Default: one per CPU.)')
+    args = cli.parse_args()
+    with synthetic.synthetic_home():
+        transactions = bench_transaction_memory._load_store(args.count)
+        start = time.perf_counter()
+        for cur in transactions.transactions.values():
+            cur.verify_data()
+        print(f'record by record: {time.perf_counter() - start:.2f}s')
+        verifier = pybanker.verification.TransactionVerifier(
+            transactions.transactions, workers=args.workers)
+        start = time.perf_counter()
+        report = verifier.verify()
+        print(f'batch (workers={verifier.workers}): {time.perf_counter() - start:.2f}s'
+              f' failures={len(report.failures)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Time the main load and verify steps on synthetic data dirs of several sizes.
+
+The results can be saved as a baseline (benchmarks/baseline.json). Later runs are compared
+with it and any case that got slower than the threshold is flagged. (Exit status 1.)
+The baseline is only meaningful on the machine that recorded it.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import synthetic
+
+import pybanker.accounts
+import pybanker.frequency_utils
+import pybanker.receipts
+import pybanker.shared
+import pybanker.transactions
+
+SIZES = {
+    'small': synthetic.DataSize(
+        accounts=10, statements_per_dir=60, transaction_months=24,
+        transactions_per_month=100, receipts=1_000, schedule_items=20),
+    'medium': synthetic.DataSize(
+        accounts=50, statements_per_dir=120, transaction_months=120,
+        transactions_per_month=300, receipts=20_000, schedule_items=100),
+    'large': synthetic.DataSize(
+        accounts=200, statements_per_dir=240, transaction_months=240,
+        transactions_per_month=1_000, receipts=200_000, schedule_items=500),
+}
+_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Slower by less than this (in seconds) is noise, whatever the percentage.
+_MIN_REGRESSION_SECONDS = 0.005
+
+
+def _missing_statements(manager):
+    """find_missing_statement_dates() for every statements dir."""
+    found = 0
+    for cur_account in manager.accounts.values():
+        for cur_dir in cur_account.statements_manager.statements_directories:
+            helper = pybanker.frequency_utils.FrequencyHelper(
+                cur_dir.index_data.period,
+                [cur.date_dt for cur in cur_dir.statements],
+                cur_dir.index_data.start_date,
+                cur_dir.index_data.end_date,
+                calendar=True,
+            )
+            found += len(helper.find_missing_statement_dates())
+    return found
+
+
+def _loaded_accounts():
+    """An AccountManager with its accounts already loaded. (So only the lookup gets timed.)"""
+    manager = pybanker.accounts.AccountManager()
+    manager.accounts
+    return manager
+
+
+def _loaded_receipts():
+    """Transactions and Receipts with the receipts dir already scanned."""
+    receipts = pybanker.receipts.Receipts(workers=1)
+    receipts.receipts
+    return pybanker.transactions.Transactions(workers=1), receipts
+
+
+def _cases():
+    """Yield (name, setup, run). `run(setup())` is the part that gets timed."""
+    yield 'accounts', lambda: None, lambda unused: pybanker.accounts.AccountManager().accounts
+    yield (
+        'transactions_load',
+        lambda: None,
+        lambda unused: pybanker.transactions.Transactions(workers=1))
+    yield (
+        'transactions_verify',
+        lambda: pybanker.transactions.Transactions(workers=1),
+        lambda transactions: transactions.verify(workers=1))
+    yield (
+        'link_receipts',
+        _loaded_receipts,
+        lambda loaded: loaded[0].link_receipts(loaded[1]))
+    yield (
+        'find_all_receipts',
+        lambda: pybanker.receipts.Receipts(workers=1),
+        lambda receipts: receipts._find_all_receipts())
+    yield (
+        'missing_statements',
+        _loaded_accounts,
+        _missing_statements)
+
+
+def _time_case(setup, run, repeat):
+    """The best of `repeat` runs. (The first run also warms up the YAML cache.)"""
+    best = None
+    for unused in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_size(name, repeat):
+    results = {}
+    with synthetic.synthetic_home() as data_dir:
+        start = time.perf_counter()
+        synthetic.build_data_dir(data_dir, SIZES[name])
+        print(f'{name}: built in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+        pybanker.shared.set_config(None)
+        for cur_name, cur_setup, cur_run in _cases():
+            results[cur_name] = _time_case(cur_setup, cur_run, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return [(size, case, seconds, baseline seconds)] of the regressions."""
+    regressions = []
+    for size, cases in results.items():
+        for case, seconds in cases.items():
+            before = baseline.get(size, {}).get(case)
+            if before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > _MIN_REGRESSION_SECONDS:
+                regressions.append((size, case, seconds, before))
+    return regressions
+
+
+def _read_baseline(file_name):
+    try:
+        with open(file_name, 'r') as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def _write_baseline(file_name, results):
+    data = _read_baseline(file_name) or {}
+    data.update({
+        'machine': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'sizes': {cur: vars(SIZES[cur]) for cur in SIZES},
+    })
+    data.setdefault('results', {}).update({
+        size: {case: round(seconds, 6) for case, seconds in cases.items()}
+        for size, cases in results.items()})
+    with open(file_name, 'w') as fp:
+        json.dump(data, fp, indent=1, sort_keys=True)
+        fp.write('\n')
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__)
+    cli.add_argument(
+        '--sizes', default='small,medium',
+        help=f'Comma separated. (Of: {", ".join(SIZES)}. Default: %(default)s)')
+    cli.add_argument('--repeat', type=int, default=3, help='Runs per case (the best is kept).')
+    cli.add_argument('--baseline', default=_BASELINE_FILE)
+    cli.add_argument(
+        '--threshold', type=float, default=0.25,
+        help='Flag cases this much (a fraction) slower than the baseline.')
+    cli.add_argument(
+        '--save-baseline', action='store_true', help='Save the results as the new baseline.')
+    args = cli.parse_args()
+    synthetic.quiet_logging()
+    sizes = args.sizes.split(',')
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        cli.error(f'Unknown size(s): {", ".join(sorted(unknown))}')
+    results = {cur: run_size(cur, args.repeat) for cur in sizes}
+    baseline = _read_baseline(args.baseline)
+    baseline_results = {} if baseline is None else baseline.get('results', {})
+    regressions = compare(results, baseline_results, args.threshold)
+    flagged = {(cur[0], cur[1]) for cur in regressions}
+    print(f'{"size":8s} {"case":20s} {"seconds":>9s} {"baseline":>9s}')
+    for size, cases in results.items():
+        for case, seconds in cases.items():
+            before = baseline_results.get(size, {}).get(case)
+            before_string = '' if before is None else f'{before:9.4f}'
+            flag = '  REGRESSION' if (size, case) in flagged else ''
+            print(f'{size:8s} {case:20s} {seconds:9.4f} {before_string:>9s}{flag}')
+    if args.save_baseline:
+        _write_baseline(args.baseline, results)
+        print(f'Saved baseline: {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s) (over {args.threshold:.0%} slower).')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Build synthetic pybanker data dirs for the benchmarks.
+
+Everything is written under a temporary "home" dir, so the real `~/.pybanker` is never touched.
+"""
+import contextlib
+import dataclasses
+import datetime
+import hashlib
+import logging
+import os
+import pathlib
+import random
+import tempfile
+
+import dateutil.relativedelta
+import yaml
+
+import pybanker.shared
+
+
+def quiet_logging():
+    """Keep pybanker's (expected) missing statement errors out of the benchmark output."""
+    logger = logging.getLogger(pybanker.shared.GlobalConfig.base_logger_name)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+
+def write_config(home, data_dir, **options):
+    """Write ~/.pybanker/config.ini. (`options` are extra settings, e.g. use_cache=False.)"""
+    config_dir = pathlib.Path(home) / '.pybanker'
+    config_dir.mkdir(parents=True, exist_ok=True)
+    config_file = config_dir / 'config.ini'
+    lines = ['[default]', f'data_dir = {data_dir}']
+    lines.extend(f'{cur_key} = {cur_value}' for cur_key, cur_value in options.items())
+    config_file.write_text('\n'.join(lines) + '\n')
+    pybanker.shared.set_config(None)
+    return config_file
+
+
+def _write_yaml(path, data):
+    with open(path, 'w') as fp:
+        yaml.safe_dump(data, fp, default_flow_style=False)
+
+
+def build_accounts(data_dir, num_accounts, statements_per_dir):
+    """Create `num_accounts` monthly accounts, each with one statements dir."""
+    accounts_dir = pathlib.Path(data_dir) / 'accounts'
+    start_dt = datetime.date(2000, 1, 1)
+    for cur in range(num_accounts):
+        account_dir = accounts_dir / f'account{cur:04d}'
+        statements_dir = account_dir / 'statements'
+        statements_dir.mkdir(parents=True)
+        _write_yaml(account_dir / 'index.yaml', {
+            'name': f'Account {cur}',
+            'active': True,
+            'visible': True,
+            'account_type': 'checking',
+            'start_date': start_dt,
+            'statement_period': 'monthly',
+            'statements_directories': ['statements'],
+        })
+        _write_yaml(statements_dir / 'index.yaml', {
+            'name_formats': [r'^(\d{4})-(\d{2})-(\d{2})'],
+            'start_date': start_dt,
+            'period': 'monthly',
+        })
+        for month in range(statements_per_dir):
+            year, month = divmod(month, 12)
+            cur_dt = datetime.date(start_dt.year + year, month + 1, 1)
+            (statements_dir / f'{cur_dt.isoformat()}.pdf').touch()
+
+
+def build_transactions(data_dir, num_months, per_month, receipt_ids=()):
+    """Create `num_months` monthly transaction files (starting 2000-01), each with 2 splits.
+
+    receipt_ids: linked to the transactions, in order (one receipt per transaction).
+    """
+    transactions_dir = pathlib.Path(data_dir) / 'transactions'
+    transactions_dir.mkdir(parents=True, exist_ok=True)
+    entered_nano = 946684800 * 10**9
+    receipt_ids = iter(receipt_ids)
+    for month in range(num_months):
+        year, month = divmod(month, 12)
+        month_data = {}
+        for cur in range(per_month):
+            entered_nano += 10**9
+            cents = 100 + (entered_nano // 10**9) % 50000
+            transaction_id = hashlib.sha256(str(entered_nano).encode('utf-8')).hexdigest()
+            month_data[transaction_id] = {
+                'entered_nano': entered_nano,
+                'date': datetime.date(2000 + year, month + 1, 1 + cur % 28),
+                'payee': f'Payee {cur % 97}',
+                'amount': cents / 100,
+                'splits': [
+                    {'category': f'category{cur % 13}', 'amount': (cents - 50) / 100},
+                    {'category': 'tax', 'amount': 0.5},
+                ],
+                'receipts': [{'file_name': cur} for cur in [next(receipt_ids, None)] if cur],
+            }
+        _write_yaml(transactions_dir / f'{2000 + year:04d}-{month + 1:02d}.yaml', month_data)
+
+
+def build_receipts(data_dir, num_files, num_years=15, vendors_per_year=40):
+    """Create `num_files` (empty) receipt files, spread over year/vendor dirs.
+
+    Returns their receipt IDs. (The paths relative to the data dir.)
+    """
+    receipts_dir = pathlib.Path(data_dir) / 'receipts'
+    dirs = [
+        receipts_dir / f'{2000 + year}' / f'vendor{vendor:03d}'
+        for year in range(num_years) for vendor in range(vendors_per_year)]
+    for cur in dirs:
+        cur.mkdir(parents=True, exist_ok=True)
+    receipt_ids = []
+    for cur in range(num_files):
+        path = dirs[cur % len(dirs)] / f'{cur:08d}.jpg'
+        path.touch()
+        receipt_ids.append('/' + str(path.relative_to(data_dir)))
+    return receipt_ids
+
+
+# period -> the step between statements. (None: semi-monthly, the day and 15 days later.)
+_PERIOD_STEPS = {
+    'bi-weekly': dateutil.relativedelta.relativedelta(days=14),
+    'semi-monthly': None,
+    'monthly': dateutil.relativedelta.relativedelta(months=1),
+    'quarterly': dateutil.relativedelta.relativedelta(months=3),
+    'yearly': dateutil.relativedelta.relativedelta(years=1),
+}
+# (name format, how to write a date with it)
+_NAME_FORMATS = [
+    (r'^(\d{4})-(\d{2})-(\d{2})', '%Y-%m-%d'),
+    ('%Y%m%d', '%Y%m%d'),
+    ('statement_%d-%b-%Y', 'statement_%d-%b-%Y'),
+]
+
+
+def _statement_dates(period, start_dt, count):
+    step = _PERIOD_STEPS[period]
+    for cur in range(count):
+        if step is None:
+            months, half = divmod(cur, 2)
+            yield start_dt + dateutil.relativedelta.relativedelta(months=months, days=15 * half)
+        else:
+            yield start_dt + step * cur
+
+
+def build_mixed_accounts(data_dir, num_accounts, statements_per_dir, seed=0):
+    """Create accounts with a mix of statement periods and name formats.
+
+    About one statement in 50 is left out, so there are missing statements to find.
+    """
+    rng = random.Random(seed)
+    accounts_dir = pathlib.Path(data_dir) / 'accounts'
+    periods = list(_PERIOD_STEPS)
+    for cur in range(num_accounts):
+        period = periods[cur % len(periods)]
+        name_format, date_format = _NAME_FORMATS[cur % len(_NAME_FORMATS)]
+        start_dt = datetime.date(2000 + rng.randrange(5), 1 + rng.randrange(12), 1)
+        account_dir = accounts_dir / f'account{cur:04d}'
+        statements_dir = account_dir / 'statements'
+        statements_dir.mkdir(parents=True)
+        _write_yaml(account_dir / 'index.yaml', {
+            'name': f'Account {cur}',
+            'active': True,
+            'visible': True,
+            'account_type': 'checking',
+            'start_date': start_dt,
+            'statement_period': period,
+            'statements_directories': ['statements'],
+        })
+        dates = list(_statement_dates(period, start_dt, statements_per_dir))
+        _write_yaml(statements_dir / 'index.yaml', {
+            'name_formats': [name_format],
+            'start_date': start_dt,
+            'end_date': dates[-1],
+            'period': period,
+        })
+        for cur_dt in dates:
+            if rng.random() < 0.02:
+                continue
+            (statements_dir / f'{cur_dt.strftime(date_format)}.pdf').touch()
+
+
+def build_schedule(data_dir, num_items, seed=0):
+    rng = random.Random(seed)
+    frequencies = [
+        'weekly', 'bi-weekly', 'semi-monthly', 'monthly', 'quarterly', 'semi-annually',
+        'yearly']
+    items = {}
+    for cur in range(num_items):
+        items[f'item{cur:04d}'] = {
+            'payee': f'Payee {cur % 97}',
+            'start-date': datetime.date(2000, 1 + rng.randrange(12), 1),
+            'frequency': frequencies[cur % len(frequencies)],
+            'day': 1 + rng.randrange(28),
+            'amount': rng.randrange(100, 100000) / 100,
+            'category': f'category{cur % 13}',
+            'active': True,
+        }
+    _write_yaml(pathlib.Path(data_dir) / 'schedule.yaml', {'items': items})
+
+
+@dataclasses.dataclass(frozen=True)
+class DataSize:
+    accounts: int
+    statements_per_dir: int
+    transaction_months: int
+    transactions_per_month: int
+    receipts: int
+    schedule_items: int
+
+
+def build_data_dir(data_dir, size, seed=0):
+    """Build a whole data dir of the given DataSize. (The same seed builds the same data.)"""
+    build_mixed_accounts(data_dir, size.accounts, size.statements_per_dir, seed=seed)
+    receipt_ids = build_receipts(data_dir, size.receipts)
+    # Every other receipt is linked to a transaction.
+    build_transactions(
+        data_dir, size.transaction_months, size.transactions_per_month,
+        receipt_ids=receipt_ids[::2])
+    build_schedule(data_dir, size.schedule_items, seed=seed)
+
+
+@contextlib.contextmanager
+def synthetic_home():
+    """Point HOME at a new temp dir (with an empty data dir) for the duration."""
+    old_home = os.environ.get('HOME')
+    with tempfile.TemporaryDirectory(prefix='pybanker-bench-') as tmp_dir:
+        home = pathlib.Path(tmp_dir)
+        data_dir = home / 'data'
+        data_dir.mkdir()
+        write_config(home, data_dir)
+        os.environ['HOME'] = str(home)
+        pybanker.shared.set_config(None)
+        try:
+            yield data_dir
+        finally:
+            if old_home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = old_home
+            pybanker.shared.set_config(None)
+
+
+if __name__ == '__main__':
+    pass
@@ -1,12 +1,21 @@
 """
 Main class that wraps pybanker functionality
 """
+import datetime
 import logging
+import os
 
 import pybanker.accounts
+import pybanker.daemon
+import pybanker.forecast
+import pybanker.ledger
 import pybanker.receipts
+import pybanker.reconcile
+import pybanker.rollups
 import pybanker.schedule
 import pybanker.shared
+import pybanker.snapshot
+import pybanker.statement_coverage
 import pybanker.transactions
 
 
@@ -15,12 +24,23 @@ class UndefinedCommandException(Exception):
 
 
 class Banker(object):
+    """Wraps all of the data.
 
-    def __init__(self, logger_level=None):
-        self.config = pybanker.shared.GlobalConfig()
+    Each subsystem (accounts, schedule, receipts, transactions) is only loaded
+    the first time it is used.
+    """
+    subsystems = ['accounts', 'schedule', 'receipts', 'transactions']
+
+    def __init__(self, logger_level=None, full_verify=False, account_slugs=None):
+        """
+        full_verify: verify everything, even the inputs that the ledger says are unchanged.
+        account_slugs: only load (and show) these accounts. (Default: all of them.)
+        """
+        self.config = pybanker.shared.get_config()
         self.logger = self.config.build_logger(self)
+        self.full_verify = full_verify
+        self.account_slugs = account_slugs
         self._init_vars()
-        self.load_data()
 
     def _init_vars(self):
         self.command = None
@@ -28,6 +48,7 @@ class Banker(object):
         self._accounts = None
         self._receipts = None
         self._transactions = None
+        self._snapshot = None
 
     def _init_logger(self, logger_level=None):
         """Initialize logger. (self.logger)"""
@@ -35,12 +56,109 @@ class Banker(object):
         self.logger = logging.getLogger(logger_name)
         self.logger.debug('Logger initialized: {0}'.format(logger_name))
 
-    def load_data(self):
-        self.account_manager = pybanker.accounts.AccountManager()
-        self.schedule = pybanker.schedule.Schedule()
-        self.receipts = pybanker.receipts.Receipts()
-        self.transactions = pybanker.transactions.Transactions()
-        self.transactions.link_receipts(self.receipts)
+    @property
+    def snapshot(self):
+        """The compiled snapshot. (None if `compile` has never been run.)"""
+        if self._snapshot is None:
+            snapshot = pybanker.snapshot.Snapshot()
+            self._snapshot = snapshot if snapshot.exists() else False
+        return self._snapshot or None
+
+    def _build_accounts(self, slugs=None):
+        account_manager = pybanker.accounts.AccountManager(slugs=slugs)
+        # Make sure the accounts are loaded, so they are included in the snapshot.
+        account_manager.accounts
+        return account_manager
+
+    def _build_schedule(self):
+        return pybanker.schedule.Schedule()
+
+    def _build_receipts(self):
+        receipts = pybanker.receipts.Receipts()
+        receipts.receipts
+        return receipts
+
+    def _build_transactions(self):
+        return pybanker.transactions.Transactions()
+
+    def _load_subsystem(self, name):
+        """Load a subsystem from the snapshot (if it is up to date) or from the data files."""
+        self.logger.debug('Loading {}.'.format(name))
+        loaded = None
+        if self.snapshot is not None:
+            loaded = self.snapshot.load(name)
+        if loaded is None:
+            loaded = getattr(self, '_build_{}'.format(name))()
+        return loaded
+
+    @property
+    def account_manager(self):
+        if self._accounts is None:
+            if self.account_slugs is not None:
+                # Only read those accounts' dirs. (The snapshot covers every account.)
+                self._accounts = self._build_accounts(slugs=self.account_slugs)
+            else:
+                self._accounts = self._load_subsystem('accounts')
+        return self._accounts
+
+    @property
+    def schedule(self):
+        if self._schedule is None:
+            self._schedule = self._load_subsystem('schedule')
+        return self._schedule
+
+    @property
+    def receipts(self):
+        if self._receipts is None:
+            self._receipts = self._load_subsystem('receipts')
+        return self._receipts
+
+    @property
+    def transactions(self):
+        if self._transactions is None:
+            transactions = self._load_subsystem('transactions')
+            transactions.link_receipts(self.receipts)
+            self._transactions = transactions
+        return self._transactions
+
+    def unload(self):
+        """Forget the loaded data. (Each subsystem gets loaded again when it is used.)"""
+        self._init_vars()
+
+    def reload(self, changes):
+        """Reload what changed. `changes`: {subsystem: names}, see pybanker.daemon.DataWatcher.
+
+        Only the subsystems that are already loaded get reloaded.
+        """
+        if 'snapshot' in changes:
+            # Read again the next time a subsystem is loaded.
+            self._snapshot = None
+        if 'schedule' in changes and self._schedule is not None:
+            self._schedule = self._build_schedule()
+        if 'accounts' in changes and self._accounts is not None:
+            self._accounts.reload(changes['accounts'])
+        if 'receipts' in changes and self._receipts is not None:
+            self._receipts.rescan(changes['receipts'])
+        if 'transactions' in changes and self._transactions is not None:
+            self._transactions.reload_files([
+                os.path.join(self.config.transactions_directory, cur)
+                for cur in changes['transactions']])
+        if self._transactions is not None and ('receipts' in changes or 'transactions' in changes):
+            self._transactions.link_receipts(self.receipts)
+
+    def _get_subsystem(self, name):
+        if name == 'accounts':
+            return self.account_manager
+        if name not in self.subsystems:
+            raise UndefinedCommandException('Unknown subsystem: {}'.format(name))
+        return getattr(self, name)
+
+    def load_data(self, requires=None):
+        """Load the given subsystems. (Default: all of them.)"""
+        if requires is None:
+            requires = self.subsystems
+        for cur in requires:
+            self._get_subsystem(cur)
 
     def list_accounts(self):
         self.account_manager.show_summary()
@@ -56,35 +174,173 @@ class Banker(object):
         print('='*50)
         self.show_schedule()
 
+    def compile_snapshot(self):
+        """Write (or update) the snapshot of all of the data."""
+        builders = {
+            cur: getattr(self, '_build_{}'.format(cur))
+            for cur in self.subsystems
+        }
+        snapshot = self.snapshot or pybanker.snapshot.Snapshot()
+        results = snapshot.compile(builders)
+        for cur_name, cur_result in results.items():
+            print('{:15s} {}'.format(cur_name, cur_result))
+        print('Snapshot: {}'.format(snapshot.path))
+
+    def verify(self):
+        """The data was already verified (by __call__), so just report it."""
+        print('Data verified.')
+
+    def query_transactions(self, start=None, end=None, payee=None, category=None,
+                           min_amount=None, max_amount=None, receipt=None):
+        """Show the transactions that match all of the given filters."""
+        found = self.transactions.query(
+            start=start, end=end, payee=payee, category=category,
+            min_amount=min_amount, max_amount=max_amount, receipt=receipt)
+        for cur in found:
+            print('{} {:>12} {:30s} {}'.format(
+                cur.date_string, cur.amount_string, str(cur.get('payee', '')),
+                cur.transaction_id[:12]))
+        print('Found: {}'.format(len(found)))
+
+    def index_receipts(self):
+        """Hash the new and changed receipt files."""
+        index = self.receipts.update_hashes()
+        print('Receipts: {} (hashed: {}, unchanged: {})'.format(
+            len(index.entries), index.hashed, index.skipped))
+
+    def upcoming_bills(self, count=None, start=None):
+        """Show the next `count` scheduled bills, due on or after `start` (default: today)."""
+        if count is None:
+            count = 20
+        for cur_dt, cur_item in self.schedule.upcoming(count, after=start):
+            print('{} {:>12} {:30s} {}'.format(
+                cur_dt.isoformat(), str(cur_item.amount), str(cur_item.payee), cur_item.name))
+
+    def forecast(self, months=None):
+        """Show the forecast balance at the end of each month, per account."""
+        if months is None:
+            months = 12
+        result = pybanker.forecast.Forecast(self.schedule, self.transactions).run(months=months)
+        for cur_account in sorted(result.balances, key=str):
+            print('Account: {}'.format(cur_account or '(none)'))
+            for cur_dt, cur_balance in result.month_ends(cur_account):
+                print('  {} {:>14.2f}'.format(cur_dt.isoformat(), cur_balance))
+            low_dt, low_balance = result.lowest(cur_account)
+            print('  Lowest: {:.2f} on {}'.format(low_balance, low_dt.isoformat()))
+
+    def reconcile(self, start=None, end=None):
+        """Match the scheduled bills with the transactions and show the problems."""
+        report = pybanker.reconcile.Reconciler(self.schedule, self.transactions).run(
+            start=start, end=end)
+        for cur in report.entries:
+            if cur.status == pybanker.reconcile.PAID:
+                continue
+            print('{:10s} {} {:30s} {:>12} {}'.format(
+                cur.status, (cur.due or cur.date).isoformat(), str(cur.payee),
+                '' if cur.amount is None else '{:.2f}'.format(cur.amount),
+                cur.item_name or cur.transaction_id[:12]))
+        print(', '.join('{}: {}'.format(*cur) for cur in report.counts().items()))
+
+    def serve(self):
+        """Keep the data loaded and run the CLI's commands. (Until stop-daemon.)"""
+        pybanker.daemon.DaemonServer(self).serve()
+
+    def stop_daemon(self):
+        try:
+            response = pybanker.daemon.DaemonClient().stop()
+        except pybanker.daemon.DaemonNotRunning:
+            print('No daemon running.')
+            return
+        print(response['output'], end='')
+
+    def show_coverage(self, year=None):
+        """Show the statement coverage of each statements dir, by month. (Default: this year.)"""
+        if year is None:
+            year = datetime.date.today().year
+        coverage = pybanker.statement_coverage.StatementCoverage()
+        symbols = {
+            pybanker.statement_coverage.CELL_NONE: '.',
+            pybanker.statement_coverage.CELL_PRESENT: '+',
+            pybanker.statement_coverage.CELL_NULL: 'n',
+            pybanker.statement_coverage.CELL_KNOWN_MISSING: 'k',
+            pybanker.statement_coverage.CELL_MISSING: 'X',
+        }
+        print('{:40s} {}'.format(f'Coverage {year}', 'JFMAMJJASOND'))
+        for (cur_slug, cur_dir), cur_cells in coverage.year_cells(year).items():
+            print('{:40s} {}'.format(
+                f'{cur_slug}/{cur_dir}', ''.join(symbols[cur] for cur in cur_cells)))
+
+    def missing_statements(self, month=None):
+        """Show the statements dirs missing a statement for `month`. (Default: last month.)"""
+        if month is None:
+            first_of_month = datetime.date.today().replace(day=1)
+            last_month = first_of_month - datetime.timedelta(days=1)
+            month = (last_month.year, last_month.month)
+        coverage = pybanker.statement_coverage.StatementCoverage()
+        missing = coverage.missing(*month)
+        for cur_slug, cur_dir in missing:
+            print(f'{cur_slug}/{cur_dir}')
+        print('Missing ({}-{:02d}): {}'.format(month[0], month[1], len(missing)))
+
+    def _show_rollup(self, kind, year=None):
+        rollups = pybanker.rollups.Rollups()
+        period_name = 'Year' if year is None else f'{year}-MM'
+        print('{:8s} {:30s} {:>14s}'.format(period_name, kind.title(), 'Total'))
+        for cur_period, cur_key, cur_cents in rollups.report(kind, year=year):
+            print('{:<8} {:30s} {:>14.2f}'.format(cur_period, str(cur_key), cur_cents / 100))
+
+    def category_report(self, year=None):
+        """Show the split totals by category, per year (or per month of `year`)."""
+        self._show_rollup('category', year=year)
+
+    def payee_report(self, year=None):
+        """Show the transaction totals by payee, per year (or per month of `year`)."""
+        self._show_rollup('payee', year=year)
+
+    def _get_command(self, command):
+        for cur in self.config.commands:
+            if cur['option'] == command:
+                return cur
+        msg = 'Bad command: {}'.format(command)
+        self.logger.fatal(msg)
+        raise UndefinedCommandException(msg)
+
     def _get_command_routine(self, command):
         """
         """
-        command_lookup = dict()
-        for cur in self.config.commands:
-            command_lookup[cur['option']] = cur['routine']
-        routine_name = command_lookup.get(command, None)
+        routine_name = self._get_command(command)['routine']
         self.logger.debug('Routine name: {}'.format(routine_name))
-        if routine_name is None:
-            msg = 'Bad command: {}'.format(command)
-            self.logger.fatal(msg)
-            raise UndefinedCommandException(msg)
         routine = getattr(self, routine_name)
         return routine
 
-    def verify_data(self):
-        """
-        """
+    def verify_data(self, requires=None):
+        """Verify the given subsystems. (Default: all of them.)"""
         # TODO verify that required data files exist and are in the correct format
         # TODO verify that every receipt has a corresponding transaction
         # self.receipts.receipts
         # TODO move all verify steps to when the data is loaded
-        self.transactions.verify_data()
-        self.receipts.verify_data()
+        if requires is None:
+            requires = self.subsystems
+        # Only the inputs that changed since their last successful verification get checked.
+        ledger = pybanker.ledger.VerificationLedger(full_verify=self.full_verify)
+        try:
+            if 'accounts' in requires:
+                self.account_manager.verify_data(ledger=ledger)
+            if 'transactions' in requires:
+                self.transactions.verify_data(ledger=ledger)
+            if 'receipts' in requires:
+                self.receipts.verify_data(ledger=ledger)
+        finally:
+            ledger.save()
 
-    def __call__(self, command):
+    def __call__(self, command, **kwargs):
+        """Run `command`. Any kwargs are passed on to the command's routine."""
         self.logger.debug('Main running command: {}'.format(command))
-        self.verify_data()
-        (self._get_command_routine(command))()
+        requires = self._get_command(command).get('requires', self.subsystems)
+        self.logger.debug('Command requires: {}'.format(requires))
+        self.load_data(requires)
+        self.verify_data(requires)
+        (self._get_command_routine(command))(**kwargs)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 """
 Classes related to the accounts.
 """
+import concurrent.futures
 import dataclasses
 import datetime
 import functools
@@ -9,6 +10,7 @@ import typing
 
 import yaml
 
+import pybanker.cache
 import pybanker.frequency_utils
 import pybanker.shared
 import pybanker.statements
@@ -20,22 +22,27 @@ class AccountConfigException(Exception):
 
 @dataclasses.dataclass
 class AccountManager:
+    # Only load these accounts (and the accounts they share statements with).
+    # Only their dirs are read. (Default: all of the accounts.)
+    slugs: typing.Optional[list[str]] = None
+    # Threads used to load the accounts. (Default: GlobalConfig.account_workers.)
+    workers: typing.Optional[int] = None
 
     def __post_init__(self):
-        self.global_config = pybanker.shared.GlobalConfig()
+        self.global_config = pybanker.shared.get_config()
         self.logger = self.global_config.build_logger(self)
+        if self.workers is None:
+            self.workers = self.global_config.account_workers
+        # Accounts loaded by get_account(). (Before `accounts` was used.)
+        self._loaded = dict()
 
     @property
     def data_directory(self):
         return pathlib.Path(self.global_config.accounts_directory)
 
-    @functools.cached_property
-    def accounts(self):
-        self.logger.debug(f'Loading accounts: {self.data_directory}')
-        if not self.data_directory.exists():
-            msg = f'Account directory not found: {self.data_directory}'
-            raise AccountConfigException(msg)
-        accounts = dict()
+    def find_account_dirs(self):
+        """Return the (sorted) account dirs."""
+        found = []
         for cur in sorted(self.data_directory.iterdir()):
             if not cur.is_dir():
                 self.logger.debug('Skipping non-dir: %s', cur)
@@ -43,21 +50,97 @@ class AccountManager:
             if cur.stem.startswith('.'):
                 self.logger.debug('Skipping dotdir: %s', cur)
                 continue
-            try:
-                new_account = _SingleAccount(cur)
-            except Exception as exc:
-                self.logger.exception(exc)
-                self.logger.error('Could not create account: %s', cur)
-                raise
-            accounts[new_account.slug] = new_account
-            self.logger.debug('Added account: {}'.format(new_account.slug))
+            found.append(cur)
+        return found
+
+    def load_account(self, account_dir):
+        """Load the account in one dir. (It is not added to `accounts`.)"""
+        return _SingleAccount(account_dir)
+
+    def _slug_dirs(self, slugs):
+        """Return the dirs of the given accounts. (Without listing the accounts dir.)"""
+        missing = [
+            cur for cur in slugs
+            if cur.startswith('.') or '/' in cur or not (self.data_directory / cur).is_dir()]
+        if missing:
+            raise AccountConfigException(f'Unknown account(s): {", ".join(sorted(missing))}')
+        return [self.data_directory / cur for cur in sorted(slugs)]
+
+    def _load_accounts(self, account_dirs):
+        """Build a _SingleAccount for each dir. Returns {slug: account}, in the given order."""
+        accounts = dict()
+        # Loading is mostly waiting on the file system, so threads are enough.
+        # The results are still added (and errors raised) in the given order.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.load_account, cur) for cur in account_dirs]
+            for cur, cur_future in zip(account_dirs, futures):
+                try:
+                    new_account = cur_future.result()
+                except Exception as exc:
+                    pool.shutdown(cancel_futures=True)
+                    self.logger.exception(exc)
+                    self.logger.error('Could not create account: %s', cur)
+                    raise
+                accounts[new_account.slug] = new_account
+                self.logger.debug('Added account: {}'.format(new_account.slug))
+        return accounts
+
+    def _load_slugs(self, slugs):
+        """Load the given accounts, plus the accounts their statements are shared with."""
+        accounts = dict()
+        pending = set(slugs)
+        while pending:
+            accounts.update(self._load_accounts(self._slug_dirs(pending)))
+            shared = set(
+                cur.index_data.shared_statement_account for cur in accounts.values())
+            pending = shared - set(accounts) - {None}
+        return {cur: accounts[cur] for cur in sorted(accounts)}
+
+    @functools.cached_property
+    def accounts(self):
+        self.logger.debug(f'Loading accounts: {self.data_directory}')
+        if not self.data_directory.exists():
+            msg = f'Account directory not found: {self.data_directory}'
+            raise AccountConfigException(msg)
+        if self.slugs is None:
+            accounts = self._load_accounts(self.find_account_dirs())
+        else:
+            accounts = self._load_slugs(self.slugs)
         self.logger.debug('Number accounts found: %d', len(accounts))
         return accounts
 
-    def verify_data(self):
+    def get_account(self, slug):
+        """Return one account, loading it (and only it) if it was not loaded yet."""
+        if 'accounts' in self.__dict__ and slug in self.accounts:
+            return self.accounts[slug]
+        if slug not in self._loaded:
+            self._loaded.update(self._load_slugs([slug]))
+        return self._loaded[slug]
+
+    def reload(self, slugs):
+        """Reload the given accounts (changed, added or removed).
+
+        Accounts that share the statements of a reloaded account are reloaded too.
+        """
+        accounts = self.accounts
+        changed = set(slugs)
+        changed.update(
+            cur_slug for cur_slug, cur in accounts.items()
+            if cur.index_data.shared_statement_account in changed)
+        found = {cur.stem: cur for cur in self.find_account_dirs()}
+        if self.slugs is not None:
+            found = {cur: found[cur] for cur in found if cur in accounts}
+        reloaded = self._load_accounts([found[cur] for cur in sorted(changed) if cur in found])
+        self.accounts = {
+            cur: reloaded[cur] if cur in reloaded else accounts[cur]
+            for cur in sorted(found) if cur in reloaded or cur in accounts}
+        self._loaded.clear()
+        self.logger.debug('Reloaded accounts: %s', sorted(reloaded))
+
+    def verify_data(self, ledger=None):
         self.logger.debug('Verifying account data.')
         for cur_name, cur_obj in self.accounts.items():
-            cur_obj.verify_data()
+            cur_obj.verify_data(ledger=ledger)
 
     def show_summary(self):
         print('Accounts')
@@ -66,7 +149,7 @@ class AccountManager:
             print(cur_obj.get_summary_output())
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class _AccountIndexData:
     index_path: pathlib.Path
     slug: str
@@ -90,18 +173,13 @@ class _AccountIndexData:
     # legacy/unused???
     statement_date: typing.Optional[str] = None
 
-    def __post_init__(self):
-        self.global_config = pybanker.shared.GlobalConfig()
-        self.logger = self.global_config.build_logger(self)
-
     @classmethod
     def from_file(cls, slug: str, index_path: pathlib.Path):
-        global_config = pybanker.shared.GlobalConfig()
+        global_config = pybanker.shared.get_config()
         logger = global_config.build_logger(cls)
         logger.debug('Reading index file: %s', index_path)
         try:
-            with open(index_path, 'r') as fp:
-                data = yaml.safe_load(fp)
+            data = pybanker.cache.load_yaml(index_path)
         except FileNotFoundError:
             msg = f'Account missing index file: {index_path}'
             raise AccountConfigException(msg)
@@ -131,7 +209,7 @@ class _SingleAccount:
 
     def __post_init__(self):
         """Initialize the computed values."""
-        self.global_config = pybanker.shared.GlobalConfig()
+        self.global_config = pybanker.shared.get_config()
         self.logger = self.global_config.build_logger(self)
         self.logger.debug('Loadding account from dir: %s', self.data_directory)
         self.path = pathlib.Path(self.data_directory)
@@ -145,7 +223,6 @@ class _SingleAccount:
             account_index_data=self.index_data,
         )
         self._verify_core_data()
-        self.statements_manager.verify()
 
     def has_shared_statements(self):
         # TODO verify that the shared account actually exists.
@@ -200,6 +277,10 @@ class _SingleAccount:
         """
         return
 
+    def verify_data(self, ledger=None):
+        """Verify the statements. (Missing statements are logged.)"""
+        self.statements_manager.verify(ledger=ledger)
+
     def build_summary_data(self):
         """Build a dictionary with the "summary data" for this account."""
         data = {
@@ -0,0 +1,215 @@
+"""
+Load and verify many data dirs ("tenants") in parallel.
+
+Each tenant runs in its own process (with its own GlobalConfig, see `data_dir`),
+so a tenant that hangs can be killed when it runs out of time.
+The tenant processes aren't daemonic, so they can have their own process pools
+(GlobalConfig.transaction_workers). Each one leads its own process group (POSIX),
+so killing it also kills its pool workers.
+At most `workers` tenants run at the same time.
+The results are collected into one JSON report:
+    {
+        "started": "...", "seconds": 12.3, "workers": 8, "timeout": 300.0,
+        "summary": {"ok": 98, "failed": 1, "timeout": 1},
+        "tenants": [{"data_dir": "...", "status": "ok", "seconds": 0.4, ...}, ...]
+    }
+"""
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+
+import pybanker
+import pybanker.shared
+
+OK = 'ok'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+_DEFAULT_TIMEOUT = 300.0
+
+
+def load_manifest(file_name):
+    """Return the data dirs listed in a manifest file. (One per line, '#' starts a comment.)"""
+    base_dir = os.path.dirname(os.path.abspath(file_name))
+    data_dirs = []
+    with open(file_name, 'r') as fp:
+        for cur in fp:
+            cur = cur.split('#', 1)[0].strip()
+            if cur:
+                data_dirs.append(os.path.join(base_dir, os.path.expanduser(cur)))
+    return data_dirs
+
+
+def verify_tenant(data_dir, config_file=None, full_verify=False):
+    """Load and verify one data dir. Returns its report entry."""
+    started = time.perf_counter()
+    result = {'data_dir': data_dir, 'status': OK, 'error': None}
+    try:
+        pybanker.shared.set_config(
+            pybanker.shared.GlobalConfig(config_file=config_file, data_dir=data_dir))
+        bank = pybanker.Banker(full_verify=full_verify)
+        bank.load_data()
+        bank.verify_data()
+        result['accounts'] = len(bank.account_manager.accounts)
+        result['transactions'] = len(bank.transactions.transactions)
+        result['receipts'] = len(bank.receipts.receipts)
+    except Exception as exc:
+        result.update(status=FAILED, error=f'{exc.__class__.__name__}: {exc}')
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _tenant_main(conn, data_dir, config_file, full_verify):
+    """Runs in the tenant's process. Sends the result back over `conn`."""
+    if hasattr(os, 'setpgid'):
+        os.setpgid(0, 0)
+    conn.send(verify_tenant(data_dir, config_file=config_file, full_verify=full_verify))
+    conn.close()
+
+
+class BatchRunner(object):
+
+    def __init__(self, data_dirs, config_file=None, workers=None, timeout=None,
+                 full_verify=False):
+        """
+        data_dirs: the data dirs to verify.
+        config_file: the settings (other than data_dir) for every tenant. (Optional.)
+        workers: tenants that run at the same time. (Default: one per CPU.)
+        timeout: seconds each tenant gets before it is killed. (Default: 300)
+        full_verify: verify everything, even the inputs that the ledgers say are unchanged.
+        """
+        self.logger = logging.getLogger(
+            '.'.join([pybanker.shared.GlobalConfig.base_logger_name, self.__class__.__name__]))
+        self.data_dirs = [os.path.abspath(cur) for cur in data_dirs]
+        self.config_file = None if config_file is None else str(config_file)
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.timeout = timeout if timeout is not None else _DEFAULT_TIMEOUT
+        self.full_verify = full_verify
+
+    def _start(self, index):
+        receive, send = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_tenant_main,
+            args=(send, self.data_dirs[index], self.config_file, self.full_verify))
+        process.start()
+        # Only the tenant writes to the pipe. (So a crash is seen as EOF.)
+        send.close()
+        return receive, (index, process, time.monotonic())
+
+    def _finish(self, conn, process, data_dir, started):
+        try:
+            result = conn.recv()
+        except EOFError:
+            process.join()
+            result = {
+                'data_dir': data_dir, 'status': FAILED,
+                'error': f'Exited without a result (exit code: {process.exitcode})',
+                'seconds': round(time.monotonic() - started, 3)}
+        conn.close()
+        process.join()
+        return result
+
+    def _stop(self, conn, process):
+        """Kill a tenant (and its process group, if it got that far) and wait for it."""
+        if hasattr(os, 'killpg'):
+            # (The tenant may not have made its group yet.)
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+        process.kill()
+        process.join()
+        conn.close()
+
+    def _kill(self, conn, process, data_dir, started):
+        self._stop(conn, process)
+        self.logger.warning('Timed out: %s', data_dir)
+        return {
+            'data_dir': data_dir, 'status': TIMEOUT,
+            'error': f'Killed after {self.timeout}s',
+            'seconds': round(time.monotonic() - started, 3)}
+
+    def run(self):
+        """Verify every tenant and return the report (a dict, see the module docs)."""
+        started_at = datetime.datetime.now().isoformat(timespec='seconds')
+        started = time.perf_counter()
+        results = [None] * len(self.data_dirs)
+        pending = collections.deque(range(len(self.data_dirs)))
+        # conn -> (index, process, started)
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    conn, state = self._start(pending.popleft())
+                    running[conn] = state
+                now = time.monotonic()
+                first_deadline = min(cur[2] for cur in running.values()) + self.timeout
+                ready = multiprocessing.connection.wait(
+                    list(running), timeout=max(0, first_deadline - now))
+                for conn in ready:
+                    index, process, tenant_started = running.pop(conn)
+                    results[index] = self._finish(
+                        conn, process, self.data_dirs[index], tenant_started)
+                now = time.monotonic()
+                for conn, (index, process, tenant_started) in list(running.items()):
+                    if now - tenant_started >= self.timeout:
+                        del running[conn]
+                        results[index] = self._kill(
+                            conn, process, self.data_dirs[index], tenant_started)
+        finally:
+            # E.g. KeyboardInterrupt. (Non-daemonic processes would be waited for at exit.)
+            for conn, (index, process, tenant_started) in running.items():
+                self._stop(conn, process)
+        summary = dict.fromkeys([OK, FAILED, TIMEOUT], 0)
+        for cur in results:
+            summary[cur['status']] += 1
+        return {
+            'started': started_at,
+            'seconds': round(time.perf_counter() - started, 3),
+            'workers': self.workers,
+            'timeout': self.timeout,
+            'summary': summary,
+            'tenants': results,
+        }
+
+
+def main(argv=None):
+    """Entry point of `pybanker-batch`."""
+    cli = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    cli.add_argument('data_dirs', nargs='*', metavar='DATA_DIR', help='Data dirs to verify.')
+    cli.add_argument('--manifest', help='File with more data dirs, one per line.')
+    cli.add_argument('--config', help='Settings for every tenant. (Its data_dir is ignored.)')
+    cli.add_argument('--workers', type=int, help='Tenants to run at once. (Default: CPUs.)')
+    cli.add_argument(
+        '--timeout', type=float, default=_DEFAULT_TIMEOUT,
+        help='Seconds per tenant. (Default: %(default)s)')
+    cli.add_argument('--full-verify', action='store_true', help='Ignore the ledgers.')
+    cli.add_argument('--report', help='Write the JSON report here. (Default: stdout)')
+    args = cli.parse_args(argv)
+    logging.basicConfig(format='[%(levelname)s] %(name)s - %(message)s', level=logging.WARNING)
+    data_dirs = list(args.data_dirs)
+    if args.manifest is not None:
+        data_dirs.extend(load_manifest(args.manifest))
+    if not data_dirs:
+        cli.error('No data dirs given.')
+    report = BatchRunner(
+        data_dirs, config_file=args.config, workers=args.workers, timeout=args.timeout,
+        full_verify=args.full_verify).run()
+    output = json.dumps(report, indent=1)
+    if args.report is None:
+        print(output)
+    else:
+        with open(args.report, 'w') as fp:
+            fp.write(output + '\n')
+    if report['summary'][OK] != len(data_dirs):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,160 @@
+"""
+Persistent cache of parsed YAML files.
+
+Parsing YAML (in pure python) is slow, so the parsed data is pickled into the cache dir.
+An entry is only used if the file's path, size and mtime all still match.
+Each hit touches the entry's mtime, so the eviction order is least recently used.
+(atime can't be used for that, it is frozen or only updated once a day with
+the common noatime and relatime mounts.)
+"""
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+import yaml
+
+import pybanker.shared
+
+# Bump this when the pickled format changes. (Old entries are then ignored.)
+_CACHE_FORMAT = 1
+# The libyaml based loader is MUCH faster, when pyyaml was built with it.
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class YamlCache(object):
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = os.path.join(cache_dir, 'yaml')
+        self.max_bytes = max_bytes
+        # No config lookup here, a cache can be used without a config file.
+        self.logger = logging.getLogger(
+            '.'.join([pybanker.shared.GlobalConfig.base_logger_name, self.__class__.__name__]))
+        self._writable = True
+        self._unchecked_bytes = 0
+
+    def _entry_path(self, file_name):
+        digest = hashlib.sha256(file_name.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.pickle')
+
+    @staticmethod
+    def _parse(file_name):
+        with open(file_name, 'r') as fp:
+            return yaml.load(fp, Loader=_YAML_LOADER)
+
+    def load(self, file_name):
+        """Return the parsed contents of `file_name`, from the cache when possible."""
+        file_name = os.path.abspath(file_name)
+        # Let FileNotFoundError through, the callers handle that.
+        stat = os.stat(file_name)
+        key = (_CACHE_FORMAT, file_name, stat.st_size, stat.st_mtime_ns)
+        entry_path = self._entry_path(file_name)
+        try:
+            with open(entry_path, 'rb') as fp:
+                cached_key, data = pickle.load(fp)
+            if cached_key == key:
+                self._touch(entry_path)
+                return data
+            self.logger.debug('Stale cache entry: %s', file_name)
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            self.logger.warning('Ignoring bad cache entry (%s): %s', entry_path, exc)
+        data = self._parse(file_name)
+        self._store(entry_path, key, data)
+        return data
+
+    def _touch(self, entry_path):
+        """Mark an entry as used now. (See evict.)"""
+        if not self._writable:
+            return
+        try:
+            os.utime(entry_path)
+        except OSError as exc:
+            self.logger.debug('Cannot touch cache entry (%s): %s', entry_path, exc)
+
+    def _store(self, entry_path, key, data):
+        if not self._writable:
+            return
+        # Accounts are loaded in threads, so the tmp file is per thread.
+        tmp_path = f'{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(tmp_path, 'wb') as fp:
+                pickle.dump((key, data), fp, protocol=pickle.HIGHEST_PROTOCOL)
+                size = fp.tell()
+            os.replace(tmp_path, entry_path)
+        except OSError as exc:
+            self.logger.warning('Disabling YAML cache, cannot write (%s): %s', entry_path, exc)
+            self._writable = False
+            return
+        self._unchecked_bytes += size
+        # Don't walk the whole cache after every write.
+        if self._unchecked_bytes > self.max_bytes // 10:
+            self.evict()
+
+    def _entries(self):
+        for dir_entry in os.scandir(self.cache_dir):
+            if not dir_entry.is_dir():
+                continue
+            for cur in os.scandir(dir_entry.path):
+                if cur.name.endswith('.pickle'):
+                    yield cur
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in `max_bytes`.
+
+        The entries' mtimes are the last time they were used. (Written or hit, see _touch.)
+        """
+        self._unchecked_bytes = 0
+        try:
+            entries = []
+            total = 0
+            for cur in self._entries():
+                stat = cur.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, cur.path))
+                total += stat.st_size
+        except FileNotFoundError:
+            return
+        if total <= self.max_bytes:
+            return
+        self.logger.debug('Evicting cache entries, size: %d > %d', total, self.max_bytes)
+        for used_at, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for cur in list(self._entries()):
+            os.remove(cur.path)
+
+
+@functools.cache
+def _get_cache(cache_dir, max_bytes):
+    return YamlCache(cache_dir, max_bytes)
+
+
+def get_cache():
+    """Return the YamlCache for the shared config. (None if caching is disabled.)"""
+    config = pybanker.shared.get_config()
+    if not config.use_cache:
+        return None
+    return _get_cache(config.cache_dir, config.cache_max_bytes)
+
+
+def load_yaml(file_name):
+    """Parse a YAML file, using the cache when it is enabled."""
+    cache = get_cache()
+    if cache is None:
+        return YamlCache._parse(file_name)
+    return cache.load(file_name)
+
+
+if __name__ == '__main__':
+    pass
@@ -2,11 +2,23 @@
 Command line tool to mange your finances.
 """
 import argparse
+import datetime
 import logging
+import sys
 
+import pybanker.daemon
 import pybanker.shared
 
 
+def _parse_month(value):
+    """'YYYY-MM' -> (year, month)"""
+    try:
+        month_dt = datetime.datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Not a YYYY-MM month: {value}')
+    return month_dt.year, month_dt.month
+
+
 class PyBankerCli(object):
 
     def __init__(self):
@@ -15,7 +27,7 @@ class PyBankerCli(object):
         self._init_cli()
 
     def _init_vars(self):
-        self.global_config = pybanker.shared.GlobalConfig()
+        self.global_config = pybanker.shared.get_config()
         self.logger = None
         self.command = None
 
@@ -42,6 +54,42 @@ class PyBankerCli(object):
             choices=['debug', 'info', 'warning', 'error', 'fatal'],
             help='Change logging level.'
         )
+        self.cli.add_argument(
+            '--full-verify',
+            action='store_true',
+            help='Verify all of the data, not just what changed since the last verify.'
+        )
+        self.cli.add_argument(
+            '--account',
+            action='append',
+            dest='accounts',
+            metavar='SLUG',
+            help='Only load (and show) this account. (Can be repeated.)'
+        )
+        self.cli.add_argument(
+            '--no-daemon',
+            action='store_true',
+            help='Run the command in this process, even if a daemon is running.'
+        )
+        query_opts = self.cli.add_argument_group('query options')
+        query_opts.add_argument(
+            '--start', type=datetime.date.fromisoformat, help='First date (YYYY-MM-DD).')
+        query_opts.add_argument(
+            '--end', type=datetime.date.fromisoformat, help='Last date (YYYY-MM-DD).')
+        query_opts.add_argument('--payee', help='Exact payee.')
+        query_opts.add_argument('--category', help='Exact split category.')
+        query_opts.add_argument('--min-amount', type=float, help='Smallest amount.')
+        query_opts.add_argument('--max-amount', type=float, help='Largest amount.')
+        query_opts.add_argument('--receipt', help='Receipt file name (e.g. /receipts/...).')
+        self.cli.add_argument(
+            '--year', type=int, help='Only report on this year. (For the report commands.)')
+        self.cli.add_argument(
+            '--count', type=int, help='Number of bills to show. (For upcoming-bills.)')
+        self.cli.add_argument(
+            '--months', type=int, help='Months to forecast. (For forecast, default: 12.)')
+        self.cli.add_argument(
+            '--month', type=_parse_month,
+            help='Month (YYYY-MM) to check. (For missing-statements.)')
         command_opts = [cur['option'] for cur in self.global_config.commands]
         default_command = command_opts[0]
         self.cli.add_argument(
@@ -67,18 +115,67 @@ class PyBankerCli(object):
             logging.getLogger('').setLevel(level)
         self.command = self.args.command
         self.logger.debug('Command: {}'.format(self.command))
+        self._check_command_options()
+
+    def _check_command_options(self):
+        """Reject the per-command options that the command doesn't take."""
+        taken = set(self._command_config().get('arguments', []))
+        all_arguments = set()
+        for cur in self.global_config.commands:
+            all_arguments.update(cur.get('arguments', []))
+        ignored = sorted(
+            cur for cur in all_arguments - taken if getattr(self.args, cur) is not None)
+        if ignored:
+            options = ', '.join('--' + cur.replace('_', '-') for cur in ignored)
+            self.cli.error(f'Not an option of {self.command}: {options}')
+
+    def _command_config(self):
+        for cur in self.global_config.commands:
+            if cur['option'] == self.command:
+                return cur
+        return {}
+
+    def command_arguments(self):
+        """The parsed options that the command takes."""
+        arguments = self._command_config().get('arguments', [])
+        return {name: getattr(self.args, name) for name in arguments}
+
+    def run_in_daemon(self):
+        """Run the command in the daemon. Returns False if it has to run in this process."""
+        if self.args.no_daemon or self._command_config().get('local'):
+            return False
+        # The daemon has all of the accounts loaded and its own verification settings.
+        if self.args.full_verify or self.args.accounts is not None:
+            return False
+        try:
+            response = pybanker.daemon.DaemonClient().run(
+                self.command, self.command_arguments())
+        except pybanker.daemon.DaemonNotRunning as exc:
+            self.logger.debug(exc)
+            return False
+        sys.stdout.write(response['output'])
+        if response['error'] is not None:
+            self.logger.fatal(response['error'])
+            raise SystemExit(response['exit'])
+        return True
 
     def __call__(self):
         self.logger.debug('Inside call.')
         self.parse_args()
+        if self.run_in_daemon():
+            return
         try:
-            bank = pybanker.Banker()
-            bank(self.command)
+            bank = pybanker.Banker(
+                full_verify=self.args.full_verify, account_slugs=self.args.accounts)
+            bank(self.command, **self.command_arguments())
         except pybanker.shared.ConfigError:
             raise
         except pybanker.accounts.AccountConfigException as exc:
             self.logger.fatal(exc)
             raise SystemExit(11)
+        except pybanker.daemon.DaemonError as exc:
+            self.logger.fatal(exc)
+            raise SystemExit(1)
 
 
 def main():
@@ -0,0 +1,303 @@
+"""
+Keep the data loaded and serve the CLI's commands over a Unix socket.
+
+The socket is in the data dir's cache dir (GlobalConfig.daemon_socket_file).
+Each connection is one request (a line of JSON) and one response (JSON, then EOF):
+    request:  {"command": "query", "arguments": {...}}  (or {"shutdown": true})
+    response: {"output": "...", "exit": 0, "error": null}
+Dates in the arguments are sent as {"__date__": "YYYY-MM-DD"}.
+
+The daemon polls the data dir (DataWatcher) and only reloads what changed:
+an account, a transaction file, a top level receipts dir, the schedule or the snapshot.
+(There is no inotify in the standard library.) A full poll digests the whole data dir,
+so it only runs every poll_seconds. Before a command only the top level entries are
+stat()ed, an edit deeper down (e.g. in an account dir) is picked up by the next full poll.
+Commands run one at a time, with their printed output captured.
+"""
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import time
+
+import pybanker.accounts
+import pybanker.shared
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonNotRunning(DaemonError):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f'Can not send to the daemon: {value!r}')
+
+
+def _decode(value):
+    if '__date__' in value:
+        return datetime.date.fromisoformat(value['__date__'])
+    return value
+
+
+def _dumps(message):
+    return json.dumps(message, default=_encode).encode('utf-8') + b'\n'
+
+
+def _loads(data):
+    return json.loads(data.decode('utf-8'), object_hook=_decode)
+
+
+def _digest(path):
+    sha_obj = hashlib.sha256()
+    pybanker.shared.digest_tree(sha_obj, path)
+    return sha_obj.hexdigest()
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _entries(top):
+    """The (sorted) names in `top`, except the dot files."""
+    try:
+        names = os.listdir(top)
+    except FileNotFoundError:
+        return []
+    return sorted(cur for cur in names if not cur.startswith('.'))
+
+
+class DataWatcher(object):
+    """Finds what changed in the data dir since the last check."""
+
+    def __init__(self):
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self._signatures = self._scan()
+        self._quick_signature = self.quick_signature()
+
+    def _tops(self):
+        return [
+            ('accounts', self.config.accounts_directory),
+            ('transactions', self.config.transactions_directory),
+            ('receipts', self.config.receipts_directory)]
+
+    def quick_signature(self):
+        """The size and mtime of the schedule, the snapshot, the top dirs and their entries.
+
+        Cheap (no file is read), but misses changes below the top level entries.
+        """
+        paths = [self.config.schedule_file, self.config.snapshot_file]
+        for unused, top in self._tops():
+            paths.append(top)
+            paths.extend(os.path.join(top, cur) for cur in _entries(top))
+        return [(cur, _stat_signature(cur)) for cur in paths]
+
+    def quick_changed(self):
+        """True if quick_signature() changed since the last changes() call."""
+        return self.quick_signature() != self._quick_signature
+
+    def _scan(self):
+        """subsystem -> {name: signature}"""
+        signatures = {
+            'schedule': {'schedule': _digest(self.config.schedule_file)},
+            # E.g. `pybanker compile` run outside of the daemon.
+            'snapshot': {'snapshot': _digest(self.config.snapshot_file)},
+        }
+        for name, top in self._tops():
+            signatures[name] = {cur: _digest(os.path.join(top, cur)) for cur in _entries(top)}
+        return signatures
+
+    def changes(self):
+        """Return {subsystem: changed (or added or removed) names} since the last call.
+
+        The names are: the account slugs, the transaction file names
+        and the top level receipts dirs (or files).
+        """
+        self._quick_signature = self.quick_signature()
+        signatures = self._scan()
+        changes = {}
+        for name, current in signatures.items():
+            previous = self._signatures[name]
+            changed = {
+                cur for cur in previous.keys() | current.keys()
+                if previous.get(cur) != current.get(cur)}
+            if changed:
+                changes[name] = changed
+        self._signatures = signatures
+        if changes:
+            self.logger.debug('Data changed: %s', changes)
+        return changes
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Just checking that the daemon is up. (See DaemonClient.is_running.)
+            return
+        try:
+            request = _loads(line)
+        except ValueError as exc:
+            response = {'output': '', 'exit': 1, 'error': f'Bad request: {exc}'}
+        else:
+            response = self.server.run_request(request)
+        self.wfile.write(_dumps(response))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+
+    def __init__(self, banker, path=None, poll_seconds=None):
+        """
+        banker: the (loaded) Banker that runs the commands.
+        path: the socket file. (Default: GlobalConfig.daemon_socket_file)
+        poll_seconds: how often to check for changed data files.
+            (Default: GlobalConfig.daemon_poll_seconds)
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.banker = banker
+        self.path = path if path is not None else self.config.daemon_socket_file
+        self.poll_seconds = (
+            poll_seconds if poll_seconds is not None else self.config.daemon_poll_seconds)
+        # handle_request() waits at most this long, so the data still gets polled when idle.
+        self.timeout = self.poll_seconds
+        self.watcher = DataWatcher()
+        self.stopping = False
+        self._polled_at = time.monotonic()
+        self._remove_stale_socket()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Only this user can connect.
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(self.path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        if DaemonClient(self.path).is_running():
+            raise DaemonError(f'A daemon is already running: {self.path}')
+        self.logger.debug('Removing stale socket: %s', self.path)
+        os.unlink(self.path)
+
+    def poll(self):
+        """Reload whatever changed in the data dir."""
+        self._polled_at = time.monotonic()
+        changes = self.watcher.changes()
+        if not changes:
+            return
+        try:
+            self.banker.reload(changes)
+        except Exception as exc:
+            # Start over, so the next command loads everything (and reports the problem).
+            self.logger.error('Reload failed, unloading the data: %s', exc)
+            self.banker.unload()
+
+    def handle_timeout(self):
+        self.poll()
+
+    def _run_command(self, command, arguments):
+        output = io.StringIO()
+        response = {'exit': 0, 'error': None}
+        try:
+            with contextlib.redirect_stdout(output):
+                self.banker(command, **arguments)
+        except pybanker.accounts.AccountConfigException as exc:
+            response.update(exit=11, error=str(exc))
+        except Exception as exc:
+            self.logger.exception(exc)
+            response.update(exit=1, error=f'{exc.__class__.__name__}: {exc}')
+        response['output'] = output.getvalue()
+        return response
+
+    def run_request(self, request):
+        if request.get('shutdown'):
+            self.stopping = True
+            return {'output': 'Daemon stopped.\n', 'exit': 0, 'error': None}
+        command = request.get('command')
+        local = [cur['option'] for cur in self.config.commands if cur.get('local')]
+        if command in local:
+            return {'output': '', 'exit': 1, 'error': f'Not a daemon command: {command}'}
+        # Catch up with any changes first. (The full poll is left to serve(), when it is due.)
+        if self.watcher.quick_changed():
+            self.poll()
+        started = time.perf_counter()
+        response = self._run_command(command, request.get('arguments') or {})
+        self.logger.debug('Ran %s in %.3fs', command, time.perf_counter() - started)
+        return response
+
+    def serve(self):
+        """Handle requests until a shutdown request."""
+        self.logger.info('Daemon listening: %s', self.path)
+        try:
+            while not self.stopping:
+                self.handle_request()
+                if time.monotonic() - self._polled_at >= self.poll_seconds:
+                    self.poll()
+        finally:
+            self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+
+class DaemonClient(object):
+
+    def __init__(self, path=None):
+        """path: the socket file. (Default: GlobalConfig.daemon_socket_file)"""
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.path = path if path is not None else self.config.daemon_socket_file
+
+    def request(self, message):
+        """Send one request and return the response. (Raises DaemonNotRunning.)"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with sock:
+            try:
+                sock.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError) as exc:
+                raise DaemonNotRunning(f'No daemon at {self.path}: {exc}')
+            sock.sendall(_dumps(message))
+            with sock.makefile('rb') as fp:
+                data = fp.read()
+        if not data:
+            raise DaemonError(f'No response from the daemon: {self.path}')
+        return _loads(data)
+
+    def is_running(self):
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            with sock:
+                sock.connect(self.path)
+        except OSError:
+            return False
+        return True
+
+    def run(self, command, arguments=None):
+        """Run a command in the daemon. Returns the response. (Raises DaemonNotRunning.)"""
+        self.logger.debug('Sending to the daemon: %s', command)
+        return self.request({'command': command, 'arguments': arguments or {}})
+
+    def stop(self):
+        return self.request({'shutdown': True})
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,182 @@
+"""
+Cash flow and balance forecast.
+
+Amounts follow the data files: a positive amount is money spent, a negative one is money in.
+The balances are relative (they start at 0 at the beginning of the history).
+
+Each account's cash flows are added into an array of daily deltas (in cents, indexed by
+day ordinal - first day). The balances are then a cumulative sum over that array.
+Scheduled items are not expanded date by date: each item adds its amount at its first
+due date (or month), then a running sum with the item's step fills in the later dates.
+"""
+import array
+import dataclasses
+import datetime
+import itertools
+import operator
+
+import pybanker.schedule
+import pybanker.shared
+
+
+@dataclasses.dataclass
+class ForecastResult:
+    first_day: datetime.date
+    # First day of the forecast. (The days before it are history.)
+    start: datetime.date
+    # Account (None: no account) -> daily balances, in cents.
+    balances: dict[object, array.array]
+
+    def balance_on(self, account, day):
+        return self.balances[account][(day - self.first_day).days] / 100
+
+    def month_ends(self, account):
+        """Yield (date, balance) for the last day of each forecast month."""
+        series = self.balances[account]
+        first = self.first_day.toordinal()
+        for offset in range((self.start - self.first_day).days, len(series)):
+            cur_dt = datetime.date.fromordinal(first + offset)
+            if offset == len(series) - 1 or (cur_dt + datetime.timedelta(days=1)).day == 1:
+                yield cur_dt, series[offset] / 100
+
+    def lowest(self, account):
+        """Return the (date, balance) of the lowest forecast balance."""
+        series = self.balances[account]
+        offset = (self.start - self.first_day).days
+        future = series[offset:]
+        low = min(future)
+        return self.first_day + datetime.timedelta(days=offset + future.index(low)), low / 100
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
+
+
+class Forecast(object):
+
+    def __init__(self, schedule, transactions=None, history_days=90):
+        """
+        schedule: a Schedule. (Every active item is a recurring cash flow.)
+        transactions: a Transactions, for the history. (Optional.)
+        history_days: days of history before the start of the forecast.
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.schedule = schedule
+        self.transactions = transactions
+        self.history_days = history_days
+
+    def _deltas(self, deltas, account, size):
+        if account not in deltas:
+            deltas[account] = array.array('q', bytes(8 * size))
+        return deltas[account]
+
+    def _add_history(self, deltas, first, start, size):
+        store = self.transactions.transactions
+        rows = self.transactions.indexes.rows_by_date(first, start - datetime.timedelta(days=1))
+        first_ordinal = first.toordinal()
+        main_extras = store.main.extras
+        for cur in rows:
+            cents = store.amount_cents(cur)
+            if cents is None:
+                continue
+            account = main_extras.get(cur, {}).get('account')
+            self._deltas(deltas, account, size)[store.main.date[cur] - first_ordinal] -= cents
+
+    @staticmethod
+    def _strided_sums(values, step):
+        """In place running sums, `step` apart: values[i] += values[i - step].
+
+        With an amount at the first due date of each item, this puts the summed amounts
+        at every due date of every item. (Items only add one value each, not one per date.)
+        """
+        for cur in range(step, len(values)):
+            values[cur] += values[cur - step]
+
+    def _add_dates(self, deltas, item, cents, first, start, end, size):
+        """Add each of the item's due dates, one at a time."""
+        item_deltas = self._deltas(deltas, item.account, size)
+        for cur in itertools.takewhile(lambda cur: cur <= end, item.occurrences(start)):
+            item_deltas[(cur - first).days] -= cents
+
+    def _add_schedule(self, deltas, first, start, end, size):
+        first_ordinal = first.toordinal()
+        first_month = start.year * 12 + start.month - 1
+        num_months = end.year * 12 + end.month - first_month
+        # (account, step in days) -> amounts at the first due date of each item
+        daily = {}
+        # (account, step in months, day) -> amounts at the first due month of each item
+        monthly = {}
+        for cur_item in self.schedule.values():
+            if not cur_item.active:
+                continue
+            cents = round(cur_item.amount * 100)
+            first_due = next(cur_item.occurrences(start))
+            if cur_item.frequency in pybanker.schedule.DAILY_STEPS:
+                key = (cur_item.account, pybanker.schedule.DAILY_STEPS[cur_item.frequency])
+                if key not in daily:
+                    daily[key] = array.array('q', bytes(8 * size))
+                offset = first_due.toordinal() - first_ordinal
+                if offset < size:
+                    daily[key][offset] += cents
+                continue
+            if cur_item.frequency in pybanker.schedule.MONTHLY_STEPS:
+                step = pybanker.schedule.MONTHLY_STEPS[cur_item.frequency]
+                firsts = [(cur_item.day, first_due)]
+            elif cur_item.frequency == 'semi-monthly' and cur_item.day < 28:
+                # Two monthly series, 15 days apart. (Below the 28th they never collide.)
+                step = 1
+                after = max(start, cur_item.start_date)
+                firsts = [
+                    (cur, pybanker.schedule.first_month_day(after, cur))
+                    for cur in [cur_item.day, cur_item.day + 15]]
+            else:
+                self._add_dates(deltas, cur_item, cents, first, start, end, size)
+                continue
+            for cur_day, cur_due in firsts:
+                key = (cur_item.account, step, cur_day)
+                if key not in monthly:
+                    monthly[key] = array.array('q', bytes(8 * num_months))
+                month = cur_due.year * 12 + cur_due.month - 1 - first_month
+                if month < num_months:
+                    monthly[key][month] += cents
+        for (cur_account, cur_step), cur_amounts in daily.items():
+            self._strided_sums(cur_amounts, cur_step)
+            account_deltas = self._deltas(deltas, cur_account, size)
+            deltas[cur_account] = array.array(
+                'q', map(operator.sub, account_deltas, cur_amounts))
+        end_offset = end.toordinal() - first_ordinal
+        for (cur_account, cur_step, cur_day), cur_amounts in monthly.items():
+            self._strided_sums(cur_amounts, cur_step)
+            account_deltas = self._deltas(deltas, cur_account, size)
+            for cur_month, cur_cents in enumerate(cur_amounts):
+                if cur_cents == 0:
+                    continue
+                offset = pybanker.schedule.month_day(
+                    first_month + cur_month, cur_day).toordinal() - first_ordinal
+                if offset <= end_offset:
+                    account_deltas[offset] -= cur_cents
+
+    def run(self, months=12, start=None):
+        """Forecast `months` months from `start` (default: today). Returns a ForecastResult."""
+        if start is None:
+            start = datetime.date.today()
+        end = _add_months(start, months)
+        first = start - datetime.timedelta(days=self.history_days)
+        size = (end - first).days + 1
+        deltas = {}
+        if self.transactions is not None:
+            self._add_history(deltas, first, start, size)
+        self._add_schedule(deltas, first, start, end, size)
+        if not deltas:
+            self._deltas(deltas, None, size)
+        balances = {
+            cur_account: array.array('q', itertools.accumulate(cur_deltas))
+            for cur_account, cur_deltas in deltas.items()}
+        return ForecastResult(first_day=first, start=start, balances=balances)
+
+
+if __name__ == '__main__':
+    pass
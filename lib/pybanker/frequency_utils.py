@@ -1,17 +1,23 @@
 """
 Classes related to the accounts.
 """
+import bisect
 import datetime
+import logging
+
+import dateutil.relativedelta
 
 import pybanker.shared
 
 # TODO Merge with statements._StatementPeriod
+# days: the fixed length of one period (the legacy, non calendar, mode)
+# step: one calendar period (None: semi-monthly, see FrequencyHelper._nth_step())
 _FREQUENCY_DATA = {
-    'bi-weekly': {'days': 14, 'buffer': 2},
-    'semi-monthly': {'days': 15, 'buffer': 5},
-    'monthly': {'days': 30, 'buffer': 5},
-    'quarterly': {'days': 90, 'buffer': 5},
-    'yearly': {'days': 365, 'buffer': 14},
+    'bi-weekly': {'days': 14, 'buffer': 2, 'step': datetime.timedelta(weeks=2)},
+    'semi-monthly': {'days': 15, 'buffer': 5, 'step': None},
+    'monthly': {'days': 30, 'buffer': 5, 'step': dateutil.relativedelta.relativedelta(months=1)},
+    'quarterly': {'days': 90, 'buffer': 5, 'step': dateutil.relativedelta.relativedelta(months=3)},
+    'yearly': {'days': 365, 'buffer': 14, 'step': dateutil.relativedelta.relativedelta(years=1)},
 }
 
 
@@ -35,14 +41,19 @@ def is_supported_type(period_type):
 
 class FrequencyHelper:
 
-    def __init__(self, frequency, statement_dates, start_dt, end_dt=None):
-        self.config = pybanker.shared.GlobalConfig()
+    def __init__(self, frequency, statement_dates, start_dt, end_dt=None, calendar=False):
+        """
+        calendar: step by real calendar periods (e.g. the same day of each month),
+            instead of a fixed number of days (e.g. 30 for "monthly").
+        """
+        self.config = pybanker.shared.get_config()
         self.logger = self.config.build_logger(self)
         self.frequency = frequency
         try:
             self.frequency_data = _FREQUENCY_DATA[self.frequency]
         except KeyError:
             raise UnknownFrequency(f'Unknown frequency: {self.frequency}')
+        self.calendar = calendar
         self.statement_dates = statement_dates
         # Incoming dates SHOULD be sorted.
         # If not, sorted, sort them and report a warning.
@@ -55,6 +66,10 @@ class FrequencyHelper:
         if self.end_dt is None:
             self.end_dt = _get_today_dt()
         self._buffer_days = None
+        # The next statement date to look at. (Instead of popping them off the list.)
+        self._doc_index = 0
+        # The expected dates checked by the last find_missing_statement_dates(). (Calendar.)
+        self.checked_count = 0
 
     def _get_default_buffer_days(self):
         return self.frequency_data['buffer']
@@ -70,47 +85,102 @@ class FrequencyHelper:
         return self.frequency_data['days']
 
     def _pop_latest_doc(self):
-        if len(self.statement_dates) <= 0:
+        if self._doc_index >= len(self.statement_dates):
             return None
-        next_doc = self.statement_dates.pop(0)
-        self.logger.debug(f'Popped doc with date: {next_doc}')
+        next_doc = self.statement_dates[self._doc_index]
+        self._doc_index += 1
+        self.logger.debug('Popped doc with date: %s', next_doc)
         return next_doc
 
+    def _nth_step(self, anchor_dt, count):
+        """The date `count` periods after `anchor_dt`.
+
+        Always counted from the anchor, so e.g. monthly from Jan 31 gives Feb 28, Mar 31, ...
+        """
+        if not self.calendar:
+            return anchor_dt + datetime.timedelta(days=self.days_delta * count)
+        step = self.frequency_data['step']
+        if step is None:
+            # Semi-monthly: the anchor's day, and 15 days after it, in every month.
+            months, half = divmod(count, 2)
+            return anchor_dt + dateutil.relativedelta.relativedelta(
+                months=months, days=15 * half)
+        return anchor_dt + step * count
+
     def _increment_frequency(self, cur_dt):
-        return cur_dt + datetime.timedelta(days=self.days_delta)
+        return self._nth_step(cur_dt, 1)
 
     def _decrement_frequency(self, cur_dt):
-        return cur_dt - datetime.timedelta(days=self.days_delta)
+        return self._nth_step(cur_dt, -1)
+
+    def _find_missing_calendar_dates(self, first_count=0):
+        """The missing statements, with the expected dates counted from the start date.
+
+        The n-th expected date is always `_nth_step(start_dt, n)`, so month end statements
+        don't drift (Jan 31, Feb 28, Mar 31, ...). A statement is found for an expected date
+        when it is before that date plus the buffer (and after the previous one's),
+        one bisect per expected date.
+        first_count: skip the first this many expected dates. (See `checked_count`.)
+        """
+        missing = list()
+        buffer = datetime.timedelta(days=self.buffer_days)
+        end_dt = self._decrement_frequency(self.end_dt)
+        count = first_count
+        expected_dt = self._nth_step(self.start_dt, count)
+        low = 0
+        if count:
+            low = bisect.bisect_left(self.statement_dates, expected_dt + buffer)
+        while expected_dt < end_dt:
+            count += 1
+            expected_dt = self._nth_step(self.start_dt, count)
+            high = bisect.bisect_left(self.statement_dates, expected_dt + buffer, low)
+            if high == low:
+                missing.append(expected_dt)
+            low = high
+        self.checked_count = count
+        return missing
 
-    def _is_inside_window(self, cur_dt, start_dt):
-        end_dt = self._increment_frequency(start_dt)
-        if cur_dt < (end_dt + datetime.timedelta(days=self.buffer_days)):
-            return True
-        return False
+    def find_missing_statement_dates(self, first_count=0):
+        """Return the dates of the missing statements.
 
-    def find_missing_statement_dates(self):
+        Calendar mode: see _find_missing_calendar_dates(). The expected dates only ever
+        get added to (at the end), so a later end date can resume from `checked_count`.
+        Otherwise the expected dates are counted (in periods) from the start date, or from
+        the last statement found. A single pass over the (sorted) statement dates.
+        """
         self.logger.debug('Searching for missing statements.')
+        if self.calendar:
+            return self._find_missing_calendar_dates(first_count)
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         missing = list()
-        window_start_dt = self.start_dt
+        buffer = datetime.timedelta(days=self.buffer_days)
+        anchor_dt = self.start_dt
+        count = 0
+        window_start_dt = anchor_dt
         latest_doc_dt = self._pop_latest_doc()
         end_dt = self._decrement_frequency(self.end_dt)
-        self.logger.debug(f'Start date: {window_start_dt}')
-        self.logger.debug(f'End date: {end_dt} (orig: {self.end_dt})')
+        self.logger.debug('Start date: %s', window_start_dt)
+        self.logger.debug('End date: %s (orig: %s)', end_dt, self.end_dt)
+        # The next expected date. (Only recalculated when the anchor or count change.)
+        next_dt = self._nth_step(anchor_dt, 1)
         while window_start_dt < end_dt:
-            self.logger.debug(f'Checking: doc={latest_doc_dt}  window_start={window_start_dt}')
             # If there are no more statements, mark all of the rest as missing
             if latest_doc_dt is not None:
-                if self._is_inside_window(latest_doc_dt, start_dt=window_start_dt):
-                    self.logger.debug(f'Found statement: {latest_doc_dt}')
-                    window_start_dt = latest_doc_dt
+                if latest_doc_dt < next_dt + buffer:
+                    if debug:
+                        self.logger.debug('Found statement: %s', latest_doc_dt)
+                    anchor_dt = window_start_dt = latest_doc_dt
+                    count = 0
+                    next_dt = self._nth_step(anchor_dt, 1)
                     latest_doc_dt = self._pop_latest_doc()
                     continue
-            else:
-                self.logger.debug('No more statments.')
             # If "latest_doc_dt" is outside the window, then increment the window first,
             # this should make ""window_start_dt" the DESIRED date, i.e. the "window end".
-            window_start_dt = self._increment_frequency(window_start_dt)
-            self.logger.debug(f'Missing statement: {window_start_dt}')
+            count += 1
+            window_start_dt = next_dt
+            next_dt = self._nth_step(anchor_dt, count + 1)
+            if debug:
+                self.logger.debug('Missing statement: %s', window_start_dt)
             missing.append(window_start_dt)
         return missing
 
@@ -0,0 +1,109 @@
+"""
+Verification ledger.
+
+Records a digest of each verified input (a transaction file, a statements directory,
+a receipts subtree) along with the result of its last successful verification.
+Inputs whose digest has not changed since then are not verified again.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import pybanker.shared
+
+# Bump this when the digests are calculated differently. (Old entries are then ignored.)
+_LEDGER_FORMAT = 1
+
+
+def file_digest(file_name):
+    """sha256 of the file's contents."""
+    with open(file_name, 'rb') as fp:
+        return hashlib.file_digest(fp, 'sha256').hexdigest()
+
+
+def tree_digest(top, *extra):
+    """Digest of the listing (names, sizes and mtimes) under `top`, plus any `extra` strings."""
+    sha_obj = hashlib.sha256()
+    for cur in extra:
+        sha_obj.update(f'{cur}\0'.encode('utf-8'))
+    pybanker.shared.digest_tree(sha_obj, top)
+    return sha_obj.hexdigest()
+
+
+class VerificationLedger(object):
+
+    def __init__(self, path=None, full_verify=False):
+        """
+        path: the ledger file. (Default: GlobalConfig.ledger_file)
+        full_verify: ignore the recorded results and verify everything. (Results still get saved.)
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.path = path if path is not None else self.config.ledger_file
+        self.full_verify = full_verify
+        self.entries = self._read()
+        self.skipped = 0
+        self.verified = 0
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except ValueError as exc:
+            self.logger.warning('Ignoring bad verification ledger (%s): %s', self.path, exc)
+            return {}
+        if data.get('format') != _LEDGER_FORMAT:
+            return {}
+        return data.get('entries', {})
+
+    def is_verified(self, key, digest):
+        if self.full_verify:
+            return False
+        entry = self.entries.get(key)
+        return entry is not None and entry['digest'] == digest
+
+    def record(self, key, digest, result=None):
+        """Record a successful verification. (`result` is any JSON-able summary.)"""
+        self.entries[key] = {
+            'digest': digest,
+            'verified_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'result': result,
+        }
+
+    def forget(self, key):
+        self.entries.pop(key, None)
+
+    def check(self, key, digest, verify):
+        """Run `verify()` unless `key` was already verified with the same digest.
+
+        `verify` returns (ok, result). Only successful results are recorded.
+        Returns True if the input is verified (now or before).
+        """
+        if self.is_verified(key, digest):
+            self.logger.debug('Already verified: %s', key)
+            self.skipped += 1
+            return True
+        self.verified += 1
+        ok, result = verify()
+        if ok:
+            self.record(key, digest, result)
+        else:
+            self.forget(key)
+        return ok
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({'format': _LEDGER_FORMAT, 'entries': self.entries}, fp, indent=1)
+        os.replace(tmp_path, self.path)
+        self.logger.debug(
+            'Saved verification ledger (verified: %d, skipped: %d): %s',
+            self.verified, self.skipped, self.path)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,113 @@
+"""
+Index of the receipt files' contents.
+
+For each receipt (by its relative path, e.g. "/receipts/manual/20210105.pdf"):
+    sha256 of the contents, size, mtime and birth (creation) time (in ns)
+The birth time is None where the platform doesn't record it. (st_ctime is not used,
+on Linux it is the inode change time, so a chmod or a rename changes it.)
+Files are hashed in a thread pool with chunked reads (hashlib.file_digest),
+so a big scanned PDF is never read into memory at once.
+A file whose size and mtime did not change keeps its recorded sha256.
+The index is saved (as JSON) to GlobalConfig.receipt_index_file.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+
+import pybanker.shared
+
+# Bump this when the entries change. (Old files are then ignored.)
+_INDEX_FORMAT = 2
+
+
+def hash_file(file_name):
+    """sha256 hex digest of the file's contents. (Read in chunks.)"""
+    with open(file_name, 'rb') as fp:
+        return hashlib.file_digest(fp, 'sha256').hexdigest()
+
+
+def birthtime_ns(stat):
+    """The file's creation time (ns) from an os.stat() result. (None if not recorded.)"""
+    birthtime_ns = getattr(stat, 'st_birthtime_ns', None)
+    if birthtime_ns is None and hasattr(stat, 'st_birthtime'):
+        birthtime_ns = round(stat.st_birthtime * 1_000_000_000)
+    return birthtime_ns
+
+
+class ReceiptIndex(object):
+
+    def __init__(self, path=None, workers=None):
+        """
+        path: the index file. (Default: GlobalConfig.receipt_index_file)
+        workers: threads used for hashing. (Default: GlobalConfig.hash_workers)
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.path = path if path is not None else self.config.receipt_index_file
+        self.workers = workers if workers is not None else self.config.hash_workers
+        self.entries = self._read()
+        self.hashed = 0
+        self.skipped = 0
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except ValueError as exc:
+            self.logger.warning('Ignoring bad receipt index (%s): %s', self.path, exc)
+            return {}
+        if data.get('format') != _INDEX_FORMAT:
+            return {}
+        return data.get('entries', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({'format': _INDEX_FORMAT, 'entries': self.entries}, fp, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _is_current(self, receipt_id, stat):
+        entry = self.entries.get(receipt_id)
+        if entry is None:
+            return False
+        return (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+    def update(self, files):
+        """Bring the index up to date with `files`, {receipt id: full path}.
+
+        Entries for receipts that are not in `files` are dropped.
+        Returns the entries.
+        """
+        self.hashed = 0
+        self.skipped = 0
+        stale = {}
+        for cur_id, cur_path in files.items():
+            stat = os.stat(cur_path)
+            if self._is_current(cur_id, stat):
+                self.skipped += 1
+                continue
+            stale[cur_id] = (cur_path, stat)
+        for cur in set(self.entries) - set(files):
+            del self.entries[cur]
+        if stale:
+            self.logger.debug('Hashing %d receipts with %d threads.', len(stale), self.workers)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+                digests = pool.map(hash_file, [cur[0] for cur in stale.values()])
+                for (cur_id, (cur_path, stat)), cur_digest in zip(stale.items(), digests):
+                    self.entries[cur_id] = {
+                        'sha256': cur_digest,
+                        'size': stat.st_size,
+                        'mtime_ns': stat.st_mtime_ns,
+                        'birthtime_ns': birthtime_ns(stat),
+                    }
+            self.hashed = len(stale)
+        self.save()
+        return self.entries
+
+
+if __name__ == '__main__':
+    pass
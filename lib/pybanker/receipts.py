@@ -1,9 +1,13 @@
 """
 """
 import collections
+import collections.abc
+import concurrent.futures
 import logging
 import os
 
+import pybanker.ledger
+import pybanker.receipt_index
 import pybanker.shared
 
 
@@ -24,32 +28,129 @@ class _ReceiptItem(collections.UserDict):
         return self['relative-path']
 
 
+def _scan_tree(top, relative_top):
+    """Return the relative paths of every file under `top`.
+
+    Uses os.scandir, so the file type usually comes from the directory listing
+    (no stat per file). Paths are built from `relative_top` as the tree is walked.
+    Like os.walk, symlinked dirs are not followed.
+    """
+    found = []
+    pending = [(top, relative_top)]
+    while pending:
+        cur_dir, cur_relative = pending.pop()
+        with os.scandir(cur_dir) as entries:
+            for cur in entries:
+                if cur.is_dir():
+                    if not cur.is_symlink():
+                        pending.append((cur.path, f'{cur_relative}/{cur.name}'))
+                else:
+                    found.append(f'{cur_relative}/{cur.name}')
+    return found
+
+
+class _ReceiptTable(collections.abc.Mapping):
+    """All of the receipts, by receipt ID (the path relative to the data dir).
+
+    Only the IDs are stored. A receipt's _ReceiptItem is created the first time it is used.
+    """
+
+    def __init__(self, data_dir, receipt_ids):
+        self.data_dir = data_dir
+        # Receipt ID -> _ReceiptItem (None until it is used)
+        self._items = dict.fromkeys(receipt_ids)
+        # Receipt ID -> receipt index entry (see pybanker.receipt_index)
+        self.index_entries = {}
+
+    def file_path(self, receipt_id):
+        return self.data_dir + receipt_id
+
+    def _build_item(self, receipt_id):
+        item = _ReceiptItem(receipt_id)
+        item['file-path'] = self.file_path(receipt_id)
+        self._add_index_entry(item)
+        return item
+
+    def _add_index_entry(self, item):
+        entry = self.index_entries.get(item.receipt_id)
+        if entry is not None:
+            item['contents-sha'] = entry['sha256']
+            item['modified-ns'] = entry['mtime_ns']
+            if entry.get('birthtime_ns') is not None:
+                item['created-ns'] = entry['birthtime_ns']
+
+    def reset_ids(self, receipt_ids):
+        """Replace the receipt IDs. (The items that were already built are kept.)"""
+        self._items = {cur: self._items.get(cur) for cur in sorted(receipt_ids)}
+
+    def set_index_entries(self, entries):
+        self.index_entries = entries
+        for cur in self._items.values():
+            if cur is not None:
+                self._add_index_entry(cur)
+
+    def __getitem__(self, receipt_id):
+        item = self._items[receipt_id]
+        if item is None:
+            item = self._items[receipt_id] = self._build_item(receipt_id)
+        return item
+
+    def __contains__(self, receipt_id):
+        return receipt_id in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
 class Receipts(object):
 
-    def __init__(self):
+    def __init__(self, workers=None):
+        """workers: threads used to scan the top level receipt dirs. (Default: scan_workers.)"""
         name = self.__class__.__name__
         self.logger = logging.getLogger(name)
-        self.global_config = pybanker.shared.GlobalConfig()
+        self.global_config = pybanker.shared.get_config()
+        self.workers = workers if workers is not None else self.global_config.scan_workers
         self._receipts = None
 
     @property
     def receipts_dir(self):
-        return os.path.join(self.global_config.data_dir, 'receipts')
+        return self.global_config.receipts_directory
+
+    @property
+    def relative_top(self):
+        """The receipt ID prefix of the receipts dir."""
+        return '/' + os.path.relpath(self.receipts_dir, self.global_config.data_dir)
 
     def _find_all_receipts(self):
         self.logger.debug(f'Finding receipts in: {self.receipts_dir}')
-        receipts = dict()
-        base_dir = self.global_config.data_dir
-        for dir_path, dir_names, file_names in os.walk(self.receipts_dir):
-            for cur in file_names:
-                full_file = os.path.join(dir_path, cur)
-                relative_file = full_file.replace(base_dir, '', 1)
-                new_receipt = _ReceiptItem(relative_file)
-                new_receipt['file-path'] = full_file
-                if new_receipt.receipt_id in receipts:
-                    msg = 'Duplicate receipt: {}'.format(new_receipt.receipt_id)
-                    raise DuplicateReceiptException(msg)
-                receipts[new_receipt.receipt_id] = new_receipt
+        relative_top = self.relative_top
+        subtrees = []
+        receipt_ids = []
+        if os.path.isdir(self.receipts_dir):
+            with os.scandir(self.receipts_dir) as entries:
+                for cur in entries:
+                    if cur.is_dir():
+                        subtrees.append((cur.path, f'{relative_top}/{cur.name}'))
+                    else:
+                        receipt_ids.append(f'{relative_top}/{cur.name}')
+        subtrees.sort()
+        if self.workers <= 1 or len(subtrees) <= 1:
+            scanned = [_scan_tree(*cur) for cur in subtrees]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+                scanned = list(pool.map(lambda cur: _scan_tree(*cur), subtrees))
+        for cur in scanned:
+            receipt_ids.extend(cur)
+        receipt_ids.sort()
+        data_dir = os.path.normpath(self.global_config.data_dir)
+        receipts = _ReceiptTable(data_dir, receipt_ids)
+        if len(receipts) != len(receipt_ids):
+            counts = collections.Counter(receipt_ids)
+            duplicate = next(cur for cur, count in counts.items() if count > 1)
+            raise DuplicateReceiptException('Duplicate receipt: {}'.format(duplicate))
         return receipts
 
     @property
@@ -58,9 +159,54 @@ class Receipts(object):
             self._receipts = self._find_all_receipts()
         return self._receipts
 
-    def verify_data(self):
-        # TODO finish
-        pass
+    def rescan(self, names):
+        """Re-scan the given top level entries (dirs or files) of the receipts dir."""
+        receipts = self.receipts
+        prefixes = [f'{self.relative_top}/{cur}' for cur in names]
+        under = tuple(f'{cur}/' for cur in prefixes)
+        receipt_ids = [
+            cur for cur in receipts if cur not in prefixes and not cur.startswith(under)]
+        for cur_name, cur_prefix in zip(names, prefixes):
+            path = os.path.join(self.receipts_dir, cur_name)
+            if os.path.isdir(path):
+                receipt_ids.extend(_scan_tree(path, cur_prefix))
+            elif os.path.isfile(path):
+                receipt_ids.append(cur_prefix)
+        receipts.reset_ids(receipt_ids)
+        self.logger.debug('Re-scanned receipts: %s', sorted(names))
+
+    def update_hashes(self, workers=None):
+        """Add the contents sha (and file times) to every receipt. Returns the ReceiptIndex.
+
+        Only new or changed files get hashed, see pybanker.receipt_index.
+        """
+        index = pybanker.receipt_index.ReceiptIndex(workers=workers)
+        receipts = self.receipts
+        receipts.set_index_entries(
+            index.update({cur: receipts.file_path(cur) for cur in receipts}))
+        return index
+
+    def _verify_subtree(self, subtree):
+        # TODO finish (there are no receipt checks yet)
+        prefix = '/'.join(['', 'receipts', subtree, ''])
+        count = sum(1 for cur in self.receipts if cur.startswith(prefix))
+        return True, {'receipts': count}
+
+    def verify_data(self, ledger=None):
+        """Verify each top level receipts dir (skipping the ones the ledger says are unchanged)."""
+        if not os.path.isdir(self.receipts_dir):
+            return
+        for cur in sorted(os.listdir(self.receipts_dir)):
+            cur_path = os.path.join(self.receipts_dir, cur)
+            if not os.path.isdir(cur_path):
+                continue
+            if ledger is None:
+                self._verify_subtree(cur)
+                continue
+            ledger.check(
+                'receipts:{}'.format(cur),
+                pybanker.ledger.tree_digest(cur_path),
+                lambda cur=cur: self._verify_subtree(cur))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,222 @@
+"""
+Reconcile the schedule against the transactions.
+
+Each active scheduled item's due dates are matched with that payee's transactions:
+    paid:       a payment within `days` of the due date
+    late:       a payment after that, but within `late_days` of the due date
+                (and before the item's next due date)
+    missed:     no payment (and the late window has passed)
+    pending:    no payment yet, but the late window has not passed
+    unexpected: a payment to a scheduled payee that matched no due date
+
+Matching is done per payee in two passes: first every due date gets an on time payment
+(if there is one), then the due dates left over get the payments left over as late ones.
+So one skipped payment can't shift every later payment into the previous due date.
+Each pass is a sweep over the due dates and the payments, both sorted by date.
+The start of each due date's window only moves forward, so the payments before it are
+never looked at again. Sorting is the O(n log n) part, the sweeps themselves are about linear.
+"""
+import dataclasses
+import datetime
+import itertools
+
+import pybanker.shared
+import pybanker.transaction_store
+
+PAID = 'paid'
+LATE = 'late'
+MISSED = 'missed'
+PENDING = 'pending'
+UNEXPECTED = 'unexpected'
+
+
+@dataclasses.dataclass
+class ReconciliationEntry:
+    status: str
+    payee: str
+    # The scheduled item's name and due date. (None for unexpected payments.)
+    item_name: str = None
+    due: datetime.date = None
+    # The matched payment. (None for missed and pending due dates.)
+    transaction_id: str = None
+    date: datetime.date = None
+    amount: float = None
+
+    @property
+    def days_late(self):
+        if self.due is None or self.date is None:
+            return None
+        return (self.date - self.due).days
+
+
+@dataclasses.dataclass
+class ReconciliationReport:
+    start: datetime.date
+    end: datetime.date
+    entries: list[ReconciliationEntry] = dataclasses.field(default_factory=list)
+
+    def of_status(self, status):
+        return [cur for cur in self.entries if cur.status == status]
+
+    def counts(self):
+        counts = dict.fromkeys([PAID, LATE, MISSED, PENDING, UNEXPECTED], 0)
+        for cur in self.entries:
+            counts[cur.status] += 1
+        return counts
+
+
+class Reconciler(object):
+
+    def __init__(self, schedule, transactions, days=None, late_days=None,
+                 amount_tolerance=None):
+        """
+        schedule: a Schedule.
+        transactions: a Transactions.
+        days: a payment this many days from its due date is on time.
+            (Default: GlobalConfig.reconcile_days)
+        late_days: a payment up to this many days after its due date is late.
+            (Default: GlobalConfig.reconcile_late_days)
+        amount_tolerance: a payment's amount can be off by this fraction of the item's.
+            (Default: GlobalConfig.reconcile_amount_tolerance)
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.schedule = schedule
+        self.transactions = transactions
+        self.days = days if days is not None else self.config.reconcile_days
+        self.late_days = late_days if late_days is not None else self.config.reconcile_late_days
+        self.amount_tolerance = (
+            amount_tolerance if amount_tolerance is not None
+            else self.config.reconcile_amount_tolerance)
+
+    def _expected(self, start, end):
+        """payee -> sorted [(due ordinal, cents, item name, next due ordinal)].
+
+        For the active items. (The next due date is the same item's, it can be after `end`.)
+        """
+        expected = {}
+        for cur_item in self.schedule.values():
+            if not cur_item.active:
+                continue
+            dues = cur_item.occurrences(start)
+            cents = round(cur_item.amount * 100)
+            item_expected = expected.setdefault(cur_item.payee, [])
+            due = next(dues)
+            while due <= end:
+                next_due = next(dues)
+                item_expected.append(
+                    (due.toordinal(), cents, cur_item.name, next_due.toordinal()))
+                due = next_due
+        for cur in expected.values():
+            cur.sort()
+        return expected
+
+    def _payments(self, payee, first, last):
+        """Sorted [(date ordinal, row, cents)] of the payee's transactions in [first, last]."""
+        store = self.transactions.transactions
+        string_id = store.strings.ids.get(payee)
+        if string_id is None:
+            return []
+        main_extras = store.main.extras
+        dates = store.main.date
+        payments = []
+        for cur in self.transactions.indexes.payees.get(string_id, ()):
+            row_extras = main_extras.get(cur, ())
+            if 'date' in row_extras or 'amount' in row_extras:
+                continue
+            if first <= dates[cur] <= last:
+                payments.append((dates[cur], cur, store.main.amount[cur]))
+        payments.sort()
+        return payments
+
+    def _amount_matches(self, expected_cents, cents):
+        return abs(cents - expected_cents) <= abs(expected_cents) * self.amount_tolerance
+
+    def _late_end(self, due, next_due):
+        """The last day of a due date's late window."""
+        return min(due + self.late_days, next_due - 1)
+
+    def _match(self, expected, payments, used, matches, window):
+        """Match each unmatched due date with the first unused payment in its window.
+
+        window(due, next due) -> (first, last) ordinals.
+        """
+        low = 0
+        for index, (due, cents, item_name, next_due) in enumerate(expected):
+            if matches[index] is not None:
+                continue
+            first, last = window(due, next_due)
+            # Payments before this window are before every later window too.
+            while low < len(payments) and (used[low] or payments[low][0] < first):
+                low += 1
+            for cur in range(low, len(payments)):
+                date, row, amount = payments[cur]
+                if date > last:
+                    break
+                if not used[cur] and self._amount_matches(cents, amount):
+                    used[cur] = 1
+                    matches[index] = cur
+                    break
+
+    def _sweep(self, payee, expected, payments, end_ordinal, report):
+        store = self.transactions.transactions
+        used = bytearray(len(payments))
+        matches = [None] * len(expected)
+        self._match(
+            expected, payments, used, matches,
+            lambda due, next_due: (due - self.days, due + self.days))
+        self._match(
+            expected, payments, used, matches,
+            lambda due, next_due: (due + self.days + 1, self._late_end(due, next_due)))
+        for (due, cents, item_name, next_due), match in zip(expected, matches):
+            entry = ReconciliationEntry(
+                status=None, payee=payee, item_name=item_name,
+                due=datetime.date.fromordinal(due))
+            if match is None:
+                late_end = self._late_end(due, next_due)
+                entry.status = MISSED if late_end < end_ordinal else PENDING
+            else:
+                date, row, amount = payments[match]
+                entry.status = PAID if date <= due + self.days else LATE
+                entry.transaction_id = store.transaction_id(row)
+                entry.date = datetime.date.fromordinal(date)
+                entry.amount = pybanker.transaction_store.from_cents(amount)
+            report.entries.append(entry)
+        for index in itertools.compress(range(len(payments)), (not cur for cur in used)):
+            date, row, amount = payments[index]
+            report.entries.append(ReconciliationEntry(
+                status=UNEXPECTED, payee=payee, transaction_id=store.transaction_id(row),
+                date=datetime.date.fromordinal(date),
+                amount=pybanker.transaction_store.from_cents(amount)))
+
+    def _first_date(self):
+        ordinals = self.transactions.indexes.date_ordinals
+        if len(ordinals) == 0:
+            return None
+        return datetime.date.fromordinal(ordinals[0])
+
+    def run(self, start=None, end=None):
+        """Reconcile the due dates in [start, end] and return a ReconciliationReport.
+
+        start: default, the first transaction's date.
+        end: default, today.
+        """
+        if end is None:
+            end = datetime.date.today()
+        if start is None:
+            start = self._first_date() or end
+        report = ReconciliationReport(start=start, end=end)
+        start_ordinal = start.toordinal()
+        end_ordinal = end.toordinal()
+        for payee, expected in sorted(
+                self._expected(start, end).items(), key=lambda cur: str(cur[0])):
+            # Early payments for the first due dates can be before `start`.
+            payments = self._payments(payee, start_ordinal - self.days, end_ordinal)
+            self._sweep(payee, expected, payments, end_ordinal, report)
+        report.entries.sort(key=lambda cur: (cur.due or cur.date, cur.payee))
+        self.logger.debug('Reconciled %s to %s: %s', start, end, report.counts())
+        return report
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,154 @@
+"""
+Materialized rollups of the transactions.
+
+Totals (in cents) by (year, month, category) and by (year, month, payee).
+Each monthly transaction file has its own partial totals, keyed on the file's
+size and mtime. On refresh only the files that changed get re-read, and their
+old partials are swapped out of the combined totals.
+The rollups are pickled to GlobalConfig.rollup_file.
+"""
+import collections
+import datetime
+import os
+import pickle
+
+import pybanker.shared
+import pybanker.transaction_store
+import pybanker.transactions
+
+# Bump this when the pickled layout changes. (Old files are then rebuilt.)
+_ROLLUP_FORMAT = 1
+KINDS = ('category', 'payee')
+
+
+def _cents(value):
+    cents = pybanker.transaction_store.to_cents(value)
+    if cents is None and isinstance(value, float):
+        # Not a whole number of cents, but still a number.
+        cents = round(value * 100)
+    return cents
+
+
+def file_rollup(all_data):
+    """Return {kind: {(year, month, key): cents}} for the data of one transaction file."""
+    totals = {cur: collections.Counter() for cur in KINDS}
+    for cur_data in all_data.values():
+        cur_date = cur_data.get('date')
+        if not isinstance(cur_date, datetime.date):
+            continue
+        month = (cur_date.year, cur_date.month)
+        amount = _cents(cur_data.get('amount'))
+        if amount is not None:
+            totals['payee'][month + (cur_data.get('payee'),)] += amount
+        splits = cur_data.get('splits')
+        if not isinstance(splits, list):
+            continue
+        for cur_split in splits:
+            if not isinstance(cur_split, dict):
+                continue
+            split_amount = _cents(cur_split.get('amount'))
+            if split_amount is not None:
+                totals['category'][month + (cur_split.get('category'),)] += split_amount
+    return {cur_kind: dict(cur_totals) for cur_kind, cur_totals in totals.items()}
+
+
+class Rollups(object):
+
+    def __init__(self, path=None, refresh=True):
+        """
+        path: the rollup file. (Default: GlobalConfig.rollup_file)
+        refresh: bring the rollups up to date with the transaction files now.
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.path = path if path is not None else self.config.rollup_file
+        # Relative file name -> ((size, mtime_ns), partial totals)
+        self.files = {}
+        self.totals = {cur: collections.Counter() for cur in KINDS}
+        self.read_files = 0
+        self._read()
+        if refresh:
+            self.refresh()
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as fp:
+                data = pickle.load(fp)
+        except FileNotFoundError:
+            return
+        except (pickle.UnpicklingError, EOFError, ValueError) as exc:
+            self.logger.warning('Ignoring bad rollup file (%s): %s', self.path, exc)
+            return
+        if data.get('format') != _ROLLUP_FORMAT:
+            return
+        self.files = data['files']
+        self.totals = data['totals']
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fp:
+            pickle.dump(
+                {'format': _ROLLUP_FORMAT, 'files': self.files, 'totals': self.totals},
+                fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, partial, sign):
+        for cur_kind, cur_totals in partial.items():
+            combined = self.totals[cur_kind]
+            for cur_key, cur_cents in cur_totals.items():
+                combined[cur_key] += sign * cur_cents
+                if combined[cur_key] == 0:
+                    del combined[cur_key]
+
+    def refresh(self):
+        """Re-read the transaction files that changed. Returns the number of files read."""
+        transactions = pybanker.transactions.Transactions(preload=False)
+        seen = set()
+        changed = False
+        self.read_files = 0
+        for cur_month, cur_file in transactions.month_files():
+            relative = os.path.relpath(cur_file, self.config.data_dir)
+            seen.add(relative)
+            stat = os.stat(cur_file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            old = self.files.get(relative)
+            if old is not None and old[0] == signature:
+                continue
+            self.logger.debug('Updating rollups from: %s', cur_file)
+            partial = file_rollup(pybanker.transactions.read_transaction_file(cur_file))
+            if old is not None:
+                self._apply(old[1], -1)
+            self._apply(partial, 1)
+            self.files[relative] = (signature, partial)
+            self.read_files += 1
+            changed = True
+        for cur in set(self.files) - seen:
+            self.logger.debug('Dropping rollups for removed file: %s', cur)
+            self._apply(self.files.pop(cur)[1], -1)
+            changed = True
+        if changed:
+            self.save()
+        return self.read_files
+
+    def report(self, kind, year=None):
+        """Return a sorted list of (period, key, cents).
+
+        The period is the year, or (when `year` is given) the month of that year.
+        """
+        if kind not in KINDS:
+            raise ValueError(f'Unknown rollup: {kind}')
+        periods = collections.Counter()
+        for (cur_year, cur_month, cur_key), cur_cents in self.totals[kind].items():
+            if year is None:
+                periods[(cur_year, cur_key)] += cur_cents
+            elif cur_year == year:
+                periods[(cur_month, cur_key)] += cur_cents
+        return sorted(
+            ((cur_period, cur_key, cur_cents)
+             for (cur_period, cur_key), cur_cents in periods.items()),
+            key=lambda cur: (cur[0], str(cur[1])))
+
+
+if __name__ == '__main__':
+    pass
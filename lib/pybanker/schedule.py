@@ -1,17 +1,55 @@
 """
 Classes to handle the scheduled items.
 """
+import calendar
+import datetime
+import heapq
+import itertools
 import logging
 
 import yaml
 
+import pybanker.cache
 import pybanker.shared
 
+# frequency -> months between due dates (the due day is the item's "day")
+MONTHLY_STEPS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'semi-annually': 6,
+    'yearly': 12,
+}
+# frequency -> days between due dates (counted from the start date)
+DAILY_STEPS = {
+    'weekly': 7,
+    'bi-weekly': 14,
+}
+
+
+class UnknownScheduleFrequency(Exception):
+    pass
+
+
+def month_day(month_index, day):
+    """The date of `day` in the month (clamped to the month's last day)."""
+    year, month = divmod(month_index, 12)
+    month += 1
+    return datetime.date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def first_month_day(after, day):
+    """The first `day` of a month (clamped) that is on or after `after`."""
+    month_index = after.year * 12 + after.month - 1
+    due = month_day(month_index, day)
+    if due < after:
+        due = month_day(month_index + 1, day)
+    return due
+
 
 class Schedule(dict):
 
     def __init__(self):
-        self.config = pybanker.shared.GlobalConfig()
+        self.config = pybanker.shared.get_config()
         self._init_logger()
         self.load_items()
 
@@ -25,11 +63,24 @@ class Schedule(dict):
     def load_items(self):
         file_name = self.config.schedule_file
         self.logger.debug('Loading schedule: {0}'.format(file_name))
-        with open(file_name, 'r') as fp:
-            raw = yaml.safe_load(fp)
+        raw = pybanker.cache.load_yaml(file_name)
         for cur_name, cur_data in raw['items'].items():
             self[cur_name] = ScheduleItem(cur_name, cur_data)
 
+    def upcoming(self, n, after=None):
+        """Return the next `n` (due date, ScheduleItem) of the active items.
+
+        after: only dates on or after this one. (Default: today)
+        The items' occurrences are merged lazily, so only about `n` dates get generated.
+        """
+        if after is None:
+            after = datetime.date.today()
+        occurrences = [
+            zip(cur.occurrences(after), itertools.repeat(cur))
+            for cur in self.values() if cur.active]
+        merged = heapq.merge(*occurrences, key=lambda cur: (cur[0], cur[1].name))
+        return list(itertools.islice(merged, n))
+
     def show_summary(self):
         self.logger.debug('Showing schedule summary.')
         data = dict()
@@ -62,10 +113,48 @@ class ScheduleItem(object):
         self.amount = data['amount']
         self.category = data['category']
         self.active = data['active']
+        # optional
+        self.account = data.get('account')
 
     def __str__(self):
         return self.name
 
+    def occurrences(self, after=None):
+        """Yield the due dates (forever), starting at the first one on or after `after`."""
+        if after is None or after < self.start_date:
+            after = self.start_date
+        if self.frequency in MONTHLY_STEPS:
+            step = MONTHLY_STEPS[self.frequency]
+            start_month = self.start_date.year * 12 + self.start_date.month - 1
+            if month_day(start_month, self.day) < self.start_date:
+                start_month += step
+            # Jump straight to the first period that can be on or after `after`.
+            skip = max(0, (after.year * 12 + after.month - 1 - start_month) // step)
+            for cur in itertools.count(start_month + skip * step, step):
+                due = month_day(cur, self.day)
+                if due >= after:
+                    yield due
+        elif self.frequency == 'semi-monthly':
+            # On `day` and 15 days later, every month.
+            last = None
+            for cur in itertools.count(after.year * 12 + after.month - 1):
+                for cur_day in [self.day, self.day + 15]:
+                    # Both days can end up on the last day of a short month.
+                    due = month_day(cur, cur_day)
+                    if due >= after and due != last:
+                        yield due
+                        last = due
+        elif self.frequency in DAILY_STEPS:
+            step = DAILY_STEPS[self.frequency]
+            skip = -(-(after - self.start_date).days // step)
+            due = self.start_date + datetime.timedelta(days=skip * step)
+            delta = datetime.timedelta(days=step)
+            while True:
+                yield due
+                due += delta
+        else:
+            raise UnknownScheduleFrequency(f'Unknown frequency ({self.name}): {self.frequency}')
+
     def get_summary(self):
         """Show a short summary of the account."""
         output = self.name
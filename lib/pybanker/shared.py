@@ -2,12 +2,26 @@
 Global config for pybanker.
 """
 import configparser
+import functools
+import hashlib
 import importlib.metadata
 import logging
 import os
+import time
 
 _PACKAGE_NAME = 'pybanker'
 
+# The process-wide config. Use `get_config()` instead of touching this directly.
+_shared_config = None
+# Only stat() the config file this often when looking up the shared config.
+_STALE_CHECK_SECONDS = 1.0
+_DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_DEFAULT_PARALLEL_MIN_FILES = 24
+_DEFAULT_DAEMON_POLL_SECONDS = 2.0
+_DEFAULT_RECONCILE_DAYS = 3
+_DEFAULT_RECONCILE_LATE_DAYS = 30
+_DEFAULT_RECONCILE_AMOUNT_TOLERANCE = 0.05
+
 
 class ConfigError(Exception):
     pass
@@ -17,24 +31,177 @@ def home_dir():
     return os.path.expanduser('~')
 
 
+@functools.cache
+def package_version():
+    """Return the installed version (the metadata lookup is only done once)."""
+    return importlib.metadata.version(_PACKAGE_NAME)
+
+
+def _get_mtime(file_name):
+    try:
+        return os.stat(file_name).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_config():
+    """Return the shared GlobalConfig.
+
+    The config file is only parsed the first time this is called and again
+    after the config file's mtime changes.
+    """
+    global _shared_config
+    if _shared_config is None:
+        _shared_config = GlobalConfig()
+    elif _shared_config.is_stale():
+        _shared_config.logger.debug('Config file changed: %s', _shared_config.config_file)
+        _shared_config = GlobalConfig(
+            config_file=_shared_config.config_file, data_dir=_shared_config.data_dir_override)
+    return _shared_config
+
+
+def set_config(config):
+    """Replace the shared GlobalConfig. (None forces a reload on the next lookup.)"""
+    global _shared_config
+    _shared_config = config
+
+
+def digest_tree(sha_obj, top):
+    """Add the (relative path, size, mtime) of everything under `top` to `sha_obj`.
+
+    This is a cheap "has anything changed?" check, it only stat()s the files.
+    """
+    if not os.path.exists(top):
+        sha_obj.update(b'missing')
+        return
+    if os.path.isfile(top):
+        stat = os.stat(top)
+        sha_obj.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+        return
+    for dir_path, dir_names, file_names in os.walk(top):
+        dir_names.sort()
+        for cur in sorted(file_names):
+            full = os.path.join(dir_path, cur)
+            stat = os.stat(full)
+            relative = os.path.relpath(full, top)
+            sha_obj.update(f'{relative}\0{stat.st_size}:{stat.st_mtime_ns}\0'.encode('utf-8'))
+
+
+def _restore_config(config_file, data_dir=None):
+    """Used when unpickling a GlobalConfig."""
+    try:
+        config = get_config()
+    except ConfigError:
+        config = None
+    if config is None or (str(config.config_file), config.data_dir_override) != (
+            config_file, data_dir):
+        config = GlobalConfig(config_file=config_file, data_dir=data_dir)
+    return config
+
+
 class GlobalConfig(object):
     base_logger_name = _PACKAGE_NAME
     default_logger_level = logging.WARN
     package_name = _PACKAGE_NAME
     logger_level = logging.INFO
     # The first one ([0]) is the default.
+    # "requires" lists the Banker subsystems the command uses.
+    # Only those get loaded (and verified).
     commands = [
-        {'option': 'show-summary', 'routine': 'show_summary'},
-        {'option': 'show-schedule', 'routine': 'show_schedule'},
-        {'option': 'list-accounts', 'routine': 'list_accounts'}
+        {
+            'option': 'show-summary',
+            'routine': 'show_summary',
+            'requires': ['accounts', 'schedule', 'receipts', 'transactions'],
+        },
+        {'option': 'show-schedule', 'routine': 'show_schedule', 'requires': ['schedule']},
+        {'option': 'list-accounts', 'routine': 'list_accounts', 'requires': ['accounts']},
+        {
+            'option': 'verify',
+            'routine': 'verify',
+            'requires': ['accounts', 'schedule', 'receipts', 'transactions'],
+        },
+        {'option': 'compile', 'routine': 'compile_snapshot', 'requires': []},
+        {
+            'option': 'query',
+            'routine': 'query_transactions',
+            'requires': ['receipts', 'transactions'],
+            # CLI options that are passed on to the routine.
+            'arguments': [
+                'start', 'end', 'payee', 'category', 'min_amount', 'max_amount', 'receipt'],
+        },
+        {'option': 'index-receipts', 'routine': 'index_receipts', 'requires': ['receipts']},
+        {
+            'option': 'upcoming-bills',
+            'routine': 'upcoming_bills',
+            'requires': ['schedule'],
+            'arguments': ['count', 'start'],
+        },
+        {
+            'option': 'forecast',
+            'routine': 'forecast',
+            'requires': ['schedule', 'receipts', 'transactions'],
+            'arguments': ['months'],
+        },
+        {
+            'option': 'reconcile',
+            'routine': 'reconcile',
+            'requires': ['schedule', 'receipts', 'transactions'],
+            'arguments': ['start', 'end'],
+        },
+        {
+            'option': 'show-coverage',
+            'routine': 'show_coverage',
+            'requires': [],
+            'arguments': ['year'],
+        },
+        {
+            'option': 'missing-statements',
+            'routine': 'missing_statements',
+            'requires': [],
+            'arguments': ['month'],
+        },
+        {
+            'option': 'category-report',
+            'routine': 'category_report',
+            'requires': [],
+            'arguments': ['year'],
+        },
+        {
+            'option': 'payee-report',
+            'routine': 'payee_report',
+            'requires': [],
+            'arguments': ['year'],
+        },
+        {
+            # Keep the data loaded and run the other commands for the CLI.
+            # ('local' commands are never sent to the daemon.)
+            'option': 'daemon',
+            'routine': 'serve',
+            'requires': ['accounts', 'schedule', 'receipts', 'transactions'],
+            'local': True,
+        },
+        {
+            'option': 'stop-daemon',
+            'routine': 'stop_daemon',
+            'requires': [],
+            'local': True,
+        },
     ]
 
-    def __init__(self):
+    def __init__(self, config_file=None, data_dir=None):
+        """
+        config_file: default, ~/.pybanker/config.ini
+        data_dir: use this data dir instead of the config file's.
+            (Then the config file is optional, its other settings still apply.)
+        """
         self.logger = self.build_logger(self)
-        self.version = importlib.metadata.version(self.package_name)
+        self.version = package_version()
         self._init_vars()
-        # TODO add kwarg for "config_file" to override default
-        self._config_file = None
+        if data_dir is not None:
+            self._data_dir = os.path.abspath(data_dir)
+        self._config_file = config_file
+        self._config_mtime = _get_mtime(self.config_file)
+        self._checked_at = time.monotonic()
         self.conf = self._get_config_object()
 
     def _init_vars(self):
@@ -55,16 +222,41 @@ class GlobalConfig(object):
             self._config_file = self._build_config_file()
         return self._config_file
 
+    def __reduce__(self):
+        # Objects that hold the config get pickled (e.g. in the snapshot).
+        # Unpickling should hand back the shared config instead of a copy.
+        return (_restore_config, (str(self.config_file), self.data_dir_override))
+
+    def is_stale(self, force=False):
+        """Has the config file changed since it was read?
+
+        The file is only checked once every `_STALE_CHECK_SECONDS` unless `force` is set.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < _STALE_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        return _get_mtime(self.config_file) != self._config_mtime
+
     def _get_config_object(self):
         conf = configparser.ConfigParser()
         if not os.path.exists(self.config_file):
+            if self._data_dir is not None:
+                return conf
             raise ConfigError(f'Config file does not exist: {self.config_file}')
         self.logger.debug('Reading config file: {}'.format(self.config_file))
         conf.read(self.config_file)
         return conf
 
+    @property
+    def data_dir_override(self):
+        """The data dir given to the constructor. (None: the config file's is used.)"""
+        return self._data_dir
+
     @property
     def data_dir(self):
+        if self._data_dir is not None:
+            return self._data_dir
         # TODO add check to make sure 'data_dir' exists in conf
         data_dir = self.conf.get('default', 'data_dir')
         if not data_dir.startswith('/'):
@@ -72,6 +264,85 @@ class GlobalConfig(object):
             self.logger.debug('Data dir: {}'.format(data_dir))
         return data_dir
 
+    @property
+    def cache_dir(self):
+        cache_dir = self.conf.get('default', 'cache_dir', fallback=None)
+        if cache_dir is None:
+            return os.path.join(home_dir(), '.{0}'.format(self.package_name), 'cache')
+        if not cache_dir.startswith('/'):
+            cache_dir = os.path.join(home_dir(), cache_dir)
+        return cache_dir
+
+    @property
+    def use_cache(self):
+        return self.conf.getboolean('default', 'use_cache', fallback=True)
+
+    @property
+    def cache_max_bytes(self):
+        return self.conf.getint('default', 'cache_max_bytes', fallback=_DEFAULT_CACHE_MAX_BYTES)
+
+    @property
+    def transaction_workers(self):
+        """Number of processes used to parse transaction files. (0: one per CPU.)"""
+        workers = self.conf.getint('default', 'transaction_workers', fallback=0)
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers
+
+    @property
+    def hash_workers(self):
+        """Number of threads used to hash receipt files. (0: two per CPU.)"""
+        workers = self.conf.getint('default', 'hash_workers', fallback=0)
+        if workers <= 0:
+            workers = 2 * (os.cpu_count() or 1)
+        return workers
+
+    @property
+    def scan_workers(self):
+        """Number of threads used to scan the receipts tree. (0: two per CPU.)"""
+        workers = self.conf.getint('default', 'scan_workers', fallback=0)
+        if workers <= 0:
+            workers = 2 * (os.cpu_count() or 1)
+        return workers
+
+    @property
+    def account_workers(self):
+        """Number of threads used to load the accounts. (0: two per CPU.)"""
+        workers = self.conf.getint('default', 'account_workers', fallback=0)
+        if workers <= 0:
+            workers = 2 * (os.cpu_count() or 1)
+        return workers
+
+    @property
+    def parallel_min_files(self):
+        """Below this many files, parsing in a process pool isn't worth the startup cost."""
+        return self.conf.getint(
+            'default', 'parallel_min_files', fallback=_DEFAULT_PARALLEL_MIN_FILES)
+
+    @property
+    def daemon_poll_seconds(self):
+        """How often the daemon checks the data dir for changes."""
+        return self.conf.getfloat(
+            'default', 'daemon_poll_seconds', fallback=_DEFAULT_DAEMON_POLL_SECONDS)
+
+    @property
+    def reconcile_days(self):
+        """A payment this many days before or after its due date is on time."""
+        return self.conf.getint('default', 'reconcile_days', fallback=_DEFAULT_RECONCILE_DAYS)
+
+    @property
+    def reconcile_late_days(self):
+        """A payment up to this many days after its due date is late (not missed)."""
+        return self.conf.getint(
+            'default', 'reconcile_late_days', fallback=_DEFAULT_RECONCILE_LATE_DAYS)
+
+    @property
+    def reconcile_amount_tolerance(self):
+        """How far (a fraction of the scheduled amount) a payment's amount can be off."""
+        return self.conf.getfloat(
+            'default', 'reconcile_amount_tolerance',
+            fallback=_DEFAULT_RECONCILE_AMOUNT_TOLERANCE)
+
     @property
     def schedule_file(self):
         return os.path.join(self.data_dir, 'schedule.yaml')
@@ -80,6 +351,44 @@ class GlobalConfig(object):
     def accounts_directory(self):
         return os.path.join(self.data_dir, 'accounts')
 
+    @property
+    def transactions_directory(self):
+        return os.path.join(self.data_dir, 'transactions')
+
+    @property
+    def receipts_directory(self):
+        return os.path.join(self.data_dir, 'receipts')
+
+    @property
+    def data_cache_dir(self):
+        """Cache dir for files that belong to one data dir. (E.g. the snapshot.)"""
+        digest = hashlib.sha256(self.data_dir.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'data', digest[:16])
+
+    @property
+    def snapshot_file(self):
+        return os.path.join(self.data_cache_dir, 'snapshot.bin')
+
+    @property
+    def ledger_file(self):
+        return os.path.join(self.data_cache_dir, 'verify-ledger.json')
+
+    @property
+    def receipt_index_file(self):
+        return os.path.join(self.data_cache_dir, 'receipt-index.json')
+
+    @property
+    def daemon_socket_file(self):
+        return os.path.join(self.data_cache_dir, 'daemon.sock')
+
+    @property
+    def coverage_file(self):
+        return os.path.join(self.data_cache_dir, 'statement-coverage.pickle')
+
+    @property
+    def rollup_file(self):
+        return os.path.join(self.data_cache_dir, 'rollups.pickle')
+
     def build_logger(self, class_object):
         logger_name = self.build_logger_name(class_object)
         logger = logging.getLogger(logger_name)
@@ -0,0 +1,171 @@
+"""
+Compiled, single file snapshot of the data dir.
+
+Layout of the snapshot file:
+    header:   magic, format version, package version, number of sections
+    table:    one fixed size entry per section: name, offset, length, digest
+    sections: one pickled object per section (e.g. the resolved AccountManager)
+
+The file is read through mmap and only the requested sections get unpickled.
+Each section stores a digest of its source files (paths, sizes and mtimes).
+A section whose sources changed is ignored when loading and rebuilt by `compile`.
+"""
+import datetime
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+
+import pybanker.shared
+
+_MAGIC = b'PYBSNAP1'
+# magic, format version, package version, number of sections
+_HEADER = struct.Struct('<8sI32sI')
+# name, offset, length, digest (sha256)
+_TABLE_ENTRY = struct.Struct('<16sQQ32s')
+# Bump this when the layout (or the pickled classes) change in an incompatible way.
+_FORMAT_VERSION = 9
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def section_digest(config, name):
+    """Digest of everything the given section was built from."""
+    sha_obj = hashlib.sha256(name.encode('utf-8'))
+    if name == 'accounts':
+        # Missing statements are calculated relative to "today".
+        sha_obj.update(datetime.date.today().isoformat().encode('utf-8'))
+        pybanker.shared.digest_tree(sha_obj, config.accounts_directory)
+    elif name == 'schedule':
+        pybanker.shared.digest_tree(sha_obj, config.schedule_file)
+    elif name == 'receipts':
+        pybanker.shared.digest_tree(sha_obj, config.receipts_directory)
+    elif name == 'transactions':
+        pybanker.shared.digest_tree(sha_obj, config.transactions_directory)
+    else:
+        raise SnapshotError(f'Unknown section: {name}')
+    return sha_obj.hexdigest()
+
+
+class Snapshot(object):
+
+    def __init__(self, path=None):
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        if path is None:
+            path = self.config.snapshot_file
+        self.path = path
+        self._table = None
+        self._mmap = None
+
+    def _package_version(self):
+        return self.config.version.encode('utf-8')[:32]
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _open(self):
+        """Map the file and read the offset table. (Returns False if there is no usable file.)"""
+        if self._table is not None:
+            return True
+        try:
+            with open(self.path, 'rb') as fp:
+                self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: mmap of an empty file.
+            return False
+        try:
+            magic, format_version, package_version, count = _HEADER.unpack_from(self._mmap, 0)
+        except struct.error:
+            magic = None
+        if magic != _MAGIC:
+            self.logger.warning('Not a snapshot file: %s', self.path)
+            self.close()
+            return False
+        if (format_version, package_version.rstrip(b'\0')) != (
+                _FORMAT_VERSION, self._package_version()):
+            self.logger.info('Ignoring snapshot from a different version: %s', self.path)
+            self.close()
+            return False
+        sections = {}
+        for index in range(count):
+            name, offset, length, digest = _TABLE_ENTRY.unpack_from(
+                self._mmap, _HEADER.size + index * _TABLE_ENTRY.size)
+            sections[name.rstrip(b'\0').decode('utf-8')] = (offset, length, digest.hex())
+        self._table = sections
+        return True
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._table = None
+
+    @property
+    def sections(self):
+        if not self._open():
+            return {}
+        return self._table
+
+    def _section_bytes(self, name):
+        offset, length, digest = self.sections[name]
+        return self._mmap[offset:offset + length]
+
+    def is_fresh(self, name, digest=None):
+        if name not in self.sections:
+            return False
+        if digest is None:
+            digest = section_digest(self.config, name)
+        return self.sections[name][2] == digest
+
+    def load(self, name):
+        """Return the object stored for `name`, or None if it is missing or out of date."""
+        if not self.is_fresh(name):
+            self.logger.debug('No up to date snapshot section: %s', name)
+            return None
+        self.logger.debug('Loading snapshot section: %s', name)
+        return pickle.loads(self._section_bytes(name))
+
+    def compile(self, builders):
+        """(Re)write the snapshot.
+
+        `builders` maps each section name to a callable that builds the object for it.
+        Sections whose sources did not change are copied over from the old snapshot.
+        Returns a dict: {section: 'rebuilt'|'reused'}.
+        """
+        results = {}
+        blobs = {}
+        for name, builder in builders.items():
+            digest = section_digest(self.config, name)
+            if self.is_fresh(name, digest):
+                blobs[name] = (self._section_bytes(name), digest)
+                results[name] = 'reused'
+                continue
+            self.logger.debug('Building snapshot section: %s', name)
+            blobs[name] = (pickle.dumps(builder(), protocol=pickle.HIGHEST_PROTOCOL), digest)
+            results[name] = 'rebuilt'
+        self._write(blobs)
+        return results
+
+    def _write(self, blobs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fp:
+            fp.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, self._package_version(), len(blobs)))
+            offset = _HEADER.size + len(blobs) * _TABLE_ENTRY.size
+            for name, (blob, digest) in blobs.items():
+                fp.write(_TABLE_ENTRY.pack(
+                    name.encode('utf-8'), offset, len(blob), bytes.fromhex(digest)))
+                offset += len(blob)
+            for name, (blob, digest) in blobs.items():
+                fp.write(blob)
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.logger.info('Wrote snapshot: %s', self.path)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,274 @@
+"""
+Statement coverage matrix.
+
+One row per (account, statements directory), one column per month.
+Each cell (a byte) is one of the CELL_* values below.
+The rows are cached in GlobalConfig.coverage_file. A row is only rebuilt when its
+account index, statements dir (mtime) or statements index changed.
+So the queries don't need to list (or even load) any statements directory.
+On a new day only the trailing cells of the open ended rows (no end date) can change:
+statements that were not due yet can now be missing. Those are added from the row's
+cached statement dates.
+"""
+import dataclasses
+import datetime
+import os
+import pickle
+
+import pybanker.accounts
+import pybanker.frequency_utils
+import pybanker.shared
+
+# Bump this when the pickled layout changes. (Old files are then rebuilt.)
+_COVERAGE_FORMAT = 2
+
+# Cell values. (When a month has more than one statement, the highest value wins.)
+CELL_NONE = 0
+CELL_PRESENT = 1
+CELL_NULL = 2
+CELL_KNOWN_MISSING = 3
+CELL_MISSING = 4
+CELL_NAMES = {
+    CELL_NONE: '',
+    CELL_PRESENT: 'present',
+    CELL_NULL: 'null',
+    CELL_KNOWN_MISSING: 'known-missing',
+    CELL_MISSING: 'missing',
+}
+
+
+def month_index(dt):
+    """Months since year 0. (The column "number" of a date.)"""
+    return dt.year * 12 + dt.month - 1
+
+
+def from_month_index(index):
+    year, month = divmod(index, 12)
+    return year, month + 1
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _dir_signature(path):
+    # Adding, removing or renaming a statement changes the dir's mtime.
+    return (_stat_signature(path), _stat_signature(os.path.join(path, 'index.yaml')))
+
+
+def _get_today_dt():
+    return datetime.date.today()
+
+
+def _merge_marks(first, cells, marks):
+    """Return (first, cells) with the (date, cell value) marks added. (The highest value wins.)"""
+    if not marks:
+        return first, cells
+    first_mark = min(month_index(cur[0]) for cur in marks)
+    last_mark = max(month_index(cur[0]) for cur in marks)
+    new_first = min(first, first_mark)
+    last = max(first + len(cells) - 1, last_mark) if cells else last_mark
+    new_cells = bytearray(last - new_first + 1)
+    new_cells[first - new_first:first - new_first + len(cells)] = cells
+    for cur_dt, cur_value in marks:
+        column = month_index(cur_dt) - new_first
+        new_cells[column] = max(new_cells[column], cur_value)
+    return new_first, bytes(new_cells)
+
+
+@dataclasses.dataclass
+class _CoverageRow:
+    name: str
+    signature: tuple
+    first: int
+    cells: bytes
+    # Open ended rows only: what _extend_row() needs. (See FrequencyHelper.checked_count.)
+    period: str = None
+    start_date: datetime.date = None
+    statement_dates: list = None
+    checked_count: int = 0
+
+
+def _build_row(statements_dir):
+    """Return the _CoverageRow for a _StatementsDirectory."""
+    index_data = statements_dir.index_data
+    null_dates = set(cur.date_dt for cur in index_data.null_statements)
+    known_missing_dates = set(cur.date_dt for cur in index_data.known_missing_statements)
+    marks = []
+    for cur in statements_dir.statements:
+        if cur.path is not None:
+            marks.append((cur.date_dt, CELL_PRESENT))
+        elif cur.date_dt in null_dates:
+            marks.append((cur.date_dt, CELL_NULL))
+        elif cur.date_dt in known_missing_dates:
+            marks.append((cur.date_dt, CELL_KNOWN_MISSING))
+    marks.extend((cur, CELL_MISSING) for cur in statements_dir.missing_statement_dates)
+    first, cells = _merge_marks(month_index(index_data.start_date), b'', marks)
+    row = _CoverageRow(
+        name=statements_dir.path.name, signature=_dir_signature(statements_dir.path),
+        first=first, cells=cells)
+    if index_data.end_date is None:
+        helper = statements_dir.freq_helper
+        row.period = helper.frequency
+        row.start_date = helper.start_dt
+        row.statement_dates = helper.statement_dates
+        row.checked_count = helper.checked_count
+    return row
+
+
+def _extend_row(row):
+    """Add the statements that went missing since the row was last checked."""
+    if row.period is None:
+        return
+    helper = pybanker.frequency_utils.FrequencyHelper(
+        row.period, row.statement_dates, row.start_date, calendar=True)
+    missing = helper.find_missing_statement_dates(first_count=row.checked_count)
+    row.checked_count = helper.checked_count
+    row.first, row.cells = _merge_marks(
+        row.first, row.cells, [(cur, CELL_MISSING) for cur in missing])
+
+
+class StatementCoverage(object):
+
+    def __init__(self, path=None, refresh=True):
+        """
+        path: the cache file. (Default: GlobalConfig.coverage_file)
+        refresh: rebuild the rows of the accounts that changed now.
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.path = path if path is not None else self.config.coverage_file
+        # Account slug -> {'signature': ..., 'rows': [_CoverageRow]}
+        self.accounts = {}
+        self.today = None
+        self.rebuilt = []
+        self.first_month = 0
+        self.columns = 0
+        self.row_keys = []
+        self.cells = bytearray()
+        self._read()
+        if refresh:
+            self.refresh()
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as fp:
+                data = pickle.load(fp)
+        except FileNotFoundError:
+            return
+        except (pickle.UnpicklingError, EOFError, ValueError) as exc:
+            self.logger.warning('Ignoring bad coverage file (%s): %s', self.path, exc)
+            return
+        if data.get('format') != _COVERAGE_FORMAT:
+            return
+        self.today = data['today']
+        self.accounts = data['accounts']
+        self._build_matrix()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fp:
+            pickle.dump(
+                {'format': _COVERAGE_FORMAT, 'today': self.today, 'accounts': self.accounts},
+                fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def _is_current(self, slug, account_path):
+        entry = self.accounts.get(slug)
+        if entry is None or entry['signature'] != _stat_signature(account_path / 'index.yaml'):
+            return False
+        return all(
+            _dir_signature(account_path / cur.name) == cur.signature for cur in entry['rows'])
+
+    def _build_account(self, manager, account_path):
+        account = manager.load_account(account_path)
+        rows = [_build_row(cur) for cur in account.statements_manager.statements_directories]
+        return {'signature': _stat_signature(account_path / 'index.yaml'), 'rows': rows}
+
+    def _new_day(self, today):
+        """Update the cached rows for a new "today"."""
+        if self.today is not None and today < self.today:
+            # The clock went back. (Missing statements can't be "un-missed" in place.)
+            self.accounts = {}
+        for cur_entry in self.accounts.values():
+            for cur_row in cur_entry['rows']:
+                _extend_row(cur_row)
+        self.today = today
+
+    def refresh(self):
+        """Rebuild the rows of the accounts that changed. Returns the rebuilt slugs."""
+        today = _get_today_dt()
+        new_day = today != self.today
+        if new_day:
+            # Missing statements depend on "today".
+            self._new_day(today)
+        manager = pybanker.accounts.AccountManager()
+        self.rebuilt = []
+        seen = set()
+        for cur_path in manager.find_account_dirs():
+            slug = cur_path.stem
+            seen.add(slug)
+            if self._is_current(slug, cur_path):
+                continue
+            self.logger.debug('Rebuilding statement coverage: %s', slug)
+            self.accounts[slug] = self._build_account(manager, cur_path)
+            self.rebuilt.append(slug)
+        removed = set(self.accounts) - seen
+        for cur in removed:
+            del self.accounts[cur]
+        if new_day or self.rebuilt or removed:
+            self.save()
+        self._build_matrix()
+        return self.rebuilt
+
+    def _build_matrix(self):
+        rows = [
+            ((cur_slug, cur.name), cur.first, cur.cells)
+            for cur_slug, cur_entry in sorted(self.accounts.items())
+            for cur in cur_entry['rows']]
+        self.row_keys = [cur[0] for cur in rows]
+        spans = [(cur[1], cur[1] + len(cur[2])) for cur in rows if cur[2]]
+        if not spans:
+            self.first_month, self.columns, self.cells = 0, 0, bytearray()
+            return
+        self.first_month = min(cur[0] for cur in spans)
+        self.columns = max(cur[1] for cur in spans) - self.first_month
+        self.cells = bytearray(len(rows) * self.columns)
+        for row, (cur_key, cur_first, cur_cells) in enumerate(rows):
+            start = row * self.columns + cur_first - self.first_month
+            self.cells[start:start + len(cur_cells)] = cur_cells
+
+    def cell(self, row, month):
+        """The cell for row number `row` and month index `month`."""
+        column = month - self.first_month
+        if not 0 <= column < self.columns:
+            return CELL_NONE
+        return self.cells[row * self.columns + column]
+
+    def month_cells(self, year, month):
+        """Return {(slug, dir name): cell} for one month."""
+        index = year * 12 + month - 1
+        return {cur_key: self.cell(row, index) for row, cur_key in enumerate(self.row_keys)}
+
+    def missing(self, year, month, include_known=False):
+        """Return the (slug, dir name) rows that are missing the statement for the month."""
+        wanted = {CELL_MISSING, CELL_KNOWN_MISSING} if include_known else {CELL_MISSING}
+        return [
+            cur_key for cur_key, cur_cell in self.month_cells(year, month).items()
+            if cur_cell in wanted]
+
+    def year_cells(self, year):
+        """Return {(slug, dir name): [12 cells]} for one year."""
+        first = year * 12
+        return {
+            cur_key: [self.cell(row, first + cur) for cur in range(12)]
+            for row, cur_key in enumerate(self.row_keys)}
+
+
+if __name__ == '__main__':
+    pass
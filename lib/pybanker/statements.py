@@ -3,13 +3,14 @@ import dataclasses
 import datetime
 import enum
 import functools
+import os
 import pathlib
 import re
 import typing
 
-import yaml
-
+import pybanker.cache
 import pybanker.frequency_utils
+import pybanker.ledger
 import pybanker.shared
 
 
@@ -25,33 +26,97 @@ class MissingStatements(Exception):
         self.missing = missing
 
 
+# strptime directive -> regex group. (For the strptime style name formats.)
+_STRPTIME_GROUPS = {
+    'Y': r'(?P<year>\d{4})',
+    'y': r'(?P<short_year>\d{2})',
+    'm': r'(?P<month>\d{1,2})',
+    'd': r'(?P<day>\d{1,2})',
+    'b': r'(?P<month_name>[A-Za-z]{3})',
+    'B': r'(?P<month_name>[A-Za-z]+)',
+}
+# A name format with one of these is a strptime style format.
+_STRPTIME_DIRECTIVE = re.compile(r'%[YymdbB]')
+_MONTH_NAMES = {
+    datetime.date(2000, cur, 1).strftime(cur_format).lower(): cur
+    for cur in range(1, 13) for cur_format in ['%b', '%B']}
+
+
+def _has_date_groups(group_names):
+    """True if the (named) groups are the ones _translate_strptime() produces."""
+    return all(
+        any(cur in group_names for cur in cur_names)
+        for cur_names in [('year', 'short_year'), ('month', 'month_name'), ('day',)])
+
+
+def _translate_strptime(name_format):
+    """Translate a strptime style format (e.g. "%Y-%m-%d") to a regex with named groups."""
+    parts = []
+    chars = iter(name_format)
+    for cur in chars:
+        if cur != '%':
+            parts.append(re.escape(cur))
+            continue
+        directive = next(chars, '')
+        if directive == '%':
+            parts.append('%')
+        elif directive in _STRPTIME_GROUPS:
+            parts.append(_STRPTIME_GROUPS[directive])
+        else:
+            raise ConfigError(f'Unsupported name format directive (%{directive}): {name_format}')
+    compiled = re.compile(''.join(parts))
+    if not _has_date_groups(compiled.groupindex):
+        raise ConfigError(f'Name format needs a year, a month and a day: {name_format}')
+    return compiled
+
+
+def _matched_date(matches):
+    groups = matches.groupdict()
+    if not _has_date_groups(groups):
+        # A plain regex (its own group names don't matter): the first 3 groups.
+        return datetime.date(int(matches.group(1)), int(matches.group(2)), int(matches.group(3)))
+    if groups.get('year') is not None:
+        year = int(groups['year'])
+    else:
+        year = 2000 + int(groups['short_year'])
+    if groups.get('month_name') is not None:
+        month = _MONTH_NAMES[groups['month_name'].lower()]
+    else:
+        month = int(groups['month'])
+    return datetime.date(year, month, int(groups['day']))
+
+
+@functools.cache
+def _compile_name_formats(name_formats):
+    """Compile the (tuple of) name formats once.
+
+    A format with a directive is a strptime style format (%Y, %y, %m, %d, %b, %B),
+    anything else is a regex whose first 3 groups are the year, month and day.
+    """
+    compiled = []
+    for cur in name_formats:
+        if _STRPTIME_DIRECTIVE.search(cur):
+            compiled.append(_translate_strptime(cur))
+        else:
+            compiled.append(re.compile(cur))
+    return tuple(compiled)
+
+
 def _parse_date_string(date_string, name_formats):
-    for cur_format in name_formats:
-        filename_matcher = re.compile(cur_format)
+    for filename_matcher in _compile_name_formats(tuple(name_formats)):
         date_matches = filename_matcher.match(date_string)
         if date_matches is None:
             continue
-        try:
-            dt_date = datetime.date(
-                int(date_matches.group(1)),
-                int(date_matches.group(2)),
-                int(date_matches.group(3))
-            )
-        except Exception:
-            raise
-        return dt_date
+        return _matched_date(date_matches)
     raise ConfigError(f'Cannot parse date string: {date_string}')
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class _StatementItem:
+    """One statement. (There can be hundreds of thousands, so no config or logger per item.)"""
     date_dt: datetime.date
     path: typing.Optional[pathlib.Path] = None
 
-    def __post_init__(self):
-        self.global_config = pybanker.shared.GlobalConfig()
-        self.logger = self.global_config.build_logger(self)
-
     @classmethod
     def from_file(cls, path, name_formats):
         stem = path.stem
@@ -78,29 +143,29 @@ class _StatementPeriod(enum.Enum):
     yearly = 'yearly'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class _IndexData:
     index_path: pathlib.Path
-    name_formats: list[str]
+    name_formats: tuple[str, ...]
     start_date: datetime.date
     period: str
     period_ref: _StatementPeriod = dataclasses.field(init=False)
     # optional
     end_date: typing.Optional[datetime.date] = None
-    null_statements: typing.Optional[list[datetime.date]] = None
-    known_missing_statements: typing.Optional[list[datetime.date]] = None
-    filename_date_map: typing.Optional[dict[str: datetime.date]] = None
+    null_statements: typing.Optional[tuple[_StatementItem, ...]] = None
+    known_missing_statements: typing.Optional[tuple[_StatementItem, ...]] = None
+    filename_date_map: typing.Optional[dict[str, datetime.date]] = None
 
     def __post_init__(self) -> None:
-        self.config = pybanker.shared.GlobalConfig()
-        self.logger = self.config.build_logger(self)
-        self.period_ref = _StatementPeriod(self.period)
-        self.null_statements = self._transform_statements_list('null_statements')
-        self.known_missing_statements = self._transform_statements_list('known_missing_statements')
+        # Frozen, so the computed values have to be set with object.__setattr__().
+        object.__setattr__(self, 'name_formats', tuple(self.name_formats))
+        object.__setattr__(self, 'period_ref', _StatementPeriod(self.period))
+        for cur_key in ['null_statements', 'known_missing_statements']:
+            object.__setattr__(self, cur_key, self._transform_statements_list(cur_key))
         if self.filename_date_map is None:
-            self.filename_date_map = {}
+            object.__setattr__(self, 'filename_date_map', {})
 
-    def _transform_statements_list(self, cur_key) -> list:
+    def _transform_statements_list(self, cur_key) -> tuple:
         """Transform a list of dates in statement items."""
         raw_list = getattr(self, cur_key, [])
         items = []
@@ -108,20 +173,17 @@ class _IndexData:
             for cur in raw_list:
                 new_item = _StatementItem.from_config(cur)
                 items.append(new_item)
-        return items
+        return tuple(items)
 
     @staticmethod
     def read_index_file(index_path: pathlib.Path) -> dict:
-        with index_path.open() as fp:
-            data = yaml.safe_load(fp)
-        return data
+        return pybanker.cache.load_yaml(index_path)
 
     @classmethod
     def from_file(cls, index_path: pathlib.Path):
         if not index_path.exists():
             raise ConfigError(f'Index file does not exist: {index_path}')
-        # This is overkill... :(
-        config = pybanker.shared.GlobalConfig()
+        config = pybanker.shared.get_config()
         logger = config.build_logger(cls)
         logger.debug('Reading statements index: %s', index_path)
         data = cls.read_index_file(index_path)
@@ -141,7 +203,7 @@ class _StatementsDirectory:
     account_index_data: object = dataclasses.field(repr=False)
 
     def __post_init__(self):
-        self.config = pybanker.shared.GlobalConfig()
+        self.config = pybanker.shared.get_config()
         self.logger = self.config.build_logger(self)
         self.index_path = self.path / 'index.yaml'
         try:
@@ -157,6 +219,7 @@ class _StatementsDirectory:
             [cur.date_dt for cur in self.statements],
             self.index_data.start_date,
             self.index_data.end_date,
+            calendar=True,
         )
         self.missing_statement_dates = self.freq_helper.find_missing_statement_dates()
 
@@ -190,7 +253,9 @@ class _StatementsDirectory:
     def actual_file_paths(self):
         actual = []
         skip_list = ['index']
-        for cur in sorted(self.path.iterdir()):
+        # Sort the names, not the paths. (Comparing pathlib paths is slow.)
+        for cur_name in sorted(os.listdir(self.path)):
+            cur = self.path / cur_name
             cur_stem = cur.stem
             if cur_stem in skip_list:
                 self.logger.debug('Skipping from skip_list: %s', cur)
@@ -205,8 +270,10 @@ class _StatementsDirectory:
     def statements(self):
         self.logger.debug('Loading statements: %s', self)
         statements = []
-        found_dts = []
+        found_dts = set()
         actual_file_paths = self.actual_file_paths
+        actual_set = set(actual_file_paths)
+        mapped_paths = set()
         for cur_file, cur_dt in self.index_data.filename_date_map.items():
             cur_path = self.path / cur_file
             new_item = _StatementItem(
@@ -214,39 +281,56 @@ class _StatementsDirectory:
                 date_dt=cur_dt,
             )
             # Remove the current file from the "actual" list.
-            try:
-                actual_file_paths.remove(cur_path)
-            except ValueError:
+            if cur_path in actual_set:
+                mapped_paths.add(cur_path)
+            else:
                 self.logger.error(f'File in filename_date_map does not exist: {cur_path}')
-            found_dts.append(new_item.date_dt)
+            found_dts.add(new_item.date_dt)
             statements.append(new_item)
         for cur in self.index_data.null_statements:
             if cur.date_dt in found_dts:
                 raise ConfigError(f'Duplicate dates: {cur.date_dt} (path:{self.path})')
-            found_dts.append(cur.date_dt)
+            found_dts.add(cur.date_dt)
             statements.append(cur)
         for cur in self.index_data.known_missing_statements:
             if cur.date_dt in found_dts:
                 raise ConfigError(f'Duplicate dates: {cur.date_dt} (path:{self.path})')
-            found_dts.append(cur.date_dt)
+            found_dts.add(cur.date_dt)
             statements.append(cur)
+        name_formats = self.index_data.name_formats
         for cur in actual_file_paths:
-            new_item = _StatementItem.from_file(cur, self.index_data.name_formats)
+            if cur in mapped_paths:
+                continue
+            new_item = _StatementItem.from_file(cur, name_formats)
             if new_item.date_dt in found_dts:
                 raise ConfigError(f'Duplicate dates: {new_item.date_dt} (path:{self.path})')
-            found_dts.append(new_item.date_dt)
+            found_dts.add(new_item.date_dt)
             statements.append(new_item)
         # Sort the statements by date.
         sorted_statements = sorted(statements, key=lambda cur: cur.date_dt)
         return sorted_statements
 
-    def verify(self):
+    def _verify(self):
         self.logger.debug('Verify statements dir: %s', self)
         if len(self.missing_statement_dates) > 0:
             cur_dir = self.path.stem
             slug = self.account_index_data.slug
             for cur in self.missing_statement_dates:
                 self.logger.error('Missing statement: %s/%s - %s', slug, cur_dir, cur)
+            return False, None
+        return True, {'statements': len(self.statements)}
+
+    def verify(self, ledger=None):
+        if ledger is None:
+            self._verify()
+            return
+        key = 'statements:{}/{}'.format(self.account_index_data.slug, self.path.name)
+        # Missing statements depend on "today" too. And on the account's index file,
+        # legacy statements dirs get their start date and period from it.
+        digest = pybanker.ledger.tree_digest(
+            self.path, datetime.date.today().isoformat(),
+            pybanker.ledger.tree_digest(self.account_index_data.index_path))
+        ledger.check(key, digest, self._verify)
 
 
 @dataclasses.dataclass
@@ -257,7 +341,7 @@ class StatementsManager:
     account_index_data: object
 
     def __post_init__(self):
-        self.config = pybanker.shared.GlobalConfig()
+        self.config = pybanker.shared.get_config()
         self.logger = self.config.build_logger(self)
         #
         self._init_dirs()
@@ -278,7 +362,7 @@ class StatementsManager:
     def statements(self):
         raise NotImplementedError('StatementsManager.statements not done.')
 
-    def verify(self):
+    def verify(self, ledger=None):
         self.logger.debug('Verifying statements: %s', self.account_key)
         for cur in self.statements_directories:
-            cur.verify()
+            cur.verify(ledger=ledger)
@@ -0,0 +1,202 @@
+"""
+Secondary indexes over the TransactionStore.
+
+    date:     sorted (date ordinal, row) arrays, for bisect range lookups
+    payee:    payee string ID -> rows
+    category: split category string ID -> split rows
+    amount:   amount bucket -> rows (buckets are powers of 2, in cents)
+    receipt:  receipt file name string ID -> rows
+
+Rows whose value did not fit a column (see transaction_store) are not in that index.
+"""
+import array
+import bisect
+
+import pybanker.transaction_store
+
+
+def _amount_bucket(cents):
+    # Negative amounts get negative buckets. (0 is its own bucket.)
+    bucket = abs(cents).bit_length()
+    return -bucket if cents < 0 else bucket
+
+
+def _bucket_range(bucket):
+    """The (min, max) cents of a bucket."""
+    magnitude = abs(bucket)
+    low = 0 if magnitude == 0 else 1 << (magnitude - 1)
+    high = (1 << magnitude) - 1
+    if bucket < 0:
+        return -high, -low
+    return low, high
+
+
+def _to_cents(amount):
+    if amount is None:
+        return None
+    return round(amount * 100)
+
+
+def _in_range(cents, min_cents, max_cents):
+    return (min_cents is None or cents >= min_cents) and (max_cents is None or cents <= max_cents)
+
+
+class TransactionIndexes(object):
+
+    def __init__(self, store):
+        self.store = store
+        self.date_ordinals = array.array('i')
+        self.date_rows = array.array('l')
+        self.payees = {}
+        self.categories = {}
+        self.amounts = {}
+        self.receipts = {}
+        self.size = 0
+        self._build()
+
+    @staticmethod
+    def _add_to(index, key, row):
+        rows = index.get(key)
+        if rows is None:
+            rows = index[key] = array.array('l')
+        rows.append(row)
+
+    def _build(self):
+        store = self.store
+        main_extras = store.main.extras
+        dated = [
+            (ordinal, row) for row, ordinal in enumerate(store.main.date)
+            if 'date' not in main_extras.get(row, ())]
+        dated.sort()
+        self.date_ordinals = array.array('i', (cur[0] for cur in dated))
+        self.date_rows = array.array('l', (cur[1] for cur in dated))
+        for row in range(len(store)):
+            self._add_other(row)
+        self.size = len(store)
+
+    def _add_other(self, row):
+        """Add `row` to every index except the date index."""
+        store = self.store
+        row_extras = store.main.extras.get(row, ())
+        if 'payee' not in row_extras:
+            self._add_to(self.payees, store.main.payee[row], row)
+        if 'amount' not in row_extras:
+            self._add_to(self.amounts, _amount_bucket(store.main.amount[row]), row)
+        for cur in store.split_rows(row):
+            category = store.splits.category[cur]
+            if category != pybanker.transaction_store.NO_STRING:
+                self._add_to(self.categories, category, cur)
+        for cur in store.receipt_rows(row):
+            file_name = store.receipts.file_name[cur]
+            if file_name != pybanker.transaction_store.NO_STRING:
+                self._add_to(self.receipts, file_name, row)
+
+    def add(self, row):
+        """Index a row that was just added to the store."""
+        store = self.store
+        if 'date' not in store.main.extras.get(row, ()):
+            ordinal = store.main.date[row]
+            # Rows are usually added in date order, so this is normally an append.
+            position = bisect.bisect_right(self.date_ordinals, ordinal)
+            self.date_ordinals.insert(position, ordinal)
+            self.date_rows.insert(position, row)
+        self._add_other(row)
+        self.size = max(self.size, row + 1)
+
+    def truncate(self, row_count):
+        """Forget the rows from `row_count` on. (Before they are dropped from the store.)"""
+        store = self.store
+        main_extras = store.main.extras
+        for row in range(row_count, self.size):
+            if 'date' in main_extras.get(row, ()):
+                continue
+            ordinal = store.main.date[row]
+            first = bisect.bisect_left(self.date_ordinals, ordinal)
+            last = bisect.bisect_right(self.date_ordinals, ordinal)
+            position = first + self.date_rows[first:last].index(row)
+            del self.date_ordinals[position]
+            del self.date_rows[position]
+        # The other indexes' rows are in (split) row order.
+        split_count = store.split_offsets[row_count]
+        for index, first_dropped in [
+                (self.payees, row_count), (self.amounts, row_count),
+                (self.receipts, row_count), (self.categories, split_count)]:
+            for cur_key, cur_rows in list(index.items()):
+                del cur_rows[bisect.bisect_left(cur_rows, first_dropped):]
+                if not cur_rows:
+                    del index[cur_key]
+        self.size = min(self.size, row_count)
+
+    # Lookups (each returns a set of rows, or split rows for the categories)
+
+    def rows_by_date(self, start=None, end=None):
+        first = 0 if start is None else bisect.bisect_left(self.date_ordinals, start.toordinal())
+        last = len(self.date_ordinals) if end is None else bisect.bisect_right(
+            self.date_ordinals, end.toordinal())
+        return set(self.date_rows[first:last])
+
+    def _string_id(self, value):
+        return self.store.strings.ids.get(value)
+
+    def rows_by_payee(self, payee):
+        return set(self.payees.get(self._string_id(payee), ()))
+
+    def rows_by_receipt(self, file_name):
+        return set(self.receipts.get(self._string_id(file_name), ()))
+
+    def split_rows_by_category(self, category):
+        return set(self.categories.get(self._string_id(category), ()))
+
+    def rows_by_amount(self, min_cents=None, max_cents=None):
+        rows = set()
+        for bucket, bucket_rows in self.amounts.items():
+            low, high = _bucket_range(bucket)
+            if min_cents is not None and high < min_cents:
+                continue
+            if max_cents is not None and low > max_cents:
+                continue
+            if _in_range(low, min_cents, max_cents) and _in_range(high, min_cents, max_cents):
+                rows.update(bucket_rows)
+                continue
+            # Partly in range, check each row.
+            amounts = self.store.main.amount
+            rows.update(
+                cur for cur in bucket_rows if _in_range(amounts[cur], min_cents, max_cents))
+        return rows
+
+    def query(self, start=None, end=None, payee=None, category=None,
+              min_amount=None, max_amount=None, receipt=None):
+        """Return the matching rows, sorted by date.
+
+        All of the given filters must match. When `category` is given, the amount
+        limits apply to that category's splits, otherwise to the transaction amount.
+        """
+        min_cents = _to_cents(min_amount)
+        max_cents = _to_cents(max_amount)
+        candidates = []
+        if start is not None or end is not None:
+            candidates.append(self.rows_by_date(start, end))
+        if payee is not None:
+            candidates.append(self.rows_by_payee(payee))
+        if receipt is not None:
+            candidates.append(self.rows_by_receipt(receipt))
+        if category is not None:
+            split_amounts = self.store.splits.amount
+            split_rows = [
+                cur for cur in self.split_rows_by_category(category)
+                if _in_range(split_amounts[cur], min_cents, max_cents)]
+            offsets = self.store.split_offsets
+            candidates.append({bisect.bisect_right(offsets, cur) - 1 for cur in split_rows})
+        elif min_cents is not None or max_cents is not None:
+            candidates.append(self.rows_by_amount(min_cents, max_cents))
+        if not candidates:
+            rows = set(range(len(self.store)))
+        else:
+            candidates.sort(key=len)
+            rows = candidates[0].intersection(*candidates[1:])
+        dates = self.store.main.date
+        return sorted(rows, key=lambda cur: (dates[cur], cur))
+
+
+if __name__ == '__main__':
+    pass
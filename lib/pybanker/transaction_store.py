@@ -0,0 +1,446 @@
+"""
+Columnar (array backed) storage for transactions.
+
+Every transaction is a row in a set of typed arrays:
+    date ordinal, amount (in cents), entered_nano, payee (interned string ID)
+Splits and receipts are flattened into their own tables. Each transaction's rows
+in those tables are found with an offsets array. (Like a CSR matrix.)
+
+Values that do not fit a column (e.g. a date that is not a date, or an amount that is
+not a whole number of cents) and any other keys are kept, as is, in a per row "extras"
+dict. So nothing is lost and the record views return exactly what was loaded.
+"""
+import array
+import collections.abc
+import datetime
+import re
+
+# IDs are normally a sha256 hex digest. Those get stored as 32 raw bytes.
+_HEX_ID_MATCHER = re.compile(r'[0-9a-f]{64}')
+_DIGEST_SIZE = 32
+NO_STRING = -1
+
+
+class _Absent(object):
+    """Marks a core key that was missing from the loaded record."""
+
+    def __reduce__(self):
+        # Pickle as a reference, so the sentinel is still the same object after unpickling.
+        return '_ABSENT'
+
+    def __repr__(self):
+        return '_ABSENT'
+
+
+_ABSENT = _Absent()
+
+
+class _StringTable(object):
+    """Interns strings (payees, categories, ...) to small integer IDs."""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.values.append(value)
+            self.ids[value] = string_id
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self.values[string_id]
+
+    def __len__(self):
+        return len(self.values)
+
+
+def to_cents(value):
+    """Return `value` as integer cents. (None if that would not be exact.)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        cents = round(value * 100)
+        if cents / 100 == value:
+            return cents
+    return None
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+def _to_ordinal(value):
+    # datetime.datetime is a date too, but would lose its time.
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return value.toordinal()
+    return None
+
+
+def _to_int64(value):
+    if isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63:
+        return value
+    return None
+
+
+class _Columns(object):
+    """A set of parallel typed arrays, plus the extras for rows that did not fit."""
+
+    def __init__(self, **typecodes):
+        self.names = tuple(typecodes)
+        for name, typecode in typecodes.items():
+            setattr(self, name, array.array(typecode))
+        self.extras = {}
+
+    def truncate(self, row_count):
+        """Drop the rows from `row_count` on."""
+        for name in self.names:
+            del getattr(self, name)[row_count:]
+        self.extras = {row: cur for row, cur in self.extras.items() if row < row_count}
+
+    def extend(self, source, start, stop):
+        """Append the rows [start, stop) of another _Columns (with the same columns)."""
+        offset = len(getattr(self, self.names[0])) - start
+        for name in self.names:
+            getattr(self, name).extend(getattr(source, name)[start:stop])
+        for row, row_extras in source.extras.items():
+            if start <= row < stop:
+                self.extras[row + offset] = dict(row_extras)
+
+    def add_extra(self, row, key, value):
+        self.extras.setdefault(row, {})[key] = value
+
+    def get(self, row, key, column, decode):
+        row_extras = self.extras.get(row)
+        if row_extras is not None and key in row_extras:
+            value = row_extras[key]
+            if value is _ABSENT:
+                raise KeyError(key)
+            return value
+        return decode(getattr(self, column)[row])
+
+    def has(self, row, key):
+        row_extras = self.extras.get(row)
+        if row_extras is not None and row_extras.get(key, None) is _ABSENT:
+            return False
+        return True
+
+    def extra_items(self, row):
+        row_extras = self.extras.get(row, {})
+        return [(cur_key, cur) for cur_key, cur in row_extras.items() if cur is not _ABSENT]
+
+
+class TransactionStore(collections.abc.Mapping):
+    """All of the transactions, by transaction ID. (Values are record views.)"""
+    # The keys stored in columns. Anything else is an "extra".
+    core_keys = ('date', 'payee', 'amount', 'entered_nano', 'splits', 'receipts')
+    split_core_keys = ('category', 'amount', 'note')
+    receipt_core_keys = ('file_name',)
+
+    def __init__(self, view_class=None):
+        """view_class: the class of the record views. (Default: TransactionView.)"""
+        self.view_class = view_class or TransactionView
+        self.strings = _StringTable()
+        self.digests = bytearray()
+        # Row -> ID, only for IDs that are not sha256 hex digests.
+        self.odd_ids = {}
+        # ID (digest bytes or odd str) -> row
+        self.rows = {}
+        self.main = _Columns(date='i', amount='q', entered_nano='q', payee='i')
+        self.split_offsets = array.array('l', [0])
+        self.splits = _Columns(amount='q', category='i', note='i')
+        self.receipt_offsets = array.array('l', [0])
+        self.receipts = _Columns(file_name='i')
+
+    # Mapping interface
+
+    @staticmethod
+    def _row_key(transaction_id):
+        if isinstance(transaction_id, str) and _HEX_ID_MATCHER.fullmatch(transaction_id):
+            return bytes.fromhex(transaction_id)
+        return transaction_id
+
+    def __getitem__(self, transaction_id):
+        return self.view_class(self, self.rows[self._row_key(transaction_id)])
+
+    def __contains__(self, transaction_id):
+        return self._row_key(transaction_id) in self.rows
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.transaction_id(row)
+
+    def __len__(self):
+        return len(self.split_offsets) - 1
+
+    def row(self, row):
+        return self.view_class(self, row)
+
+    def transaction_id(self, row):
+        odd = self.odd_ids.get(row)
+        if odd is not None:
+            return odd
+        start = row * _DIGEST_SIZE
+        return self.digests[start:start + _DIGEST_SIZE].hex()
+
+    def _key_of(self, row):
+        """The `rows` key of a row. (See _row_key.)"""
+        odd = self.odd_ids.get(row)
+        if odd is not None:
+            return odd
+        start = row * _DIGEST_SIZE
+        return bytes(self.digests[start:start + _DIGEST_SIZE])
+
+    # Loading
+
+    def _add_string(self, columns, row, key, data, column):
+        value = data.get(key, _ABSENT)
+        if isinstance(value, str):
+            getattr(columns, column).append(self.strings.intern(value))
+            return
+        getattr(columns, column).append(NO_STRING)
+        columns.add_extra(row, key, value)
+
+    @staticmethod
+    def _add_encoded(columns, row, key, data, column, encode):
+        value = data.get(key, _ABSENT)
+        encoded = None if value is _ABSENT else encode(value)
+        if encoded is None:
+            getattr(columns, column).append(0)
+            columns.add_extra(row, key, value)
+        else:
+            getattr(columns, column).append(encoded)
+
+    @staticmethod
+    def _add_other_keys(columns, row, data, core_keys):
+        for cur_key, cur_value in data.items():
+            if cur_key not in core_keys:
+                columns.add_extra(row, cur_key, cur_value)
+
+    def _add_split(self, split):
+        row = len(self.splits.amount)
+        self._add_encoded(self.splits, row, 'amount', split, 'amount', to_cents)
+        self._add_string(self.splits, row, 'category', split, 'category')
+        if 'note' in split and isinstance(split['note'], str):
+            self.splits.note.append(self.strings.intern(split['note']))
+        else:
+            self.splits.note.append(NO_STRING)
+            if 'note' in split:
+                self.splits.add_extra(row, 'note', split['note'])
+        self._add_other_keys(self.splits, row, split, self.split_core_keys)
+
+    def _add_receipt(self, receipt):
+        row = len(self.receipts.file_name)
+        self._add_string(self.receipts, row, 'file_name', receipt, 'file_name')
+        self._add_other_keys(self.receipts, row, receipt, self.receipt_core_keys)
+
+    def _add_list(self, row, key, data, offsets, add_child):
+        value = data.get(key, _ABSENT)
+        if isinstance(value, list) and all(isinstance(cur, dict) for cur in value):
+            for cur in value:
+                add_child(cur)
+            offsets.append(offsets[-1] + len(value))
+        else:
+            self.main.add_extra(row, key, value)
+            offsets.append(offsets[-1])
+
+    def append(self, transaction_id, data):
+        """Add a transaction (no duplicate check) and return its view."""
+        row = len(self)
+        row_key = self._row_key(transaction_id)
+        if isinstance(row_key, bytes):
+            self.digests += row_key
+        else:
+            self.digests += bytes(_DIGEST_SIZE)
+            self.odd_ids[row] = transaction_id
+        self._add_encoded(self.main, row, 'date', data, 'date', _to_ordinal)
+        self._add_encoded(self.main, row, 'amount', data, 'amount', to_cents)
+        self._add_encoded(self.main, row, 'entered_nano', data, 'entered_nano', _to_int64)
+        self._add_string(self.main, row, 'payee', data, 'payee')
+        self._add_list(row, 'receipts', data, self.receipt_offsets, self._add_receipt)
+        # The splits offsets are added last, they define len().
+        self._add_list(row, 'splits', data, self.split_offsets, self._add_split)
+        self._add_other_keys(self.main, row, data, self.core_keys)
+        self.rows[row_key] = row
+        return self.view_class(self, row)
+
+    # Splicing (reloading some of the files, without going through the record dicts)
+
+    def truncate(self, row_count):
+        """Drop the rows from `row_count` on. (The interned strings are kept.)"""
+        for row in range(row_count, len(self)):
+            del self.rows[self._key_of(row)]
+        self.main.truncate(row_count)
+        self.splits.truncate(self.split_offsets[row_count])
+        self.receipts.truncate(self.receipt_offsets[row_count])
+        del self.split_offsets[row_count + 1:]
+        del self.receipt_offsets[row_count + 1:]
+        del self.digests[row_count * _DIGEST_SIZE:]
+        self.odd_ids = {row: cur for row, cur in self.odd_ids.items() if row < row_count}
+
+    def split_off(self, row_count):
+        """Move the rows from `row_count` on to a new store (that shares the strings)."""
+        tail = self.__class__(view_class=self.view_class)
+        tail.strings = self.strings
+        tail.extend_rows(self, row_count, len(self))
+        self.truncate(row_count)
+        return tail
+
+    @staticmethod
+    def _extend_offsets(offsets, source_offsets, start, stop, child_count):
+        delta = child_count - source_offsets[start]
+        offsets.extend(cur + delta for cur in source_offsets[start + 1:stop + 1])
+
+    def extend_rows(self, source, start, stop):
+        """Append the rows [start, stop) of another store, column by column.
+
+        The stores must share their string table. (See split_off.)
+        Raises KeyError (with the transaction ID) for an ID that is already here.
+        """
+        if source.strings is not self.strings:
+            raise ValueError('Only stores that share their strings can be spliced.')
+        first_row = len(self)
+        keys = [source._key_of(row) for row in range(start, stop)]
+        for cur in keys:
+            if cur in self.rows:
+                raise KeyError(cur.hex() if isinstance(cur, bytes) else cur)
+        self.digests += source.digests[start * _DIGEST_SIZE:stop * _DIGEST_SIZE]
+        for row, cur in source.odd_ids.items():
+            if start <= row < stop:
+                self.odd_ids[row - start + first_row] = cur
+        self.main.extend(source.main, start, stop)
+        split_count = len(self.splits.amount)
+        self.splits.extend(source.splits, source.split_offsets[start], source.split_offsets[stop])
+        receipt_count = len(self.receipts.file_name)
+        self.receipts.extend(
+            source.receipts, source.receipt_offsets[start], source.receipt_offsets[stop])
+        self._extend_offsets(
+            self.receipt_offsets, source.receipt_offsets, start, stop, receipt_count)
+        # The splits offsets are added last, they define len().
+        self._extend_offsets(self.split_offsets, source.split_offsets, start, stop, split_count)
+        self.rows.update(zip(keys, range(first_row, first_row + len(keys))))
+
+    # Reading
+
+    def get_value(self, row, key):
+        if key == 'date':
+            return self.main.get(row, key, 'date', datetime.date.fromordinal)
+        if key == 'amount':
+            return self.main.get(row, key, 'amount', from_cents)
+        if key == 'entered_nano':
+            return self.main.get(row, key, 'entered_nano', int)
+        if key == 'payee':
+            return self.main.get(row, key, 'payee', self.strings.__getitem__)
+        if key == 'splits':
+            return self.main.get(row, key, None, None) if self._is_extra(row, key) else [
+                self._split_dict(cur) for cur in self.split_rows(row)]
+        if key == 'receipts':
+            return self.main.get(row, key, None, None) if self._is_extra(row, key) else [
+                self._receipt_dict(cur) for cur in self.receipt_rows(row)]
+        for cur_key, cur_value in self.main.extra_items(row):
+            if cur_key == key:
+                return cur_value
+        raise KeyError(key)
+
+    def _is_extra(self, row, key):
+        return key in self.main.extras.get(row, {})
+
+    def keys_for(self, row):
+        keys = [cur for cur in self.core_keys if self.main.has(row, cur)]
+        core = set(self.core_keys)
+        keys.extend(cur for cur, value in self.main.extra_items(row) if cur not in core)
+        return keys
+
+    def split_rows(self, row):
+        return range(self.split_offsets[row], self.split_offsets[row + 1])
+
+    def receipt_rows(self, row):
+        return range(self.receipt_offsets[row], self.receipt_offsets[row + 1])
+
+    def _split_dict(self, split_row):
+        split = {}
+        for cur_key, cur_column, cur_decode in [
+                ('category', 'category', self.strings.__getitem__),
+                ('amount', 'amount', from_cents)]:
+            try:
+                split[cur_key] = self.splits.get(split_row, cur_key, cur_column, cur_decode)
+            except KeyError:
+                pass
+        note = self.splits.note[split_row]
+        if note != NO_STRING:
+            split['note'] = self.strings[note]
+        split.update(self.splits.extra_items(split_row))
+        return split
+
+    def _receipt_dict(self, receipt_row):
+        receipt = {}
+        try:
+            receipt['file_name'] = self.receipts.get(
+                receipt_row, 'file_name', 'file_name', self.strings.__getitem__)
+        except KeyError:
+            pass
+        receipt.update(self.receipts.extra_items(receipt_row))
+        return receipt
+
+    def split_total_cents(self, row):
+        """Sum of the split amounts, in cents. (None if any amount is not in the column.)"""
+        total = 0
+        extras = self.splits.extras
+        for cur in self.split_rows(row):
+            if cur in extras and 'amount' in extras[cur]:
+                return None
+            total += self.splits.amount[cur]
+        return total
+
+    def amount_cents(self, row):
+        if 'amount' in self.main.extras.get(row, {}):
+            return None
+        return self.main.amount[row]
+
+    def receipt_links(self):
+        """Yield (transaction ID, receipt file name) for every receipt."""
+        offsets = self.receipt_offsets
+        for row in range(len(self)):
+            for cur in range(offsets[row], offsets[row + 1]):
+                file_name = self.receipts.file_name[cur]
+                if file_name == NO_STRING:
+                    file_name = self._receipt_dict(cur).get('file_name')
+                else:
+                    file_name = self.strings[file_name]
+                yield self.transaction_id(row), file_name
+
+
+class TransactionView(collections.abc.Mapping):
+    """A read only, dict like view of one row in a TransactionStore."""
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        if key == 'transaction-id':
+            return self.transaction_id
+        return self._store.get_value(self._row, key)
+
+    def __iter__(self):
+        yield 'transaction-id'
+        yield from self._store.keys_for(self._row)
+
+    def __len__(self):
+        return 1 + len(self._store.keys_for(self._row))
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, dict(self))
+
+    @property
+    def transaction_id(self):
+        return self._store.transaction_id(self._row)
+
+
+if __name__ == '__main__':
+    pass
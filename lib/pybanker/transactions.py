@@ -1,13 +1,21 @@
 """
 """
-import collections
+import bisect
+import concurrent.futures
+import datetime
 import hashlib
 import os
 import re
 
-import yaml
-
+import pybanker.cache
+import pybanker.ledger
 import pybanker.shared
+import pybanker.transaction_index
+import pybanker.transaction_store
+import pybanker.verification
+
+# E.g. "2021-03.yaml"
+_MONTH_FILE_MATCHER = re.compile(r'(\d{4})-(\d{2}).(yaml|json)')
 
 
 class BadTransactionFileException(Exception):
@@ -18,17 +26,9 @@ class BadTransactionException(Exception):
     pass
 
 
-class _TransactionItem(collections.UserDict):
-
-    def __init__(self, transaction_id):
-        """
-        """
-        super().__init__({})
-        self['transaction-id'] = transaction_id
-
-    @property
-    def transaction_id(self):
-        return self['transaction-id']
+class _TransactionItem(pybanker.transaction_store.TransactionView):
+    """A (read only) view of one transaction in the TransactionStore."""
+    __slots__ = ()
 
     @property
     def date_string(self):
@@ -38,9 +38,6 @@ class _TransactionItem(collections.UserDict):
     def amount_string(self):
         return str(self['amount'])
 
-    def load_data(self, data):
-        self.update(data)
-
     def calc_id(self):
         if 'entered_nano' not in self:
             raise BadTransactionException('Entered time is missing.')
@@ -62,72 +59,244 @@ class _TransactionItem(collections.UserDict):
         return
 
     def calc_split_total(self):
+        total_cents = self._store.split_total_cents(self._row)
+        if total_cents is not None:
+            return pybanker.transaction_store.from_cents(total_cents)
         total = 0
         for cur in self['splits']:
             total += cur['amount']
         return total
 
     def _verify_splits(self):
-        if self['amount'] != self.calc_split_total():
+        # Compare whole cents when possible. (Summing floats can be off by a little.)
+        amount_cents = self._store.amount_cents(self._row)
+        total_cents = self._store.split_total_cents(self._row)
+        if amount_cents is not None and total_cents is not None:
+            matches = amount_cents == total_cents
+        else:
+            matches = self['amount'] == self.calc_split_total()
+        if not matches:
             raise BadTransactionException(
                 'Split total not equal to transaction amount: {}'.format(
                     self.transaction_id))
 
 
+def _new_store():
+    return pybanker.transaction_store.TransactionStore(view_class=_TransactionItem)
+
+
+def read_transaction_file(file_name):
+    """Parse one transaction file. (Module level, so it can run in a worker process.)"""
+    if file_name.endswith('.yaml'):
+        return pybanker.cache.load_yaml(file_name)
+    # TODO add json support (need some tests)
+    raise BadTransactionFileException('Unknown file type: {}'.format(file_name))
+
+
 class Transactions(object):
 
-    def __init__(self):
-        self.config = pybanker.shared.GlobalConfig()
+    def __init__(self, workers=None, preload=True):
+        """
+        workers: number of processes used to parse the transaction files.
+            (Default: GlobalConfig.transaction_workers. 1 means parse sequentially.)
+        preload: load every transaction file now.
+            (Use False when only streaming with `iter()`.)
+        """
+        self.config = pybanker.shared.get_config()
         self.logger = self.config.build_logger(self)
-        self.transactions = dict()
-        self._load_all_transactions()
+        self.workers = workers if workers is not None else self.config.transaction_workers
+        # Transaction ID -> _TransactionItem (a view into the columnar store).
+        self.transactions = _new_store()
+        # File name -> (first row, last row + 1) in the store.
+        self.file_rows = dict()
+        self._indexes = None
+        if preload:
+            self._load_all_transactions()
 
     @property
     def transactions_dir(self):
-        return os.path.join(self.config.data_dir, 'transactions')
+        return self.config.transactions_directory
 
-    def add_transaction(self, transaction):
-        cur_id = transaction.transaction_id
-        if cur_id in self.transactions:
-            raise BadTransactionException('Duplicate ID: {}'.format(cur_id))
-        self.transactions[cur_id] = transaction
+    def add_transaction(self, transaction_id, data):
+        """Add one transaction (a dict, as loaded from a file) and return its view."""
+        if transaction_id in self.transactions:
+            raise BadTransactionException('Duplicate ID: {}'.format(transaction_id))
+        new_transaction = self.transactions.append(transaction_id, data)
+        if self._indexes is not None:
+            self._indexes.add(len(self.transactions) - 1)
+        return new_transaction
 
-    def parse_file(self, file_name):
-        with open(file_name, 'r') as fp:
-            if file_name.endswith('.yaml'):
-                all_data = yaml.safe_load(fp)
-            # TODO add json support (need some tests)
-            else:
-                raise BadTransactionFileException(
-                    'Unknown file type: {}'.format(file_name))
+    @property
+    def indexes(self):
+        """The secondary indexes. (Built the first time they are used.)"""
+        if self._indexes is None:
+            self._indexes = pybanker.transaction_index.TransactionIndexes(self.transactions)
+        return self._indexes
+
+    def query(self, start=None, end=None, payee=None, category=None,
+              min_amount=None, max_amount=None, receipt=None):
+        """Return the matching transactions (sorted by date). See TransactionIndexes.query()."""
+        rows = self.indexes.query(
+            start=start, end=end, payee=payee, category=category,
+            min_amount=min_amount, max_amount=max_amount, receipt=receipt)
+        return [self.transactions.row(cur) for cur in rows]
+
+    def _add_file_data(self, file_name, all_data):
+        start = len(self.transactions)
         for cur_id, cur_data in all_data.items():
-            new_transaction = _TransactionItem(cur_id)
-            new_transaction.load_data(cur_data)
-            self.add_transaction(new_transaction)
+            self.add_transaction(cur_id, cur_data)
+        self.file_rows[file_name] = (start, len(self.transactions))
 
-    def _load_all_transactions(self):
-        self.logger.debug(f'Finding transactions in: {self.transactions_dir}')
-        file_matcher = re.compile(r'/.*/\d{4}-\d{2}.(yaml|json)')
+    def reload_files(self, file_names):
+        """Re-read the given transaction files (changed, added or removed).
+
+        The rows of the unchanged files before the first changed one stay where they are.
+        The rest of the store is split off and rebuilt in file order: the given files are
+        parsed and the other files' rows are copied back, column by column.
+        (So editing the latest month only touches that month's rows.)
+        """
+        changed = set(file_names)
+        old_file_rows = self.file_rows
+        old_files = sorted(old_file_rows, key=lambda cur: old_file_rows[cur][0])
+        files = self._find_transaction_files()
+        keep = 0
+        for cur_file, cur_old in zip(files, old_files):
+            if cur_file != cur_old or cur_file in changed:
+                break
+            keep += 1
+        cut = old_file_rows[files[keep - 1]][1] if keep else 0
+        if self._indexes is not None:
+            self._indexes.truncate(cut)
+        tail = self.transactions.split_off(cut)
+        self.file_rows = {cur: old_file_rows[cur] for cur in files[:keep]}
+        for cur in files[keep:]:
+            if cur in changed or cur not in old_file_rows:
+                self.parse_file(cur)
+                continue
+            start, stop = old_file_rows[cur]
+            first_row = len(self.transactions)
+            try:
+                self.transactions.extend_rows(tail, start - cut, stop - cut)
+            except KeyError as exc:
+                raise BadTransactionException('Duplicate ID: {}'.format(exc.args[0]))
+            self.file_rows[cur] = (first_row, len(self.transactions))
+            if self._indexes is not None:
+                for row in range(first_row, len(self.transactions)):
+                    self._indexes.add(row)
+        self.logger.debug(
+            'Reloaded transaction files: %s (kept %d rows)', sorted(changed), cut)
+
+    def parse_file(self, file_name):
+        self._add_file_data(file_name, read_transaction_file(file_name))
+
+    def month_files(self):
+        """Return a sorted list of ((year, month), file name) for the monthly transaction files."""
+        found = []
         for cur in os.listdir(self.transactions_dir):
-            full = os.path.join(self.transactions_dir, cur)
-            if file_matcher.match(full) is None:
+            matches = _MONTH_FILE_MATCHER.match(cur)
+            if matches is None:
                 continue
-            self.parse_file(full)
+            month = (int(matches.group(1)), int(matches.group(2)))
+            found.append((month, os.path.join(self.transactions_dir, cur)))
+        return sorted(found)
 
-    def verify_data(self):
-        for cur_id, cur_transaction in self.transactions.items():
-            cur_transaction.verify_data()
+    def _find_transaction_files(self):
+        """Return the (sorted) monthly transaction files."""
+        return [cur_file for cur_month, cur_file in self.month_files()]
+
+    def _load_all_transactions(self):
+        self.logger.debug(f'Finding transactions in: {self.transactions_dir}')
+        file_names = self._find_transaction_files()
+        if self.workers <= 1 or len(file_names) < self.config.parallel_min_files:
+            for cur in file_names:
+                self.parse_file(cur)
+            return
+        self.logger.debug('Parsing %d files with %d workers.', len(file_names), self.workers)
+        chunk_size = max(1, len(file_names) // (self.workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=pybanker.shared.set_config,
+                initargs=(self.config,)) as pool:
+            # map() keeps the file order, so the merge (and duplicate checks) is deterministic.
+            all_file_data = pool.map(read_transaction_file, file_names, chunksize=chunk_size)
+            for cur_file, cur_data in zip(file_names, all_file_data):
+                self._add_file_data(cur_file, cur_data)
+
+    def iter(self, start=None, end=None):
+        """Yield the transactions dated between `start` and `end` (inclusive, either can be None).
+
+        Only the month files that overlap the range are read, one at a time,
+        so this does not need (or fill) `self.transactions`.
+        """
+        month_files = self.month_files()
+        months = [cur_month for cur_month, cur_file in month_files]
+        first = 0 if start is None else bisect.bisect_left(months, (start.year, start.month))
+        last = len(months) if end is None else bisect.bisect_right(months, (end.year, end.month))
+        for cur_month, cur_file in month_files[first:last]:
+            self.logger.debug('Streaming transactions from: %s', cur_file)
+            # A store per file, so only one month is in memory at a time.
+            month_store = _new_store()
+            for cur_id, cur_data in read_transaction_file(cur_file).items():
+                cur_dt = cur_data.get('date')
+                if isinstance(cur_dt, datetime.datetime):
+                    # YAML timestamps load as datetimes, which don't compare with dates.
+                    cur_dt = cur_dt.date()
+                if isinstance(cur_dt, datetime.date):
+                    if start is not None and cur_dt < start:
+                        continue
+                    if end is not None and cur_dt > end:
+                        continue
+                yield month_store.append(cur_id, cur_data)
+
+    def verify(self, fail_fast=False, workers=None):
+        """Check every transaction and return a VerificationReport (with all of the failures)."""
+        verifier = pybanker.verification.TransactionVerifier(
+            self.transactions,
+            workers=workers if workers is not None else self.workers)
+        return verifier.verify(fail_fast=fail_fast)
+
+    def _verify_with_ledger(self, ledger):
+        """Only verify the files that changed since their last successful verification."""
+        verifier = pybanker.verification.TransactionVerifier(
+            self.transactions, workers=self.workers)
+        report = pybanker.verification.VerificationReport()
+        last_row = 0
+        for cur_file, (start, stop) in self.file_rows.items():
+            last_row = max(last_row, stop)
+
+            def verify_file(start=start, stop=stop):
+                file_report = verifier.verify(start, stop)
+                report.merge(file_report)
+                return file_report.ok, {'checked': file_report.checked}
+
+            key = 'transactions:{}'.format(os.path.relpath(cur_file, self.config.data_dir))
+            ledger.check(key, pybanker.ledger.file_digest(cur_file), verify_file)
+        # Anything added after the files were loaded.
+        report.merge(verifier.verify(last_row, len(self.transactions)))
+        return report
+
+    def verify_data(self, ledger=None):
+        """Verify the transactions. (Raises on failure.)
+
+        ledger: a VerificationLedger, to skip the files that were already verified.
+        """
+        if ledger is None:
+            report = self.verify()
+        else:
+            report = self._verify_with_ledger(ledger)
+        for cur in report.failures:
+            self.logger.error('Bad transaction (%s): %s', cur.check, cur.message)
+        if not report.ok:
+            raise BadTransactionException(report.failures[0].message)
 
     def link_receipts(self, receipts_obj):
-        for cur in self.transactions.values():
-            for cur_receipt in cur['receipts']:
-                cur_file_name = cur_receipt['file_name']
-                if cur_file_name in receipts_obj.receipts:
-                    link_rec = receipts_obj.receipts[cur_file_name]
-                    link_rec['linked-transaction-id'] = cur.transaction_id
-                else:
-                    raise BadTransactionException('Unknown receipt file: {}'.format(
-                        cur_file_name))
+        for cur_id, cur_file_name in self.transactions.receipt_links():
+            if cur_file_name in receipts_obj.receipts:
+                link_rec = receipts_obj.receipts[cur_file_name]
+                link_rec['linked-transaction-id'] = cur_id
+            else:
+                raise BadTransactionException('Unknown receipt file: {}'.format(
+                    cur_file_name))
 
 
 if __name__ == '__main__':
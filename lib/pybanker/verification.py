@@ -0,0 +1,170 @@
+"""
+Batch verification of transactions.
+
+Instead of checking one record at a time (and stopping at the first problem),
+the checks run over the columns of the TransactionStore:
+    - split totals: a prefix sum over the split amounts, gathered at the split offsets
+    - IDs: sha256 of entered_nano, in chunks (in a process pool for big stores)
+Every failure is collected into a VerificationReport.
+"""
+import array
+import bisect
+import concurrent.futures
+import dataclasses
+import hashlib
+import itertools
+import operator
+
+import pybanker.shared
+
+_DIGEST_SIZE = 32
+
+
+@dataclasses.dataclass
+class VerificationFailure:
+    transaction_id: str
+    check: str
+    message: str
+
+
+@dataclasses.dataclass
+class VerificationReport:
+    checked: int = 0
+    failures: list[VerificationFailure] = dataclasses.field(default_factory=list)
+    stopped_early: bool = False
+
+    @property
+    def ok(self):
+        return len(self.failures) == 0
+
+    def merge(self, other):
+        self.checked += other.checked
+        self.failures.extend(other.failures)
+        self.stopped_early = self.stopped_early or other.stopped_early
+
+
+def _bad_id_rows(first_row, nanos, digests):
+    """Return the rows whose digest is not sha256(str(entered_nano)).
+
+    Module level, so it can run in a worker process.
+    """
+    bad = []
+    sha256 = hashlib.sha256
+    for offset, nano in enumerate(nanos):
+        start = offset * _DIGEST_SIZE
+        if sha256(str(nano).encode('utf-8')).digest() != digests[start:start + _DIGEST_SIZE]:
+            bad.append(first_row + offset)
+    return bad
+
+
+def _gather(values, indexes):
+    """values[indexes] (like numpy fancy indexing)."""
+    if len(indexes) == 0:
+        return ()
+    if len(indexes) == 1:
+        return (values[indexes[0]],)
+    return operator.itemgetter(*indexes)(values)
+
+
+class TransactionVerifier(object):
+
+    def __init__(self, store, workers=None, chunk_size=50_000):
+        """
+        store: a TransactionStore.
+        workers: processes used for the ID hashes. (Default: GlobalConfig.transaction_workers.)
+        chunk_size: rows per chunk.
+        """
+        self.config = pybanker.shared.get_config()
+        self.logger = self.config.build_logger(self)
+        self.store = store
+        self.workers = workers if workers is not None else self.config.transaction_workers
+        self.chunk_size = chunk_size
+
+    def _irregular_rows(self, start, stop, check):
+        """Rows in [start, stop) that can't use the columns for the given check."""
+        store = self.store
+        rows = set()
+        if check == 'splits':
+            for cur_row, cur_extras in store.main.extras.items():
+                if 'amount' in cur_extras or 'splits' in cur_extras:
+                    rows.add(cur_row)
+            for cur_split, cur_extras in store.splits.extras.items():
+                if 'amount' in cur_extras:
+                    rows.add(self._split_parent(cur_split))
+        else:
+            for cur_row, cur_extras in store.main.extras.items():
+                if 'entered_nano' in cur_extras:
+                    rows.add(cur_row)
+            rows.update(store.odd_ids)
+        return {cur for cur in rows if start <= cur < stop}
+
+    def _split_parent(self, split_row):
+        # The transaction whose split range holds `split_row`.
+        return bisect.bisect_right(self.store.split_offsets, split_row) - 1
+
+    def _bad_split_rows(self, start, stop):
+        store = self.store
+        offsets = store.split_offsets[start:stop + 1]
+        first, last = offsets[0], offsets[-1]
+        prefix = array.array('q', itertools.accumulate(store.splits.amount[first:last], initial=0))
+        ends = _gather(prefix, list(map(operator.sub, offsets, itertools.repeat(first))))
+        totals = map(operator.sub, ends[1:], ends[:-1])
+        mismatched = map(operator.ne, totals, store.main.amount[start:stop])
+        return [start + cur for cur in itertools.compress(range(stop - start), mismatched)]
+
+    def _check_row(self, row, check, report):
+        """Run the (slow) per record check, to get the same message as before."""
+        view = self.store.row(row)
+        try:
+            if check == 'id':
+                view._verify_id()
+            else:
+                view._verify_splits()
+        except Exception as exc:
+            report.failures.append(VerificationFailure(view.transaction_id, check, str(exc)))
+
+    def _id_chunks(self, start, stop):
+        store = self.store
+        for chunk_start in range(start, stop, self.chunk_size):
+            chunk_stop = min(chunk_start + self.chunk_size, stop)
+            yield (
+                chunk_start,
+                store.main.entered_nano[chunk_start:chunk_stop],
+                bytes(store.digests[chunk_start * _DIGEST_SIZE:chunk_stop * _DIGEST_SIZE]),
+            )
+
+    def _bad_ids(self, start, stop):
+        chunks = self._id_chunks(start, stop)
+        if self.workers <= 1 or stop - start <= self.chunk_size:
+            results = itertools.starmap(_bad_id_rows, chunks)
+            return list(itertools.chain.from_iterable(results))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(_bad_id_rows, *cur) for cur in chunks]
+            return list(itertools.chain.from_iterable(cur.result() for cur in futures))
+
+    def verify(self, start=0, stop=None, fail_fast=False):
+        """Verify rows [start, stop) and return a VerificationReport."""
+        if stop is None:
+            stop = len(self.store)
+        report = VerificationReport(checked=stop - start)
+        if stop <= start:
+            return report
+        candidates = []
+        for check, bad_rows in [
+                ('id', self._bad_ids(start, stop)),
+                ('splits', self._bad_split_rows(start, stop))]:
+            irregular = self._irregular_rows(start, stop, check)
+            candidates.extend((cur, check) for cur in set(bad_rows) | irregular)
+        # Same order as the record by record checks: by row, the ID before the splits.
+        for row, check in sorted(candidates, key=lambda cur: (cur[0], cur[1] != 'id')):
+            self._check_row(row, check, report)
+            if fail_fast and not report.ok:
+                report.stopped_early = True
+                break
+        self.logger.debug(
+            'Verified rows %d-%d, failures: %d', start, stop, len(report.failures))
+        return report
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3 -B
+"""Fixtures shared by the tests."""
+import pytest
+
+import utils_for_tests
+
+import pybanker.shared
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A small data dir (see utils_for_tests.build_data_dir), used as the shared config."""
+    yield utils_for_tests.build_data_dir(tmp_path)
+    pybanker.shared.set_config(None)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.accounts."""
+import pytest
+
+import pybanker.accounts
+import pybanker.shared
+
+
+@pytest.fixture
+def data_dir(data_dir):
+    for cur in ['savings', 'brokerage', 'card']:
+        index = (data_dir / 'accounts' / 'checking' / 'index.yaml').read_text()
+        (data_dir / 'accounts' / cur).mkdir()
+        (data_dir / 'accounts' / cur / 'index.yaml').write_text(index)
+    (data_dir / 'accounts' / '.hidden').mkdir()
+    return data_dir
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_accounts_sorted(data_dir, workers):
+    manager = pybanker.accounts.AccountManager(workers=workers)
+    assert list(manager.accounts) == ['brokerage', 'card', 'checking', 'savings']
+
+
+def test_account_subset(data_dir):
+    manager = pybanker.accounts.AccountManager(slugs=['savings', 'card'])
+    assert list(manager.accounts) == ['card', 'savings']
+    with pytest.raises(pybanker.accounts.AccountConfigException) as exc:
+        pybanker.accounts.AccountManager(slugs=['nope']).accounts
+    assert exc.value.args[0] == 'Unknown account(s): nope'
+
+
+def test_first_bad_account_is_raised(data_dir):
+    for cur in ['card', 'savings']:
+        (data_dir / 'accounts' / cur / 'index.yaml').unlink()
+    with pytest.raises(pybanker.accounts.AccountConfigException) as exc:
+        pybanker.accounts.AccountManager(workers=4).accounts
+    assert exc.value.args[0].endswith('card/index.yaml')
+
+
+def test_slugs_follow_shared_statements(data_dir, mocker):
+    index = data_dir / 'accounts' / 'card' / 'index.yaml'
+    index.write_text(index.read_text() + 'shared_statement_account: savings\n')
+    iterdir = mocker.spy(pybanker.accounts.pathlib.Path, 'iterdir')
+    manager = pybanker.accounts.AccountManager(slugs=['card'])
+    assert list(manager.accounts) == ['card', 'savings']
+    assert iterdir.call_count == 0
+
+
+def test_get_account(data_dir, mocker):
+    manager = pybanker.accounts.AccountManager()
+    load = mocker.spy(pybanker.accounts, '_SingleAccount')
+    assert manager.get_account('card').slug == 'card'
+    assert manager.get_account('card').slug == 'card'
+    assert load.call_count == 1
+    assert 'accounts' not in manager.__dict__
+
+
+def test_reload(data_dir):
+    manager = pybanker.accounts.AccountManager(workers=1)
+    savings = manager.accounts['savings']
+    checking = manager.accounts['checking']
+    index = (data_dir / 'accounts' / 'checking' / 'index.yaml').read_text()
+    (data_dir / 'accounts' / 'extra').mkdir()
+    (data_dir / 'accounts' / 'extra' / 'index.yaml').write_text(index)
+    for cur in (data_dir / 'accounts' / 'card').iterdir():
+        cur.unlink()
+    (data_dir / 'accounts' / 'card').rmdir()
+    manager.reload(['card', 'extra', 'savings'])
+    assert list(manager.accounts) == ['brokerage', 'checking', 'extra', 'savings']
+    assert manager.accounts['savings'] is not savings
+    assert manager.accounts['checking'] is checking
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3 -B
+"""Test for the pybanker.Banker wrapper."""
+import pytest
+
+import pybanker
+import pybanker.shared
+
+
+def test_banker_init_loads_nothing(data_dir):
+    bank = pybanker.Banker()
+    assert bank._accounts is None
+    assert bank._schedule is None
+    assert bank._receipts is None
+    assert bank._transactions is None
+
+
+def test_banker_show_schedule_only_loads_schedule(data_dir, capsys):
+    bank = pybanker.Banker()
+    bank('show-schedule')
+    assert bank._schedule is not None
+    assert bank._accounts is None
+    assert bank._transactions is None
+    assert 'rent' in capsys.readouterr().out
+
+
+def test_banker_verify(data_dir, capsys):
+    bank = pybanker.Banker()
+    bank('verify')
+    assert len(bank.transactions.transactions) == 3
+    assert 'Data verified.' in capsys.readouterr().out
+
+
+def test_banker_bad_command(data_dir):
+    bank = pybanker.Banker()
+    with pytest.raises(pybanker.UndefinedCommandException):
+        bank('foo')
+
+
+def test_commands_require_known_subsystems():
+    for cur in pybanker.shared.GlobalConfig.commands:
+        for cur_requires in cur['requires']:
+            assert cur_requires in pybanker.Banker.subsystems
+
+
+def test_banker_account_slugs_skip_snapshot(data_dir, capsys):
+    (data_dir / 'accounts' / 'savings').mkdir()
+    (data_dir / 'accounts' / 'savings' / 'index.yaml').write_text(
+        (data_dir / 'accounts' / 'checking' / 'index.yaml').read_text())
+    pybanker.Banker()('compile')
+    bank = pybanker.Banker(account_slugs=['savings'])
+    bank('list-accounts')
+    assert list(bank.account_manager.accounts) == ['savings']
+
+
+if __name__ == '__main__':
+    pass
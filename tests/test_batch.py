@@ -0,0 +1,94 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.batch."""
+import datetime
+import json
+import multiprocessing
+import time
+
+import pytest
+import yaml
+
+import utils_for_tests
+
+import pybanker.batch
+import pybanker.shared
+
+
+@pytest.fixture
+def tenants(tmp_path):
+    data_dirs = [utils_for_tests.build_data_dir(tmp_path / cur) for cur in ['a', 'b']]
+    bad_dir = tmp_path / 'bad'
+    bad_dir.mkdir()
+    yield data_dirs, bad_dir, tmp_path / 'a' / 'config.ini'
+    pybanker.shared.set_config(None)
+
+
+def test_data_dir_override(tmp_path):
+    config = pybanker.shared.GlobalConfig(
+        config_file=tmp_path / 'missing.ini', data_dir=tmp_path / 'data')
+    assert config.data_dir == str(tmp_path / 'data')
+    assert config.data_dir_override == str(tmp_path / 'data')
+    pybanker.shared.set_config(config)
+    try:
+        assert pybanker.shared._restore_config(*config.__reduce__()[1]) is config
+    finally:
+        pybanker.shared.set_config(None)
+
+
+def test_batch(tenants, tmp_path):
+    data_dirs, bad_dir, config_file = tenants
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text('# tenants\nb/data\n\nbad  # no accounts\n')
+    report_file = tmp_path / 'report.json'
+    with pytest.raises(SystemExit):
+        pybanker.batch.main([
+            str(data_dirs[0]), '--manifest', str(manifest), '--config', str(config_file),
+            '--workers', '2', '--report', str(report_file)])
+    report = json.loads(report_file.read_text())
+    assert report['summary'] == {'ok': 2, 'failed': 1, 'timeout': 0}
+    tenants = report['tenants']
+    assert [cur['data_dir'] for cur in tenants] == [str(cur) for cur in data_dirs + [bad_dir]]
+    assert tenants[0]['transactions'] == 3
+    assert tenants[1]['receipts'] == 1
+    assert tenants[2]['error'].startswith('AccountConfigException')
+
+
+def test_batch_parallel_tenant(tmp_path):
+    # Enough month files for the tenant to parse them in a process pool.
+    data_dir = utils_for_tests.build_data_dir(tmp_path)
+    config = pybanker.shared.get_config()
+    entered_nano = 1612137600000000000
+    for offset in range(config.parallel_min_files):
+        month = datetime.date(2021 + (2 + offset) // 12, (2 + offset) % 12 + 1, 1)
+        entered_nano += 1
+        transaction_id, data = utils_for_tests.build_transaction(
+            entered_nano, month, 1.0, [('food', 1.0)])
+        (data_dir / 'transactions' / f'{month:%Y-%m}.yaml').write_text(
+            yaml.safe_dump({transaction_id: data}))
+    config_file = tmp_path / 'workers.ini'
+    config_file.write_text(
+        f'[default]\ncache_dir = {tmp_path / "cache"}\ntransaction_workers = 4\n')
+    report = pybanker.batch.BatchRunner([data_dir], config_file=config_file, workers=1).run()
+    pybanker.shared.set_config(None)
+    assert report['summary'] == {'ok': 1, 'failed': 0, 'timeout': 0}, report['tenants']
+    assert report['tenants'][0]['transactions'] == 3 + config.parallel_min_files
+
+
+def _slow_tenant(data_dir, config_file=None, full_verify=False):
+    time.sleep(30)
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != 'fork', reason='The patch needs forked tenants.')
+def test_batch_timeout(tenants, mocker):
+    data_dirs, bad_dir, config_file = tenants
+    # The tenants are forked, so they see the patched function.
+    mocker.patch.object(pybanker.batch, 'verify_tenant', _slow_tenant)
+    started = time.monotonic()
+    report = pybanker.batch.BatchRunner(data_dirs, workers=2, timeout=0.5).run()
+    assert time.monotonic() - started < 10
+    assert [cur['status'] for cur in report['tenants']] == ['timeout', 'timeout']
+
+
+if __name__ == '__main__':
+    pass
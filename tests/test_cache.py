@@ -0,0 +1,75 @@
+#!/usr/bin/env python3 -B
+"""Test for the parsed YAML cache (pybanker.cache)."""
+import os
+
+import pytest
+
+import pybanker.cache
+
+
+@pytest.fixture
+def yaml_cache(tmp_path):
+    return pybanker.cache.YamlCache(str(tmp_path / 'cache'), max_bytes=1024 * 1024)
+
+
+@pytest.fixture
+def yaml_file(tmp_path):
+    yaml_file = tmp_path / 'data.yaml'
+    yaml_file.write_text('a: 1\nb: [1, 2]\n')
+    return yaml_file
+
+
+def _bump_mtime(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_cache_hit_skips_parse(yaml_cache, yaml_file, mocker):
+    assert yaml_cache.load(yaml_file) == {'a': 1, 'b': [1, 2]}
+    parse = mocker.spy(pybanker.cache.YamlCache, '_parse')
+    assert yaml_cache.load(yaml_file) == {'a': 1, 'b': [1, 2]}
+    assert parse.call_count == 0
+
+
+def test_cache_reparses_changed_file(yaml_cache, yaml_file):
+    yaml_cache.load(yaml_file)
+    yaml_file.write_text('a: 2\n')
+    _bump_mtime(yaml_file)
+    assert yaml_cache.load(yaml_file) == {'a': 2}
+
+
+def test_cache_missing_file(yaml_cache, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        yaml_cache.load(tmp_path / 'missing.yaml')
+
+
+def test_cache_evict(yaml_cache, tmp_path):
+    for cur in range(20):
+        cur_file = tmp_path / f'{cur}.yaml'
+        cur_file.write_text(f'value: {"x" * 200}\n')
+        yaml_cache.load(cur_file)
+    yaml_cache.max_bytes = 1000
+    yaml_cache.evict()
+    total = sum(cur.stat().st_size for cur in yaml_cache._entries())
+    assert 0 < total <= 1000
+
+
+def test_cache_evict_least_recently_used(yaml_cache, tmp_path):
+    entries = []
+    for cur in range(3):
+        cur_file = tmp_path / f'{cur}.yaml'
+        cur_file.write_text(f'value: {"x" * 200}\n')
+        yaml_cache.load(cur_file)
+        entry = yaml_cache._entry_path(str(cur_file))
+        # Written a while ago, in order.
+        os.utime(entry, ns=(0, (cur + 1) * 1_000_000_000))
+        entries.append(entry)
+    # A hit makes the oldest entry the most recently used one.
+    yaml_cache.load(tmp_path / '0.yaml')
+    yaml_cache.max_bytes = os.path.getsize(entries[0]) * 2
+    yaml_cache.evict()
+    assert [os.path.exists(cur) for cur in entries] == [True, False, True]
+
+
+if __name__ == '__main__':
+    pass
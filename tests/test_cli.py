@@ -0,0 +1,33 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.cli."""
+import datetime
+
+import pytest
+
+import pybanker.cli
+import pybanker.shared
+
+
+def _parse(mocker, *argv):
+    mocker.patch('sys.argv', ['pybanker'] + list(argv))
+    cli_obj = pybanker.cli.PyBankerCli()
+    cli_obj.parse_args()
+    return cli_obj
+
+
+def test_command_arguments(data_dir, mocker):
+    cli_obj = _parse(mocker, '--count', '3', '--start', '2021-01-01', 'upcoming-bills')
+    assert cli_obj.command_arguments() == {'count': 3, 'start': datetime.date(2021, 1, 1)}
+
+
+def test_options_of_other_commands(data_dir, mocker, capsys):
+    with pytest.raises(SystemExit):
+        _parse(mocker, '--count', '3', '--months', '2', 'query')
+    assert 'Not an option of query: --count, --months' in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        _parse(mocker, '--year', '2021', 'reconcile')
+    assert 'Not an option of reconcile: --year' in capsys.readouterr().err
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.daemon."""
+import datetime
+import threading
+
+import pytest
+import yaml
+
+import utils_for_tests
+
+import pybanker
+import pybanker.daemon
+import pybanker.shared
+
+
+def _add_march(data_dir):
+    transaction_id, data = utils_for_tests.build_transaction(
+        1614556800000000000, datetime.date(2021, 3, 1), 3.0, [('food', 3.0)])
+    (data_dir / 'transactions' / '2021-03.yaml').write_text(
+        yaml.safe_dump({transaction_id: data}))
+    return transaction_id
+
+
+def test_watcher_changes(data_dir):
+    watcher = pybanker.daemon.DataWatcher()
+    assert watcher.changes() == {}
+    _add_march(data_dir)
+    (data_dir / 'receipts' / 'manual' / '20210301.pdf').write_bytes(b'new receipt')
+    (data_dir / 'accounts' / 'checking' / 'notes.txt').write_text('notes')
+    assert watcher.changes() == {
+        'transactions': {'2021-03.yaml'},
+        'receipts': {'manual'},
+        'accounts': {'checking'},
+    }
+    assert watcher.changes() == {}
+
+
+def test_banker_reload(data_dir):
+    bank = pybanker.Banker()
+    bank.load_data()
+    march_id = _add_march(data_dir)
+    (data_dir / 'receipts' / 'scans').mkdir()
+    (data_dir / 'receipts' / 'scans' / 'a.pdf').write_bytes(b'scan')
+    bank.reload({'transactions': {'2021-03.yaml'}, 'receipts': {'scans'}})
+    assert list(bank.transactions.transactions)[-1] == march_id
+    assert len(bank.transactions.transactions) == 4
+    assert list(bank.receipts.receipts) == [
+        '/receipts/manual/20210105.pdf', '/receipts/scans/a.pdf']
+    # Still linked after the reload.
+    assert 'linked-transaction-id' in bank.receipts.receipts['/receipts/manual/20210105.pdf']
+    (data_dir / 'transactions' / '2021-03.yaml').unlink()
+    bank.reload({'transactions': {'2021-03.yaml'}})
+    assert march_id not in bank.transactions.transactions
+    assert len(bank.transactions.indexes.rows_by_date()) == 3
+
+
+def test_banker_reload_snapshot(data_dir):
+    bank = pybanker.Banker()
+    bank.load_data()
+    assert bank.snapshot is None
+    watcher = pybanker.daemon.DataWatcher()
+    pybanker.Banker()('compile')
+    changes = watcher.changes()
+    assert changes['snapshot'] == {'snapshot'}
+    bank.reload(changes)
+    assert bank.snapshot is not None
+
+
+def test_run_request_quick_check(data_dir, monkeypatch):
+    bank = pybanker.Banker()
+    bank.load_data()
+    server = pybanker.daemon.DaemonServer(bank, poll_seconds=3600)
+    try:
+        scans = []
+        original = pybanker.daemon.DataWatcher._scan
+
+        def spy(watcher):
+            scans.append(True)
+            return original(watcher)
+        monkeypatch.setattr(pybanker.daemon.DataWatcher, '_scan', spy)
+        response = server.run_request({'command': 'query', 'arguments': {'payee': 'Store'}})
+        assert response['output'].splitlines()[-1] == 'Found: 3'
+        assert scans == []
+        _add_march(data_dir)
+        response = server.run_request({'command': 'query', 'arguments': {'payee': 'Store'}})
+        assert response['output'].splitlines()[-1] == 'Found: 4'
+        assert scans == [True]
+    finally:
+        server.server_close()
+
+
+def test_daemon(data_dir):
+    bank = pybanker.Banker()
+    bank.load_data()
+    server = pybanker.daemon.DaemonServer(bank, poll_seconds=0.05)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        client = pybanker.daemon.DaemonClient()
+        assert client.is_running()
+        response = client.run('query', {'start': datetime.date(2021, 1, 2), 'payee': 'Store'})
+        assert response['error'] is None
+        assert response['output'].splitlines()[-1] == 'Found: 2'
+        # Changes are picked up before the next command.
+        _add_march(data_dir)
+        response = client.run('query', {'payee': 'Store'})
+        assert response['output'].splitlines()[-1] == 'Found: 4'
+        response = client.run('daemon')
+        assert response['error'] == 'Not a daemon command: daemon'
+        assert client.stop()['output'] == 'Daemon stopped.\n'
+    finally:
+        server.stopping = True
+        thread.join()
+    with pytest.raises(pybanker.daemon.DaemonNotRunning):
+        client.run('query')
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.forecast."""
+import datetime
+
+import pybanker.forecast
+import pybanker.schedule
+import pybanker.shared
+import pybanker.transactions
+
+
+def test_forecast(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    schedule['pay'] = pybanker.schedule.ScheduleItem('pay', {
+        'payee': 'Employer',
+        'start-date': datetime.date(2020, 1, 1),
+        'frequency': 'bi-weekly',
+        'day': 1,
+        'amount': -1500.0,
+        'category': 'income',
+        'active': True,
+        'account': 'checking',
+    })
+    transactions = pybanker.transactions.Transactions(workers=1)
+    result = pybanker.forecast.Forecast(schedule, transactions, history_days=31).run(
+        months=2, start=datetime.date(2021, 2, 1))
+    assert set(result.balances) == {None, 'checking'}
+    # History: 10.50 and 20.00 spent in January (7.25 on 2021-02-01 is in the forecast range).
+    assert result.balance_on(None, datetime.date(2021, 1, 31)) == -30.5
+    # Rent on the 1st of each month.
+    assert list(result.month_ends(None)) == [
+        (datetime.date(2021, 2, 28), -1030.5), (datetime.date(2021, 3, 31), -2030.5)]
+    assert result.lowest(None) == (datetime.date(2021, 3, 1), -2030.5)
+    # Paid every 2 weeks from 2020-01-01: 2021-02-10, 02-24, 03-10, 03-24
+    assert result.balance_on('checking', datetime.date(2021, 2, 9)) == 0
+    assert result.balance_on('checking', datetime.date(2021, 3, 31)) == 6000.0
+
+
+def test_forecast_matches_occurrences(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    frequencies = [
+        'weekly', 'bi-weekly', 'semi-monthly', 'monthly', 'quarterly', 'semi-annually',
+        'yearly']
+    for index, day in enumerate([1, 10, 15, 27, 28, 30, 31]):
+        for frequency in frequencies:
+            name = f'{frequency}-{day}'
+            schedule[name] = pybanker.schedule.ScheduleItem(name, {
+                'payee': name,
+                'start-date': datetime.date(2020, 1, 1) + datetime.timedelta(days=index * 40),
+                'frequency': frequency,
+                'day': day,
+                'amount': 1.0 + index,
+                'category': 'misc',
+                'active': True,
+            })
+    start = datetime.date(2020, 3, 15)
+    result = pybanker.forecast.Forecast(schedule, history_days=0).run(months=24, start=start)
+    end = datetime.date(2022, 2, 28)
+    expected = 0
+    for cur_item in schedule.values():
+        for cur in cur_item.occurrences(start):
+            if cur > end:
+                break
+            expected -= round(cur_item.amount * 100)
+    assert result.balance_on(None, end) == expected / 100
+
+
+if __name__ == '__main__':
+    pass
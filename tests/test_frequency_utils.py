@@ -88,5 +88,34 @@ def test_frequency_helper_find_missing_statements_good(
     assert missing[1].isoformat() == '2021-12-13'
 
 
+def test_frequency_helper_calendar_monthly(mocked_today, mock_get_config_object):
+    statement_dts = [
+        datetime.date(2021, 1, 31),
+        datetime.date(2021, 2, 28),
+        # datetime.date(2021, 3, 31),
+        datetime.date(2021, 4, 30),
+        datetime.date(2021, 5, 31),
+    ]
+    freq_helper = pybanker.frequency_utils.FrequencyHelper(
+        'monthly', statement_dts, datetime.date(2020, 12, 31), calendar=True)
+    missing = freq_helper.find_missing_statement_dates()
+    # Counted from the start date, on the same day of the month (when it exists).
+    assert [cur.isoformat() for cur in missing] == [
+        '2021-03-31', '2021-06-30', '2021-07-31', '2021-08-31', '2021-09-30', '2021-10-31',
+        '2021-11-30']
+
+
+def test_frequency_helper_calendar_bi_weekly_decades(mocked_today, mock_get_config_object):
+    start_dt = datetime.date(1990, 1, 5)
+    statement_dts = [start_dt + datetime.timedelta(weeks=2 * cur) for cur in range(830)]
+    del statement_dts[500]
+    freq_helper = pybanker.frequency_utils.FrequencyHelper(
+        'bi-weekly', statement_dts, start_dt, statement_dts[-1], calendar=True)
+    missing = freq_helper.find_missing_statement_dates()
+    assert missing == [start_dt + datetime.timedelta(weeks=1000)]
+    # The statement dates are not consumed.
+    assert len(freq_helper.statement_dates) == 829
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3 -B
+"""Test for the verification ledger (pybanker.ledger)."""
+import datetime
+import os
+
+import pybanker
+import pybanker.accounts
+import pybanker.ledger
+import pybanker.shared
+import pybanker.transactions
+
+
+def _verify_transactions(full_verify=False):
+    ledger = pybanker.ledger.VerificationLedger(full_verify=full_verify)
+    transactions = pybanker.transactions.Transactions(workers=1)
+    transactions.verify_data(ledger=ledger)
+    ledger.save()
+    return ledger
+
+
+def test_unchanged_files_are_skipped(data_dir):
+    first = _verify_transactions()
+    assert (first.verified, first.skipped) == (2, 0)
+    second = _verify_transactions()
+    assert (second.verified, second.skipped) == (0, 2)
+
+
+def test_changed_file_is_verified(data_dir):
+    _verify_transactions()
+    month_file = data_dir / 'transactions' / '2021-02.yaml'
+    month_file.write_text(month_file.read_text() + '\n')
+    ledger = _verify_transactions()
+    assert (ledger.verified, ledger.skipped) == (1, 1)
+
+
+def test_full_verify(data_dir):
+    _verify_transactions()
+    ledger = _verify_transactions(full_verify=True)
+    assert (ledger.verified, ledger.skipped) == (2, 0)
+
+
+def test_failures_are_not_recorded(data_dir):
+    ledger = pybanker.ledger.VerificationLedger()
+    assert not ledger.check('foo', 'digest', lambda: (False, None))
+    assert 'foo' not in ledger.entries
+    assert ledger.check('foo', 'digest', lambda: (True, None))
+    assert ledger.check('foo', 'digest', lambda: (False, None))
+    assert ledger.skipped == 1
+
+
+def test_banker_saves_ledger(data_dir):
+    pybanker.Banker()('verify')
+    entries = pybanker.ledger.VerificationLedger().entries
+    assert 'transactions:transactions/2021-01.yaml' in entries
+    assert 'receipts:manual' in entries
+
+
+def _verify_accounts():
+    ledger = pybanker.ledger.VerificationLedger()
+    pybanker.accounts.AccountManager(workers=1).verify_data(ledger=ledger)
+    ledger.save()
+    return ledger
+
+
+def test_account_index_change_reverifies_statements(data_dir, mocker):
+    mocker.patch(
+        'pybanker.frequency_utils._get_today_dt', return_value=datetime.date(2021, 3, 15))
+    account_dir = data_dir / 'accounts' / 'checking'
+    index = account_dir / 'index.yaml'
+    # A legacy statements dir (no index file), it uses the account's start date and period.
+    index.write_text(index.read_text().replace(
+        'no_statements: true', 'statements_directory: statements'))
+    (account_dir / 'statements').mkdir()
+    for cur in ['2021-02-01', '2021-03-01']:
+        (account_dir / 'statements' / f'{cur}.pdf').touch()
+    assert _verify_accounts().verified == 1
+    assert _verify_accounts().skipped == 1
+    index.write_text(index.read_text().replace('2021-01-01', '2021-02-01'))
+    stat = index.stat()
+    os.utime(index, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _verify_accounts().verified == 1
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.receipt_index."""
+import hashlib
+import os
+
+import pybanker.receipt_index
+import pybanker.receipts
+import pybanker.shared
+
+
+def test_update_hashes(data_dir):
+    receipt_file = data_dir / 'receipts' / 'manual' / '20210105.pdf'
+    receipts = pybanker.receipts.Receipts()
+    index = receipts.update_hashes(workers=2)
+    assert index.hashed == 1
+    receipt = receipts.receipts['/receipts/manual/20210105.pdf']
+    assert receipt['contents-sha'] == hashlib.sha256(receipt_file.read_bytes()).hexdigest()
+    assert receipt['modified-ns'] == os.stat(receipt_file).st_mtime_ns
+    # Only a real creation time. (Not st_ctime, the inode change time on Linux.)
+    created = pybanker.receipt_index.birthtime_ns(os.stat(receipt_file))
+    assert receipt.get('created-ns') == created
+
+
+def test_unchanged_files_are_not_hashed(data_dir, mocker):
+    pybanker.receipts.Receipts().update_hashes()
+    hash_file = mocker.spy(pybanker.receipt_index, 'hash_file')
+    index = pybanker.receipts.Receipts().update_hashes()
+    assert (index.hashed, index.skipped) == (0, 1)
+    assert hash_file.call_count == 0
+    new_file = data_dir / 'receipts' / 'manual' / '20210106.pdf'
+    new_file.write_bytes(b'new receipt')
+    os.remove(data_dir / 'receipts' / 'manual' / '20210105.pdf')
+    index = pybanker.receipts.Receipts().update_hashes()
+    assert index.hashed == 1
+    assert list(index.entries) == ['/receipts/manual/20210106.pdf']
+
+
+if __name__ == '__main__':
+    pass
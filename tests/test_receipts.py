@@ -0,0 +1,44 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.receipts."""
+import os
+
+import pytest
+
+import pybanker.receipts
+import pybanker.shared
+
+
+@pytest.fixture
+def data_dir(data_dir):
+    receipts_dir = data_dir / 'receipts'
+    for cur in ['2020/vendor/a.jpg', '2020/vendor/deeper/b.jpg', '2021/c.pdf', 'loose.txt']:
+        (receipts_dir / cur).parent.mkdir(parents=True, exist_ok=True)
+        (receipts_dir / cur).write_bytes(b'x')
+    os.symlink(receipts_dir / '2020', receipts_dir / '2021' / 'link')
+    return data_dir
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_find_all_receipts(data_dir, workers):
+    receipts = pybanker.receipts.Receipts(workers=workers).receipts
+    assert list(receipts) == [
+        '/receipts/2020/vendor/a.jpg',
+        '/receipts/2020/vendor/deeper/b.jpg',
+        '/receipts/2021/c.pdf',
+        '/receipts/loose.txt',
+        '/receipts/manual/20210105.pdf',
+    ]
+
+
+def test_receipt_items(data_dir):
+    receipts = pybanker.receipts.Receipts().receipts
+    receipt = receipts['/receipts/2021/c.pdf']
+    assert receipt.receipt_id == '/receipts/2021/c.pdf'
+    assert receipt['file-path'] == str(data_dir / 'receipts' / '2021' / 'c.pdf')
+    receipt['linked-transaction-id'] = 'abc'
+    assert receipts['/receipts/2021/c.pdf']['linked-transaction-id'] == 'abc'
+    assert '/receipts/nope.pdf' not in receipts
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.reconcile."""
+import datetime
+
+import utils_for_tests
+
+import pybanker.reconcile
+import pybanker.schedule
+import pybanker.shared
+import pybanker.transactions
+
+
+def _add_payment(transactions, entered_nano, date, amount, payee='Landlord'):
+    transaction_id, data = utils_for_tests.build_transaction(
+        entered_nano, date, amount, [('housing', amount)])
+    data['payee'] = payee
+    transactions.add_transaction(transaction_id, data)
+    return transaction_id
+
+
+def test_reconcile(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    transactions = pybanker.transactions.Transactions(workers=1)
+    on_time = _add_payment(transactions, 1, datetime.date(2020, 12, 30), 1000.0)
+    late = _add_payment(transactions, 2, datetime.date(2021, 2, 10), 1000.0)
+    # Too far off the scheduled amount to be the March rent.
+    unexpected = _add_payment(transactions, 3, datetime.date(2021, 3, 2), 1500.0)
+    _add_payment(transactions, 4, datetime.date(2021, 4, 1), 1000.0, payee='Someone else')
+    report = pybanker.reconcile.Reconciler(
+        schedule, transactions, days=3, late_days=30, amount_tolerance=0.05).run(
+            start=datetime.date(2021, 1, 1), end=datetime.date(2021, 4, 15))
+    statuses = [
+        (cur.status, cur.due, cur.date, cur.transaction_id) for cur in report.entries]
+    assert statuses == [
+        ('paid', datetime.date(2021, 1, 1), datetime.date(2020, 12, 30), on_time),
+        ('late', datetime.date(2021, 2, 1), datetime.date(2021, 2, 10), late),
+        ('missed', datetime.date(2021, 3, 1), None, None),
+        ('unexpected', None, datetime.date(2021, 3, 2), unexpected),
+        ('pending', datetime.date(2021, 4, 1), None, None),
+    ]
+    assert report.entries[0].days_late == -2
+    assert report.counts() == {
+        'paid': 1, 'late': 1, 'missed': 1, 'pending': 1, 'unexpected': 1}
+
+
+def test_reconcile_each_payment_once(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    transactions = pybanker.transactions.Transactions(workers=1)
+    # One payment can not pay two due dates. (The 2nd one is just late enough to miss.)
+    _add_payment(transactions, 1, datetime.date(2021, 1, 2), 1000.0)
+    _add_payment(transactions, 2, datetime.date(2021, 1, 3), 1000.0)
+    report = pybanker.reconcile.Reconciler(
+        schedule, transactions, days=3, late_days=20, amount_tolerance=0.0).run(
+            start=datetime.date(2021, 1, 1), end=datetime.date(2021, 3, 31))
+    assert [(cur.status, cur.due or cur.date) for cur in report.entries] == [
+        ('paid', datetime.date(2021, 1, 1)),
+        ('unexpected', datetime.date(2021, 1, 3)),
+        ('missed', datetime.date(2021, 2, 1)),
+        ('missed', datetime.date(2021, 3, 1)),
+    ]
+
+
+def test_reconcile_skipped_weekly_payment(data_dir):
+    utils_for_tests._write_yaml(data_dir / 'schedule.yaml', {'items': {'gym': {
+        'payee': 'Gym',
+        'start-date': datetime.date(2021, 1, 4),
+        'frequency': 'weekly',
+        'day': 4,
+        'amount': 20.0,
+        'category': 'health',
+        'active': True,
+    }}})
+    schedule = pybanker.schedule.Schedule()
+    transactions = pybanker.transactions.Transactions(workers=1)
+    dues = [datetime.date(2021, 1, 4) + datetime.timedelta(weeks=cur) for cur in range(8)]
+    for cur, cur_due in enumerate(dues):
+        if cur != 2:
+            _add_payment(transactions, cur + 1, cur_due + datetime.timedelta(days=1), 20.0, 'Gym')
+    report = pybanker.reconcile.Reconciler(
+        schedule, transactions, days=3, late_days=30, amount_tolerance=0.0).run(
+            start=dues[0], end=dues[-1] + datetime.timedelta(days=1))
+    # The skipped payment doesn't make every later payment late for the previous week.
+    assert [(cur.status, cur.due) for cur in report.entries] == [
+        ('missed' if cur == 2 else 'paid', cur_due) for cur, cur_due in enumerate(dues)]
+
+
+def test_reconcile_skipped_february(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    transactions = pybanker.transactions.Transactions(workers=1)
+    _add_payment(transactions, 1, datetime.date(2021, 1, 1), 1000.0)
+    march = _add_payment(transactions, 2, datetime.date(2021, 3, 1), 1000.0)
+    report = pybanker.reconcile.Reconciler(
+        schedule, transactions, days=3, late_days=30, amount_tolerance=0.0).run(
+            start=datetime.date(2021, 1, 1), end=datetime.date(2021, 3, 15))
+    # Mar 1 is within 30 days of Feb 1, but it is the March rent, not a late February one.
+    assert [(cur.status, cur.due, cur.transaction_id) for cur in report.entries][1:] == [
+        ('missed', datetime.date(2021, 2, 1), None),
+        ('paid', datetime.date(2021, 3, 1), march),
+    ]
+
+
+if __name__ == '__main__':
+    pass
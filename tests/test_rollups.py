@@ -0,0 +1,58 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.rollups."""
+import datetime
+import os
+
+import yaml
+
+import utils_for_tests
+
+import pybanker.rollups
+import pybanker.shared
+import pybanker.transactions
+
+
+def _by_key(rollups, kind, year=None):
+    return {(cur[0], cur[1]): cur[2] for cur in rollups.report(kind, year=year)}
+
+
+def test_totals_match_transactions(data_dir):
+    rollups = pybanker.rollups.Rollups()
+    assert rollups.read_files == 2
+    expected = {}
+    for cur in pybanker.transactions.Transactions(workers=1).transactions.values():
+        for cur_split in cur['splits']:
+            key = (cur['date'].year, cur_split['category'])
+            expected[key] = expected.get(key, 0) + round(cur_split['amount'] * 100)
+    assert _by_key(rollups, 'category') == expected
+    assert sum(_by_key(rollups, 'payee').values()) == sum(expected.values())
+
+
+def test_refresh_only_reads_changed_files(data_dir, mocker):
+    pybanker.rollups.Rollups()
+    read = mocker.spy(pybanker.transactions, 'read_transaction_file')
+    rollups = pybanker.rollups.Rollups()
+    assert read.call_count == 0
+    month_file = data_dir / 'transactions' / '2021-02.yaml'
+    with month_file.open('w') as fp:
+        yaml.safe_dump(dict([utils_for_tests.build_transaction(
+            1612224000000000000, datetime.date(2021, 2, 2), 3.0, [('gifts', 3.0)])]), fp)
+    stat = os.stat(month_file)
+    os.utime(month_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert rollups.refresh() == 1
+    assert read.call_count == 1
+    by_month = _by_key(rollups, 'category', year=2021)
+    assert by_month[(2, 'gifts')] == 300
+    assert all(cur_month != 2 or cur_key == 'gifts' for cur_month, cur_key in by_month)
+
+
+def test_removed_file_is_dropped(data_dir):
+    rollups = pybanker.rollups.Rollups()
+    os.remove(data_dir / 'transactions' / '2021-02.yaml')
+    rollups.refresh()
+    assert set(cur[0] for cur in _by_key(rollups, 'category', year=2021)) == {1}
+    assert pybanker.rollups.Rollups(refresh=False).files.keys() == rollups.files.keys()
+
+
+if __name__ == '__main__':
+    pass
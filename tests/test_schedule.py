@@ -0,0 +1,69 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.schedule."""
+import datetime
+
+import pytest
+
+import pybanker.schedule
+import pybanker.shared
+
+
+def _item(frequency, start_date, day=1, name='item', active=True):
+    return pybanker.schedule.ScheduleItem(name, {
+        'payee': 'Payee',
+        'start-date': start_date,
+        'frequency': frequency,
+        'day': day,
+        'amount': 10.0,
+        'category': 'bills',
+        'active': active,
+    })
+
+
+def _take(iterator, count):
+    return [next(iterator).isoformat() for cur in range(count)]
+
+
+@pytest.mark.parametrize('frequency, start_date, day, after, expected', [
+    ('monthly', datetime.date(2020, 1, 15), 31, datetime.date(2021, 1, 1),
+     ['2021-01-31', '2021-02-28', '2021-03-31']),
+    ('monthly', datetime.date(2020, 1, 15), 10, None,
+     ['2020-02-10', '2020-03-10', '2020-04-10']),
+    ('quarterly', datetime.date(2020, 2, 1), 5, datetime.date(2021, 1, 1),
+     ['2021-02-05', '2021-05-05', '2021-08-05']),
+    ('yearly', datetime.date(2019, 6, 1), 1, datetime.date(2021, 6, 1),
+     ['2021-06-01', '2022-06-01', '2023-06-01']),
+    ('semi-monthly', datetime.date(2020, 1, 1), 14, datetime.date(2021, 2, 14),
+     ['2021-02-14', '2021-02-28', '2021-03-14']),
+    ('bi-weekly', datetime.date(2021, 1, 1), 1, datetime.date(2021, 1, 2),
+     ['2021-01-15', '2021-01-29', '2021-02-12']),
+])
+def test_occurrences(frequency, start_date, day, after, expected):
+    item = _item(frequency, start_date, day=day)
+    assert _take(item.occurrences(after), 3) == expected
+
+
+def test_unknown_frequency():
+    with pytest.raises(pybanker.schedule.UnknownScheduleFrequency):
+        next(_item('hourly', datetime.date(2021, 1, 1)).occurrences())
+
+
+def test_upcoming(data_dir):
+    schedule = pybanker.schedule.Schedule()
+    schedule.clear()
+    for cur in range(2000):
+        name = f'item{cur:04d}'
+        schedule[name] = _item('monthly', datetime.date(2000, 1, 1), day=1 + cur % 28, name=name)
+    schedule['inactive'] = _item('monthly', datetime.date(2000, 1, 1), active=False)
+    upcoming = schedule.upcoming(5, after=datetime.date(2021, 3, 2))
+    assert [(cur[0].isoformat(), cur[1].name) for cur in upcoming] == [
+        ('2021-03-02', 'item0001'),
+        ('2021-03-02', 'item0029'),
+        ('2021-03-02', 'item0057'),
+        ('2021-03-02', 'item0085'),
+        ('2021-03-02', 'item0113'),
+    ]
+
+
+if __name__ == '__main__':
+    pass
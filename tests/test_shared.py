@@ -0,0 +1,50 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.shared config handling."""
+import os
+
+import pytest
+
+import pybanker.shared
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config_file = tmp_path / 'config.ini'
+    config_file.write_text('[default]\ndata_dir = /tmp/first\n')
+    return config_file
+
+
+@pytest.fixture
+def shared_config(config_file):
+    pybanker.shared.set_config(pybanker.shared.GlobalConfig(config_file=config_file))
+    yield pybanker.shared.get_config()
+    pybanker.shared.set_config(None)
+
+
+def test_config_file_kwarg(config_file):
+    config = pybanker.shared.GlobalConfig(config_file=config_file)
+    assert config.data_dir == '/tmp/first'
+
+
+def test_config_missing(tmp_path):
+    with pytest.raises(pybanker.shared.ConfigError):
+        pybanker.shared.GlobalConfig(config_file=tmp_path / 'missing.ini')
+
+
+def test_get_config_is_shared(shared_config):
+    assert pybanker.shared.get_config() is shared_config
+
+
+def test_get_config_reloads_on_mtime(shared_config, config_file, mocker):
+    mocker.patch.object(pybanker.shared, '_STALE_CHECK_SECONDS', 0)
+    config_file.write_text('[default]\ndata_dir = /tmp/second\n')
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    new_config = pybanker.shared.get_config()
+    assert new_config is not shared_config
+    assert new_config.data_dir == '/tmp/second'
+    assert new_config.config_file == config_file
+
+
+if __name__ == '__main__':
+    pass
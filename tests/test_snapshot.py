@@ -0,0 +1,42 @@
+#!/usr/bin/env python3 -B
+"""Test for the compiled data snapshot (pybanker.snapshot)."""
+import os
+
+import pybanker
+import pybanker.shared
+import pybanker.snapshot
+
+
+def test_compile_then_load(data_dir, mocker, capsys):
+    pybanker.Banker()('compile')
+    assert 'rebuilt' in capsys.readouterr().out
+    build = mocker.patch.object(pybanker.Banker, '_build_transactions')
+    bank = pybanker.Banker()
+    bank('verify')
+    assert build.call_count == 0
+    assert len(bank.transactions.transactions) == 3
+    assert bank.transactions.config is pybanker.shared.get_config()
+
+
+def test_compile_is_incremental(data_dir):
+    pybanker.Banker()('compile')
+    month_file = data_dir / 'transactions' / '2021-02.yaml'
+    stat = month_file.stat()
+    os.utime(month_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    snapshot = pybanker.snapshot.Snapshot()
+    assert not snapshot.is_fresh('transactions')
+    assert snapshot.is_fresh('schedule')
+    results = snapshot.compile({
+        'schedule': pybanker.Banker()._build_schedule,
+        'transactions': pybanker.Banker()._build_transactions,
+    })
+    assert results == {'schedule': 'reused', 'transactions': 'rebuilt'}
+    assert pybanker.snapshot.Snapshot().load('transactions') is not None
+
+
+def test_load_without_snapshot(data_dir):
+    assert pybanker.snapshot.Snapshot().load('schedule') is None
+
+
+if __name__ == '__main__':
+    pass
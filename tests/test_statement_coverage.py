@@ -0,0 +1,104 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.statement_coverage."""
+import datetime
+import os
+
+import pytest
+
+import utils_for_tests
+
+import pybanker.accounts
+import pybanker.shared
+import pybanker.statement_coverage as coverage_module
+
+
+@pytest.fixture
+def data_dir(data_dir):
+    account_dir = data_dir / 'accounts' / 'savings'
+    utils_for_tests._write_yaml(account_dir / 'index.yaml', {
+        'name': 'Savings',
+        'active': True,
+        'visible': True,
+        'account_type': 'savings',
+        'start_date': datetime.date(2021, 1, 1),
+        'statement_period': 'monthly',
+        'statements_directories': ['statements'],
+    })
+    utils_for_tests._write_yaml(account_dir / 'statements' / 'index.yaml', {
+        'name_formats': [r'^(\d{4})-(\d{2})-(\d{2})'],
+        'start_date': datetime.date(2020, 12, 1),
+        'end_date': datetime.date(2021, 8, 15),
+        'period': 'monthly',
+        'null_statements': [datetime.date(2021, 3, 1)],
+    })
+    for cur in ['2021-01-01', '2021-02-01', '2021-05-01', '2021-06-01']:
+        (account_dir / 'statements' / f'{cur}.pdf').touch()
+    return data_dir
+
+
+def test_year_cells(data_dir):
+    coverage = coverage_module.StatementCoverage()
+    assert coverage.rebuilt == ['checking', 'savings']
+    P, N, M, _ = (
+        coverage_module.CELL_PRESENT, coverage_module.CELL_NULL, coverage_module.CELL_MISSING,
+        coverage_module.CELL_NONE)
+    assert coverage.year_cells(2021) == {
+        ('savings', 'statements'): [P, P, N, M, P, P, M, M, _, _, _, _]}
+    assert coverage.missing(2021, 4) == [('savings', 'statements')]
+    assert coverage.missing(2021, 5) == []
+
+
+def test_cached_rows_skip_listing(data_dir, mocker):
+    coverage_module.StatementCoverage()
+    build = mocker.spy(pybanker.accounts.AccountManager, 'load_account')
+    coverage = coverage_module.StatementCoverage()
+    assert coverage.rebuilt == []
+    assert build.call_count == 0
+    assert coverage.missing(2021, 4) == [('savings', 'statements')]
+    statements_dir = data_dir / 'accounts' / 'savings' / 'statements'
+    (statements_dir / '2021-04-01.pdf').touch()
+    stat = os.stat(statements_dir)
+    os.utime(statements_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert coverage.refresh() == ['savings']
+    assert coverage.missing(2021, 4) == []
+
+
+def _open_ended(data_dir):
+    index_path = data_dir / 'accounts' / 'savings' / 'statements' / 'index.yaml'
+    utils_for_tests._write_yaml(index_path, {
+        'name_formats': [r'^(\d{4})-(\d{2})-(\d{2})'],
+        'start_date': datetime.date(2020, 12, 1),
+        'period': 'monthly',
+        'null_statements': [datetime.date(2021, 3, 1)],
+    })
+
+
+def _set_today(mocker, today):
+    mocker.patch('pybanker.frequency_utils._get_today_dt', return_value=today)
+    mocker.patch('pybanker.statement_coverage._get_today_dt', return_value=today)
+
+
+def test_new_day_extends_rows(data_dir, mocker):
+    _open_ended(data_dir)
+    _set_today(mocker, datetime.date(2021, 8, 15))
+    coverage_module.StatementCoverage()
+    _set_today(mocker, datetime.date(2021, 10, 20))
+    build = mocker.spy(pybanker.accounts.AccountManager, 'load_account')
+    coverage = coverage_module.StatementCoverage()
+    # Only the trailing cells were added, without loading any account.
+    assert coverage.rebuilt == []
+    assert build.call_count == 0
+    P, N, M, _ = (
+        coverage_module.CELL_PRESENT, coverage_module.CELL_NULL, coverage_module.CELL_MISSING,
+        coverage_module.CELL_NONE)
+    assert coverage.year_cells(2021)[('savings', 'statements')] == [
+        P, P, N, M, P, P, M, M, M, M, _, _]
+    # The same as a full rebuild.
+    os.unlink(coverage.path)
+    rebuilt = coverage_module.StatementCoverage()
+    assert rebuilt.rebuilt == ['checking', 'savings']
+    assert rebuilt.year_cells(2021) == coverage.year_cells(2021)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.statements."""
+import datetime
+
+import pytest
+
+import utils_for_tests
+
+import pybanker.accounts
+import pybanker.shared
+import pybanker.statements
+
+
+@pytest.mark.parametrize('name, name_formats, expected', [
+    ('2021-03-04', [r'^(\d{4})-(\d{2})-(\d{2})'], datetime.date(2021, 3, 4)),
+    ('stmt_20210304', [r'^foo', r'^stmt_(\d{4})(\d{2})(\d{2})'], datetime.date(2021, 3, 4)),
+    ('2021-03-04_checking', ['%Y-%m-%d'], datetime.date(2021, 3, 4)),
+    ('Statement 04 Mar 21', ['Statement %d %b %y'], datetime.date(2021, 3, 4)),
+    ('march-4-2021', ['%B-%d-%Y'], datetime.date(2021, 3, 4)),
+    ('100%_20210304', ['100%%_%Y%m%d'], datetime.date(2021, 3, 4)),
+    ('2021-03-04', [r'^(?P<y>\d{4})-(?P<m>\d{2})-(?P<d>\d{2})'], datetime.date(2021, 3, 4)),
+    ('100%_20210304', [r'^100%_(\d{4})(\d{2})(\d{2})'], datetime.date(2021, 3, 4)),
+])
+def test_parse_date_string(name, name_formats, expected):
+    assert pybanker.statements._parse_date_string(name, name_formats) == expected
+
+
+def test_parse_date_string_errors():
+    with pytest.raises(pybanker.statements.ConfigError) as exc:
+        pybanker.statements._parse_date_string('nope', ['%Y-%m-%d'])
+    assert exc.value.args[0] == 'Cannot parse date string: nope'
+    with pytest.raises(pybanker.statements.ConfigError) as exc:
+        pybanker.statements._parse_date_string('2021', ['%Y-%j'])
+    assert exc.value.args[0] == 'Unsupported name format directive (%j): %Y-%j'
+    with pytest.raises(pybanker.statements.ConfigError) as exc:
+        pybanker.statements._parse_date_string('2021-03', ['%Y-%m'])
+    assert exc.value.args[0] == 'Name format needs a year, a month and a day: %Y-%m'
+
+
+def _statements_dir(data_dir, names, **index):
+    account_dir = data_dir / 'accounts' / 'daily'
+    utils_for_tests._write_yaml(account_dir / 'index.yaml', {
+        'name': 'Daily',
+        'active': True,
+        'visible': True,
+        'account_type': 'checking',
+        'start_date': datetime.date(2000, 1, 1),
+        'statement_period': 'bi-weekly',
+        'statements_directories': ['statements'],
+    })
+    index_data = {
+        'name_formats': ['%Y-%m-%d'],
+        'start_date': datetime.date(2000, 1, 1),
+        'end_date': datetime.date(2000, 1, 2),
+        'period': 'bi-weekly',
+    }
+    index_data.update(index)
+    utils_for_tests._write_yaml(account_dir / 'statements' / 'index.yaml', index_data)
+    for cur in names:
+        (account_dir / 'statements' / cur).touch()
+    account = pybanker.accounts._SingleAccount(account_dir)
+    return account.statements_manager.statements_directories[0]
+
+
+def test_statements_many_files(data_dir):
+    start_dt = datetime.date(2000, 1, 1)
+    dates = [start_dt + datetime.timedelta(days=cur) for cur in range(10_000)]
+    names = [f'{cur.isoformat()}.pdf' for cur in dates] + ['renamed.pdf']
+    statements_dir = _statements_dir(
+        data_dir, names, filename_date_map={'renamed.pdf': datetime.date(1999, 12, 31)})
+    statements = statements_dir.statements
+    assert len(statements) == 10_001
+    assert [cur.date_dt for cur in statements[:2]] == [datetime.date(1999, 12, 31), start_dt]
+    assert statements[0].path.name == 'renamed.pdf'
+
+
+def test_statements_duplicate_date(data_dir):
+    # The statements are loaded (to find the missing ones) when the account is created.
+    with pytest.raises(pybanker.statements.ConfigError) as exc:
+        _statements_dir(
+            data_dir, ['2000-01-05.pdf'], null_statements=[datetime.date(2000, 1, 5)])
+    assert exc.value.args[0].startswith('Duplicate dates: 2000-01-05')
+
+
+def test_value_types_are_compact():
+    item = pybanker.statements._StatementItem(date_dt=datetime.date(2021, 3, 4))
+    assert not hasattr(item, '__dict__')
+    with pytest.raises(AttributeError):
+        item.date_dt = datetime.date(2021, 3, 5)
+    index_data = pybanker.statements._IndexData(
+        index_path=None, name_formats=['%Y-%m-%d'], start_date=datetime.date(2021, 1, 1),
+        period='monthly', null_statements=['20210304'])
+    assert index_data.period_ref == pybanker.statements._StatementPeriod.monthly
+    assert index_data.null_statements == (item,)
+    assert index_data.filename_date_map == {}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.transaction_index."""
+import datetime
+
+import pytest
+
+import utils_for_tests
+
+import pybanker.shared
+import pybanker.transaction_index
+import pybanker.transactions
+
+
+@pytest.fixture
+def transactions(data_dir):
+    transactions = pybanker.transactions.Transactions(workers=1)
+    for cur_nano, cur_date, cur_amount, cur_splits in [
+            (1614556800000000000, datetime.date(2021, 3, 1), -40.0, [('refund', -40.0)]),
+            (1614643200000000000, datetime.date(2021, 3, 2), 250.0,
+             [('food', 50.0), ('travel', 200.0)]),
+    ]:
+        transactions.add_transaction(*utils_for_tests.build_transaction(
+            cur_nano, cur_date, cur_amount, cur_splits))
+    return transactions
+
+
+def _brute_force(transactions, start=None, end=None, category=None,
+                 min_amount=None, max_amount=None):
+    found = []
+    for cur in transactions.transactions.values():
+        if start is not None and cur['date'] < start:
+            continue
+        if end is not None and cur['date'] > end:
+            continue
+        if category is None:
+            amounts = [cur['amount']]
+        else:
+            amounts = [split['amount'] for split in cur['splits'] if split['category'] == category]
+        if min_amount is not None:
+            amounts = [amount for amount in amounts if amount >= min_amount]
+        if max_amount is not None:
+            amounts = [amount for amount in amounts if amount <= max_amount]
+        if not amounts:
+            continue
+        found.append(cur.transaction_id)
+    return sorted(found, key=lambda cur: transactions.transactions[cur]['date'])
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'start': datetime.date(2021, 1, 6)},
+    {'start': datetime.date(2021, 1, 1), 'end': datetime.date(2021, 2, 28)},
+    {'min_amount': 10},
+    {'min_amount': -50, 'max_amount': 0},
+    {'category': 'food'},
+    {'category': 'food', 'min_amount': 20},
+    {'category': 'travel', 'max_amount': 100},
+])
+def test_query_matches_brute_force(transactions, filters):
+    found = [cur.transaction_id for cur in transactions.query(**filters)]
+    assert found == _brute_force(transactions, **filters)
+
+
+def test_query_payee_and_receipt(transactions):
+    assert len(transactions.query(payee='Store')) == 5
+    assert transactions.query(payee='Nobody') == []
+    found = transactions.query(receipt='/receipts/manual/20210105.pdf')
+    assert [cur['date'] for cur in found] == [datetime.date(2021, 1, 5)]
+
+
+def test_indexes_follow_added_transactions(transactions):
+    indexes = transactions.indexes
+    transactions.add_transaction(*utils_for_tests.build_transaction(
+        1609372800000000001, datetime.date(2020, 12, 31), 3.5, [('gifts', 3.5)]))
+    assert indexes is transactions.indexes
+    found = transactions.query(category='gifts')
+    assert [cur['date'] for cur in found] == [datetime.date(2020, 12, 31)]
+    assert transactions.query()[0]['date'] == datetime.date(2020, 12, 31)
+
+
+def test_amount_buckets():
+    for cents in [0, 1, 2, 3, 255, 256, -1, -300]:
+        low, high = pybanker.transaction_index._bucket_range(
+            pybanker.transaction_index._amount_bucket(cents))
+        assert low <= cents <= high
+
+
+if __name__ == '__main__':
+    pass
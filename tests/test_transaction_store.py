@@ -0,0 +1,94 @@
+#!/usr/bin/env python3 -B
+"""Test for the columnar transaction store (pybanker.transaction_store)."""
+import datetime
+import pickle
+
+import pytest
+
+import pybanker.transaction_store
+
+_ID = 'ab' * 32
+
+
+def _data(**kwargs):
+    data = {
+        'date': datetime.date(2021, 1, 5),
+        'payee': 'Store',
+        'amount': 20.5,
+        'entered_nano': 1609804800000000000,
+        'splits': [
+            {'category': 'food', 'amount': 20.0, 'note': 'lunch'},
+            {'category': 'tip', 'amount': 0.5},
+        ],
+        'receipts': [{'file_name': '/receipts/a.pdf'}],
+    }
+    data.update(kwargs)
+    return data
+
+
+def test_round_trip():
+    store = pybanker.transaction_store.TransactionStore()
+    view = store.append(_ID, _data())
+    assert view.transaction_id == _ID
+    assert dict(view) == dict(_data(), **{'transaction-id': _ID})
+    assert _ID in store
+    assert list(store) == [_ID]
+    assert store.split_total_cents(0) == 2050
+
+
+def test_extras_and_missing_keys():
+    store = pybanker.transaction_store.TransactionStore()
+    data = _data(amount=1.005, date=20210105, memo='odd', splits='none')
+    del data['entered_nano']
+    view = store.append('not-a-digest', data)
+    assert view['amount'] == 1.005
+    assert view['date'] == 20210105
+    assert view['memo'] == 'odd'
+    assert view['splits'] == 'none'
+    assert 'entered_nano' not in view
+    assert store.amount_cents(0) is None
+    assert store['not-a-digest'].transaction_id == 'not-a-digest'
+
+
+def test_pickle():
+    store = pybanker.transaction_store.TransactionStore()
+    data = _data()
+    del data['payee']
+    store.append(_ID, data)
+    copy = pickle.loads(pickle.dumps(store))
+    assert dict(copy[_ID]) == dict(store[_ID])
+    assert 'payee' not in copy[_ID]
+
+
+def test_receipt_links():
+    store = pybanker.transaction_store.TransactionStore()
+    store.append(_ID, _data())
+    store.append('cd' * 32, _data(receipts=[]))
+    assert list(store.receipt_links()) == [(_ID, '/receipts/a.pdf')]
+
+
+def test_split_off_and_extend_rows():
+    store = pybanker.transaction_store.TransactionStore()
+    store.append(_ID, _data())
+    store.append('odd-id', _data(amount=1.005, memo='odd'))
+    store.append('cd' * 32, _data(receipts=[], splits='none'))
+    expected = {cur: dict(store[cur]) for cur in store}
+    tail = store.split_off(1)
+    assert list(store) == [_ID]
+    assert list(tail) == ['odd-id', 'cd' * 32]
+    assert 'odd-id' not in store
+    store.append('ef' * 32, _data())
+    store.extend_rows(tail, 0, 2)
+    assert list(store) == [_ID, 'ef' * 32, 'odd-id', 'cd' * 32]
+    assert store.rows[store._row_key('odd-id')] == 2
+    assert {cur: dict(store[cur]) for cur in expected} == expected
+    assert list(store.receipt_links()) == [
+        (_ID, '/receipts/a.pdf'), ('ef' * 32, '/receipts/a.pdf'), ('odd-id', '/receipts/a.pdf')]
+    with pytest.raises(KeyError):
+        store.extend_rows(tail, 0, 1)
+    with pytest.raises(ValueError):
+        store.extend_rows(pybanker.transaction_store.TransactionStore(), 0, 0)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3 -B
+"""Test for pybanker.transactions."""
+import datetime
+
+import pytest
+import yaml
+
+import utils_for_tests
+
+import pybanker.shared
+import pybanker.transactions
+import pybanker.verification
+
+
+def test_load_sequential(data_dir):
+    transactions = pybanker.transactions.Transactions(workers=1)
+    assert len(transactions.transactions) == 3
+    transactions.verify_data()
+
+
+def test_load_parallel(data_dir, mocker):
+    mocker.patch.object(
+        pybanker.shared.GlobalConfig, 'parallel_min_files', new_callable=mocker.PropertyMock,
+        return_value=1)
+    parallel = pybanker.transactions.Transactions(workers=2)
+    sequential = pybanker.transactions.Transactions(workers=1)
+    assert list(parallel.transactions) == list(sequential.transactions)
+
+
+def test_load_parallel_duplicate_id(data_dir, mocker):
+    mocker.patch.object(
+        pybanker.shared.GlobalConfig, 'parallel_min_files', new_callable=mocker.PropertyMock,
+        return_value=1)
+    duplicate = dict([utils_for_tests.build_transaction(
+        1612137600000000000, datetime.date(2021, 3, 1), 7.25, [('food', 7.25)])])
+    with (data_dir / 'transactions' / '2021-03.yaml').open('w') as fp:
+        yaml.safe_dump(duplicate, fp)
+    with pytest.raises(pybanker.transactions.BadTransactionException) as exc:
+        pybanker.transactions.Transactions(workers=2)
+    assert exc.value.args[0].startswith('Duplicate ID:')
+
+
+def test_iter_only_reads_overlapping_months(data_dir, mocker):
+    transactions = pybanker.transactions.Transactions(preload=False)
+    assert transactions.transactions == {}
+    read = mocker.spy(pybanker.transactions, 'read_transaction_file')
+    found = list(transactions.iter(
+        start=datetime.date(2021, 1, 3), end=datetime.date(2021, 1, 31)))
+    assert read.call_count == 1
+    assert [cur['date'] for cur in found] == [datetime.date(2021, 1, 5)]
+
+
+def test_iter_open_ended(data_dir):
+    transactions = pybanker.transactions.Transactions(preload=False)
+    assert len(list(transactions.iter())) == 3
+    assert len(list(transactions.iter(start=datetime.date(2021, 2, 1)))) == 1
+    assert len(list(transactions.iter(end=datetime.date(2020, 12, 31)))) == 0
+
+
+def test_iter_datetime_dates(data_dir):
+    transaction_id, data = utils_for_tests.build_transaction(
+        1614556800000000000, datetime.datetime(2021, 3, 1, 12, 30), 3.0, [('food', 3.0)])
+    utils_for_tests._write_yaml(data_dir / 'transactions' / '2021-03.yaml', {transaction_id: data})
+    transactions = pybanker.transactions.Transactions(preload=False)
+    found = list(transactions.iter(start=datetime.date(2021, 3, 1), end=datetime.date(2021, 3, 1)))
+    assert [cur.transaction_id for cur in found] == [transaction_id]
+
+
+def _query_rows(transactions):
+    return [
+        (cur.transaction_id, dict(cur))
+        for cur in transactions.query(start=datetime.date(2020, 1, 1))]
+
+
+def test_reload_files(data_dir):
+    transactions = pybanker.transactions.Transactions(workers=1)
+    january = str(data_dir / 'transactions' / '2021-01.yaml')
+    february = str(data_dir / 'transactions' / '2021-02.yaml')
+    kept = transactions.file_rows[january]
+    assert len(transactions.indexes.rows_by_date()) == 3
+    utils_for_tests._write_yaml(data_dir / 'transactions' / '2021-02.yaml', dict([
+        utils_for_tests.build_transaction(
+            1612224000000000000, datetime.date(2021, 2, 2), 4.0, [('food', 4.0)]),
+    ]))
+    transactions.reload_files([february])
+    assert transactions.file_rows[january] == kept
+    fresh = pybanker.transactions.Transactions(workers=1)
+    assert _query_rows(transactions) == _query_rows(fresh)
+    # A change in the first file, the later files are copied back.
+    utils_for_tests._write_yaml(data_dir / 'transactions' / '2021-01.yaml', dict([
+        utils_for_tests.build_transaction(
+            1609459200000000000, datetime.date(2021, 1, 1), 10.5, [('food', 10.5)]),
+    ]))
+    transactions.reload_files([january])
+    fresh = pybanker.transactions.Transactions(workers=1)
+    assert transactions.file_rows == fresh.file_rows
+    assert _query_rows(transactions) == _query_rows(fresh)
+    assert transactions.indexes.payees == fresh.indexes.payees
+    assert transactions.indexes.categories == fresh.indexes.categories
+
+
+def _add_bad_transactions(transactions):
+    bad_id, data = utils_for_tests.build_transaction(
+        1700000000000000000, datetime.date(2021, 3, 1), 5.0, [('food', 5.0)])
+    data['entered_nano'] += 1
+    transactions.add_transaction(bad_id, data)
+    bad_splits = utils_for_tests.build_transaction(
+        1700000001000000000, datetime.date(2021, 3, 2), 5.0, [('food', 4.0)])
+    transactions.add_transaction(*bad_splits)
+    return bad_id, bad_splits[0]
+
+
+def test_verify_collects_all_failures(data_dir):
+    transactions = pybanker.transactions.Transactions(workers=1)
+    bad_id, bad_splits = _add_bad_transactions(transactions)
+    report = transactions.verify()
+    assert report.checked == 5
+    assert [(cur.transaction_id, cur.check) for cur in report.failures] == [
+        (bad_id, 'id'), (bad_splits, 'splits')]
+    assert report.failures[0].message.startswith('Bad ID:')
+    with pytest.raises(pybanker.transactions.BadTransactionException):
+        transactions.verify_data()
+
+
+def test_verify_fail_fast_in_parallel_chunks(data_dir):
+    transactions = pybanker.transactions.Transactions(workers=1)
+    _add_bad_transactions(transactions)
+    verifier = pybanker.verification.TransactionVerifier(
+        transactions.transactions, workers=2, chunk_size=2)
+    report = verifier.verify(fail_fast=True)
+    assert len(report.failures) == 1
+    assert report.stopped_early
+
+
+if __name__ == '__main__':
+    pass
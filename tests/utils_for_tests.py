@@ -10,11 +10,16 @@ So, I avoided that prefix and this was the best I could come up with...
 TODO: verify this filename since moving away from nose.
 Eg I think pytest uses a standard name for shared routines.
 """
+import datetime
+import hashlib
 import logging
 import os
 import unittest
 
 import flake8.api.legacy
+import yaml
+
+import pybanker.shared
 
 
 class BaseTestCase(unittest.TestCase):
@@ -42,6 +47,69 @@ class BaseTestCase(unittest.TestCase):
             cur_logger.setLevel(self.others_level)
 
 
+def _write_yaml(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w') as fp:
+        yaml.safe_dump(data, fp, default_flow_style=False)
+
+
+def build_transaction(entered_nano, date, amount, splits, receipts=()):
+    """Return (transaction id, data) for a transaction with a valid ID."""
+    transaction_id = hashlib.sha256(str(entered_nano).encode('utf-8')).hexdigest()
+    data = {
+        'entered_nano': entered_nano,
+        'date': date,
+        'payee': 'Store',
+        'amount': amount,
+        'splits': [{'category': cur_cat, 'amount': cur_amount} for cur_cat, cur_amount in splits],
+        'receipts': [{'file_name': cur} for cur in receipts],
+    }
+    return transaction_id, data
+
+
+def build_data_dir(tmp_path):
+    """Create a small data dir (and config file) under tmp_path and make it the shared config."""
+    data_dir = tmp_path / 'data'
+    _write_yaml(data_dir / 'schedule.yaml', {'items': {'rent': {
+        'payee': 'Landlord',
+        'start-date': datetime.date(2020, 1, 1),
+        'frequency': 'monthly',
+        'day': 1,
+        'amount': 1000.0,
+        'category': 'housing',
+        'active': True,
+    }}})
+    _write_yaml(data_dir / 'accounts' / 'checking' / 'index.yaml', {
+        'name': 'Checking',
+        'active': True,
+        'visible': True,
+        'account_type': 'checking',
+        'start_date': datetime.date(2021, 1, 1),
+        'statement_period': 'monthly',
+        'no_statements': True,
+    })
+    receipt = data_dir / 'receipts' / 'manual' / '20210105.pdf'
+    receipt.parent.mkdir(parents=True)
+    receipt.write_bytes(b'receipt')
+    _write_yaml(data_dir / 'transactions' / '2021-01.yaml', dict([
+        build_transaction(
+            1609459200000000000, datetime.date(2021, 1, 1), 10.5,
+            [('food', 10.0), ('tip', 0.5)]),
+        build_transaction(
+            1609804800000000000, datetime.date(2021, 1, 5), 20.0,
+            [('hardware', 20.0)], receipts=['/receipts/manual/20210105.pdf']),
+    ]))
+    _write_yaml(data_dir / 'transactions' / '2021-02.yaml', dict([
+        build_transaction(
+            1612137600000000000, datetime.date(2021, 2, 1), 7.25, [('food', 7.25)]),
+    ]))
+    config_file = tmp_path / 'config.ini'
+    config_file.write_text(
+        f'[default]\ndata_dir = {data_dir}\ncache_dir = {tmp_path / "cache"}\n')
+    pybanker.shared.set_config(pybanker.shared.GlobalConfig(config_file=config_file))
+    return data_dir
+
+
 class Flake8Wrapper(object):
     """
     The new flake8 library (3.5.0) has a kinda crappy API.